@@ -36,4 +36,125 @@ PLATE_DETECTION_MODEL_PATH = os.path.join(APPLICATION_PATH, PLATE_TRAINED_YOLO_V
 
 # One size fits all confidence threshold before adjustment. 
 BASE_YOLO_CONFIDENCE_THRESHOLD = 0.85
-PLATE_YOLO_CONFIDENCE_THRESHOLD = 0.66
\ No newline at end of file
+PLATE_YOLO_CONFIDENCE_THRESHOLD = 0.66
+
+''' SPEED ESTIMATION. '''
+
+# Method used to estimate speeds, 'rolling' for per frame estimation, 'speed_trap' for section timing between lines or
+# 'offline' to fit whole trajectories once tracks end when batch processing recorded footage.
+SPEED_ESTIMATION_METHOD = 'rolling'
+
+# Speed trap lane definitions, entry and exit lines in pixel coordinates and the ground distance between them in METERS.
+# e.g. [{'entry_line' : ((0, 400), (640, 400)), 'exit_line' : ((0, 700), (640, 700)), 'distance' : 20.0}]
+SPEED_TRAP_LANES = []
+
+
+''' ANPR. '''
+
+# Number of frames to accumulate plate crops over before reading them with a single batched OCR call.
+ANPR_OCR_BATCH_FRAMES = 1
+
+# Number of background threads reading plates away from the frame loop, 0 to read plates inline.
+ANPR_ASYNC_WORKERS = 1
+# Maximum number of vehicle crops waiting for a background plate read.
+ANPR_ASYNC_QUEUE_SIZE = 8
+# Maximum number of plate reads attempted per tracked vehicle before its plate is considered occluded.
+ANPR_MAX_READ_ATTEMPTS = 5
+# Summed OCR confidence each plate character must lead its runner up by, across reads of a vehicle, to be final.
+ANPR_CONSENSUS_MARGIN = 1.0
+# Fixed size in pixels vehicle crops are letterboxed to for batched plate detection.
+ANPR_PLATE_SEARCH_SIZE = 320
+# Reduced fixed size in pixels for searching only the lower band of a vehicle its plate is expected within.
+ANPR_PLATE_BAND_SEARCH_SIZE = 224
+# Number of OCR results cached per reader, reused for near identical plate crops.
+ANPR_OCR_CACHE_SIZE = 256
+
+# CSV of plates of interest (stolen, uninsured, etc.) with a 'plate' column, reloaded whenever the file changes.
+PLATE_HOTLIST_PATH = os.path.join(APPLICATION_PATH, 'hotlist.csv')
+
+
+''' AVERAGE SPEED ENFORCEMENT. '''
+
+# ID of the camera this application processes footage from.
+CAMERA_ID = 'camera-1'
+
+# SQLite plate sightings index shared between camera sites.
+AVERAGE_SPEED_DATABASE_PATH = os.path.join(APPLICATION_PATH, 'sightings.db')
+
+# Pairs of camera sites and the distance between them in METERS.
+# e.g. [{'entry_camera' : 'camera-1', 'exit_camera' : 'camera-2', 'distance' : 1609.0}]
+AVERAGE_SPEED_SITE_PAIRS = []
+
+# Seconds plate sightings are kept and matched within.
+AVERAGE_SPEED_SIGHTING_WINDOW = 3600
+
+
+''' EVIDENCE CAPTURES. '''
+
+# JPEG quality, between 0 and 100, traffic violation evidence is encoded at.
+EVIDENCE_JPEG_QUALITY = 90
+
+# Maximum number of captures waiting to be written before further captures are dropped.
+EVIDENCE_QUEUE_SIZE = 32
+
+# Whether short pre and post event clips are written alongside each capture.
+EVIDENCE_CLIPS_ENABLED = True
+# Seconds of footage kept before, and collected after, a violation.
+EVIDENCE_CLIP_PRE_SECONDS = 5
+EVIDENCE_CLIP_POST_SECONDS = 3
+# JPEG quality and resize factor of buffered frames, lower values reduce memory and encoding time.
+EVIDENCE_CLIP_JPEG_QUALITY = 70
+EVIDENCE_CLIP_SCALE = 0.5
+
+# Indexed store of captured violations, queried by time, plate, speed and track ID.
+VIOLATION_DATABASE_PATH = os.path.join(APPLICATION_PATH, 'violations.db')
+# Number of violations, and seconds, buffered before being written in a single transaction.
+VIOLATION_BATCH_SIZE = 64
+VIOLATION_FLUSH_INTERVAL = 2.0
+
+
+''' TRAJECTORY ARCHIVE. '''
+
+# Whether completed trajectories are persisted for later traffic studies.
+TRAJECTORY_ARCHIVE_ENABLED = True
+TRAJECTORY_ARCHIVE_DIR_PATH = os.path.join(APPLICATION_PATH, 'trajectories')
+# Size in bytes at which a new archive chunk file is started.
+TRAJECTORY_ARCHIVE_CHUNK_SIZE = 64 * 1024 * 1024
+
+
+''' EVENT LOG. '''
+
+# Whether per frame detections, speeds and plate states are logged in a machine readable format.
+EVENT_LOG_ENABLED = True
+EVENT_LOG_DIR_PATH = os.path.join(APPLICATION_PATH, 'events')
+# 'parquet' or 'arrow' for Arrow IPC, both requiring pyarrow, otherwise 'jsonl'.
+EVENT_LOG_FORMAT = 'parquet'
+# Rows buffered per batch, and batches waiting to be written before further batches are dropped.
+EVENT_LOG_BATCH_ROWS = 8192
+EVENT_LOG_MAX_PENDING_BATCHES = 16
+# Seconds after which each log file is completed, Parquet and Arrow IPC files are only readable once completed.
+EVENT_LOG_FILE_SECONDS = 60
+
+
+''' DISPLAY. '''
+
+# Maximum rate the video player refreshes at, frames read between refreshes are analysed but not annotated.
+DISPLAY_MAX_FPS = 30
+
+# 'annotated' to draw overlays onto displayed frames, or 'overlay' to display frames untouched, skipping all OpenCV
+# drawing, and write each frames overlay message alongside the video for viewers to render themselves.
+DISPLAY_OUTPUT_MODE = 'annotated'
+
+# Encoding of overlay messages sent for viewers to render, 'json' or the compact 'binary'.
+OVERLAY_ENCODING = 'json'
+
+# Milliseconds the seek bar must settle for before seeking.
+SEEK_DEBOUNCE_MS = 150
+
+
+''' VIDEO DECODING. '''
+
+# 'opencv' for cv2.VideoCapture, or 'pyav' for multi threaded decoding into reused buffers, requiring PyAV.
+VIDEO_DECODE_BACKEND = 'opencv'
+# Number of PyAV decoding threads, 0 to match the number of cores.
+VIDEO_DECODE_THREADS = 0
@@ -1,12 +1,16 @@
 import customtkinter
 import os
 import cv2
+import struct
 import time
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from PIL import Image, ImageTk
 from .Settings import *
-from .VideoProcessing import process_video
+from .VideoProcessing import analyse_frame, render_frame, present_frame, render_overlay, reset_pipeline_state, flush_pipeline, shutdown_pipeline
+from .utils.KeyframeIndex import KeyframeIndex
+from .utils.PyAVCapture import PyAVCapture
 
 
 class VideoPlayer(object):
@@ -51,6 +55,9 @@ class VideoPlayer(object):
         self.root = root
         self.root.title('Speed Estimation Application')
         self.root.geometry(self.APP_GEOMETRY)
+
+        # Persist the pipelines pending work before the window closes.
+        self.root.protocol('WM_DELETE_WINDOW', self.close_application)
         
         ''' Application Variables. '''
 
@@ -64,6 +71,35 @@ class VideoPlayer(object):
         self.current_vision_mode = self.vision_modes['Object Detection']
         self.base_confidence = BASE_YOLO_CONFIDENCE_THRESHOLD
 
+        # Playback clock, frames are processed against it and only rendered when the display is due a refresh.
+        self.display_interval = 1 / DISPLAY_MAX_FPS
+        self.last_rendered_at = 0
+        self.playback_started_at = 0
+        self.playback_start_frame = 0
+
+        # Frames are processed on a worker thread, handing only the latest rendered frame to the UI thread.
+        self.processing_thread = None
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.video_lock = threading.Lock()
+        self.frame_lock = threading.Lock()
+        self.latest_frame = None
+        self.seek_request = None
+        self.playback_finished = False
+        self.canvas_size = (1, 1)
+        self.playback_generation = 0
+
+        # Keyframe index of the current video, built in the background, and the pending debounced seek.
+        self.keyframe_index = None
+        self.seek_debounce_id = None
+
+        # Overlay messages of the current video, written alongside it in the overlay output mode.
+        self.overlay_file = None
+
+        # Single canvas image item, updated in place each frame.
+        self.canvas_image_item = None
+        self.canvas_photo = None
+
         ''' Application Widget Icons. '''
 
         self.directory_icon = customtkinter.CTkImage(
@@ -131,6 +167,9 @@ class VideoPlayer(object):
         self.video_canvas.pack(fill='both', expand=True, pady=self.PADDING['pady'], padx=225)
         self.video_canvas.pack_propagate(False)
 
+        # Track the canvas size for the worker thread, Tk may only be queried from the UI thread.
+        self.video_canvas.bind('<Configure>', lambda event: setattr(self, 'canvas_size', (max(1, event.width), max(1, event.height))))
+
         '''     Button Widgets.     '''
 
         self.import_video_button = customtkinter.CTkButton(master=self.player_controls_frame, image=self.search_icon, text='', command=self.source_video_import)
@@ -192,7 +231,7 @@ class VideoPlayer(object):
 
         # If media currently present playng, reset application.
         if self.video is not None:
-            self.stop_video_import()
+            self.delete_import()
         
         # Get filepath from users chosen media file. 
         video_capture_path = filedialog.askopenfilename(filetypes=[('Video files', '.mp4; *.avi; *.MOV')])
@@ -203,67 +242,130 @@ class VideoPlayer(object):
             self.is_stopped = False
             self.is_paused = False
             
-            # Read video capture from given path. 
-            self.video = cv2.VideoCapture(video_capture_path)
+            # Read video capture from given path, decoding with PyAV when selected and installed. 
+            if VIDEO_DECODE_BACKEND == 'pyav' and PyAVCapture.available:
+                self.video = PyAVCapture(video_capture_path, thread_count=VIDEO_DECODE_THREADS)
+            else:
+                self.video = cv2.VideoCapture(video_capture_path)
 
             if not self.video.isOpened():
                 self.video = None 
                 return
 
+            if DISPLAY_OUTPUT_MODE == 'overlay':
+                self.open_overlay_output(video_capture_path)
+
+            # Index keyframes in the background, seeks fall back to the capture backend until it is ready.
+            self.keyframe_index = None
+            threading.Thread(target=self.load_keyframe_index, args=(video_capture_path,), daemon=True).start()
+
             # Obtain medias properties. 
             self.fps = self.video.get(cv2.CAP_PROP_FPS)
-            self.frame_interval = max(1, int(1000 / self.fps))
             self.total_frames = max(1, int(self.video.get(cv2.CAP_PROP_FRAME_COUNT)))
 
             # If total frames > than 0 attesting video is valid, update seek bar to match video length.
             if self.total_frames != 0:
                 self.video_seek_bar.configure(from_=0, to=self.total_frames)
 
-            self.video_canvas.delete('all')
-            self.video_canvas.imgtk = None
+            self.clear_canvas()
 
             # Play video.
-            self.read_video()
+            self.play_pause_btn.configure(image=self.pause_icon)
+            self.start_processing()
     
 
+    def start_processing(self) -> None:
+
+        ''' Start the worker thread processing the video, and the UI thread loop displaying its output. '''
+
+        self.stop_event.clear()
+        self.playback_finished = False
+        self.reset_playback_clock()
+
+        self.processing_thread = threading.Thread(target=self.read_video, daemon=True)
+        self.processing_thread.start()
+
+        # Distinguish this playbacks display loop from any still scheduled by the previous one.
+        self.playback_generation += 1
+        self.refresh_display(self.playback_generation)
+
+
+    def stop_processing(self) -> None:
+
+        ''' Stop the worker thread, waiting for the frame it is processing to complete. '''
+
+        self.stop_event.set()
+        self.wake_event.set()
+
+        if self.processing_thread is not None:
+            self.processing_thread.join()
+            self.processing_thread = None
+
+        with self.frame_lock:
+            self.latest_frame = None
+
+
     def read_video(self) -> None:
         
         '''
-            Read selected video, process frames from that video in the VideoProcessing pipeline and return that 
-            processed frame into the tkinter canvas widget to be displayed to the user. 
+            Worker thread loop. Read selected video, process frames from that video in the VideoProcessing pipeline at the
+            pace of the playback clock and hand the latest processed frame over to be displayed to the user. 
         '''
 
-        # If video is playing.
-        if not self.is_paused and \
-            not self.is_stopped:
+        while not self.stop_event.is_set():
 
-            # Read from video capture whilst return == True. 
-            ret, frame = self.video.read()
+            with self.video_lock:
+                seek_to, self.seek_request = self.seek_request, None
 
-            if ret:
-                
-                # Update the play/pause button accordingly. 
-                self.play_pause_btn.configure(image=self.pause_icon)
+            # Idle whilst paused or finished, unless asked to seek.
+            if seek_to is None and (self.is_paused or self.playback_finished):
+                self.wake_event.wait(0.1)
+                self.wake_event.clear()
+                continue
 
-                # Update video slider. 
-                self.current_frame += 1
-                self.video_seek_bar.set(self.current_frame)
-            
+            with self.video_lock:
+
+                if seek_to is not None:
+                    self.seek_to_frame(seek_to)
+                    self.playback_finished = False
+                    self.reset_playback_clock()
+
+                    # Tracks and speeds from before the seek no longer apply.
+                    reset_pipeline_state()
+
+                # Read from video capture whilst return == True. 
+                ret, frame = self.video.read()
+
+                # Presentation timestamp of the frame, timing speeds by the footage rather than by processing.
+                frame_timestamp = self.video.get(cv2.CAP_PROP_POS_MSEC) / 1000
+
+            if not ret:
+                self.playback_finished = True
+                continue
+
+            self.current_frame += 1
+
+            # Hold frames processed ahead of the playback clock until they are due.
+            if seek_to is None:
+                frame_due_in = self.playback_started_at + (self.current_frame - self.playback_start_frame - 1) / self.fps - time.perf_counter()
+
+                if frame_due_in > 0:
+                    self.stop_event.wait(frame_due_in)
 
-                frame = self.process_video_for_canvas(frame=frame)
+            self.process_video_for_canvas(frame=frame, frame_timestamp=frame_timestamp, force_render=seek_to is not None)
 
 
-    def fetch_video_meta_data(self) -> None:
+    def fetch_video_meta_data(self, frame_number : int) -> None:
 
         '''
             Helper function to fetch meta data about the video being processed.
         '''
 
         # Get the current time within the video.
-        current_video_time = int(self.video.get(cv2.CAP_PROP_POS_FRAMES)) / self.video.get(cv2.CAP_PROP_FPS)
+        current_video_time = frame_number / self.fps
 
         # Get total video duration.
-        total_video_time = int(self.total_frames / self.video.get(cv2.CAP_PROP_FPS))
+        total_video_time = int(self.total_frames / self.fps)
 
         ## Convert timestamps into strings. 
         current_video_time_str = time.strftime('%M:%S', time.gmtime(current_video_time))
@@ -273,63 +375,164 @@ class VideoPlayer(object):
         self.video_time_label.configure(text=f'{current_video_time_str} / {total_video_time_str}')
 
 
-    def process_video_for_canvas(self, frame) -> None:
+    def process_video_for_canvas(self, frame, frame_timestamp : float = None, force_render : bool = False) -> None:
 
         '''
             Helper function to take frame, parse it in the video processing pipeline and convert it 
-            into a format suitable for tkinter canvas widgets. 
+            into a format suitable for tkinter canvas widgets. Every frame is analysed, but only rendered once the
+            display is due a refresh, the rendered frame replacing any the UI thread has not yet displayed.
         '''
 
-        # Get width and height of the canvas widget. 
-        canvas_width = self.video_canvas.winfo_width()
-        canvas_height = self.video_canvas.winfo_height()
-
         # Run model inference pipeline on the retrieved frame.
-        inference_frame = process_video(
+        detections = analyse_frame(
             frame=frame,
             speed_limit=self.current_speed_limit,
             frame_rate=self.fps,
-            vision_type=self.current_vision_mode,
-            confidence_threshold=self.base_confidence
+            confidence_threshold=self.base_confidence,
+            frame_timestamp=frame_timestamp
         )
-        
 
-        # Retrieve meta data about media being processed. 
-        self.fetch_video_meta_data()
+        # Every analysed frame has its overlays described, whether displayed or not.
+        if self.overlay_file is not None:
+            self.write_overlay(frame, detections, frame_timestamp)
+
+        if force_render or time.perf_counter() - self.last_rendered_at >= self.display_interval:
+
+            self.last_rendered_at = time.perf_counter()
+
+            if DISPLAY_OUTPUT_MODE == 'overlay':
+                # Overlays are left to the viewer, the frame is only resized to the canvas resolution, in RGB.
+                inference_frame = present_frame(frame=frame, output_size=self.canvas_size, output_rgb=True)
+            else:
+                # Frame is returned resized and annotated at the canvas resolution, in RGB.
+                inference_frame = render_frame(
+                    frame=frame,
+                    detections=detections,
+                    vision_type=self.current_vision_mode,
+                    output_size=self.canvas_size,
+                    output_rgb=True
+                )
+
+            with self.frame_lock:
+                self.latest_frame = (inference_frame, self.current_frame)
+
+
+    def refresh_display(self, playback_generation : int) -> None:
+
+        '''
+            UI thread loop, displaying the latest frame handed over by the worker thread. Frames replaced before they could
+            be displayed are dropped.
+        '''
+
+        if self.processing_thread is None or playback_generation != self.playback_generation:
+            return
+
+        with self.frame_lock:
+            latest_frame, self.latest_frame = self.latest_frame, None
+
+        if latest_frame is not None:
+
+            inference_frame, frame_number = latest_frame
+            image = Image.fromarray(inference_frame)
+
+            # Update the existing canvas image in place, only replacing it when the canvas has been resized.
+            if self.canvas_photo is not None and (self.canvas_photo.width(), self.canvas_photo.height()) == image.size:
+                self.canvas_photo.paste(image)
+            else:
+                self.canvas_photo = ImageTk.PhotoImage(image)
+
+                if self.canvas_image_item is None:
+                    self.canvas_image_item = self.video_canvas.create_image(0, 0, image=self.canvas_photo, anchor=tk.NW)
+                else:
+                    self.video_canvas.itemconfigure(self.canvas_image_item, image=self.canvas_photo)
+
+            # Update video slider. 
+            self.video_seek_bar.set(frame_number)
+
+            # Retrieve meta data about media being processed. 
+            self.fetch_video_meta_data(frame_number)
+
+        if self.playback_finished:
+            self.play_pause_btn.configure(image=self.play_icon)
+
+        self.root.after(max(1, int(self.display_interval * 1000)), self.refresh_display, playback_generation)
+
+
+    def clear_canvas(self) -> None:
 
-        # Process frame frame processing for tkinter canvas widget. 
-        frame = cv2.cvtColor(inference_frame, cv2.COLOR_BGR2RGB)
-        frame = cv2.resize(frame, (canvas_width, canvas_height))
-        frame = ImageTk.PhotoImage(Image.fromarray(frame))
+        ''' Remove the displayed frame from the canvas. '''
 
-        # Update canvas widget with current frame.
-        self.video_canvas.imgtk = frame 
-        self.video_canvas.create_image(0, 0, image=frame, anchor = tk.NW)
-        self.video_canvas.after(self.frame_interval, self.read_video)
+        self.video_canvas.delete('all')
+        self.canvas_image_item = None
+        self.canvas_photo = None
+
+
+    def reset_playback_clock(self) -> None:
+
+        ''' Restart the playback clock from the current frame, after starting, resuming or seeking playback. '''
+
+        self.playback_started_at = time.perf_counter()
+        self.playback_start_frame = self.current_frame
+
+
+    def load_keyframe_index(self, video_capture_path : str) -> None:
+
+        ''' Load, or build and cache, the keyframe index of a video. '''
+
+        self.keyframe_index = KeyframeIndex(video_capture_path)
+
+
+    def seek_to_frame(self, frame_number : int) -> None:
+
+        '''
+            Position the video capture at a frame by seeking to the nearest keyframe before it and decoding forward, without
+            retrieving the skipped frames. Frames later within the current group of pictures are decoded forward to
+            without seeking at all. Called from the worker thread whilst holding the video lock.
+        '''
+
+        keyframe = self.keyframe_index.nearest_keyframe(frame_number) if self.keyframe_index is not None else None
+
+        if keyframe is None:
+            # Not indexed, leave seeking to the capture backend.
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+            self.current_frame = frame_number
+            return
+
+        if not keyframe <= self.current_frame <= frame_number:
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+            self.current_frame = keyframe
+
+        while self.current_frame < frame_number and self.video.grab():
+            self.current_frame += 1
 
 
     def seek_video(self, frame_no) -> None:
 
         '''
-            Update seek bar so user can choose which parts of the video can be viewed. 
+            Update seek bar so user can choose which parts of the video can be viewed. Slider movements are debounced,
+            seeking only once the slider settles, with the worker thread seeking and displaying the chosen frame whether
+            playing or paused.
         '''
-        
-        # Update current frame with parsed frame number.
-        self.current_frame = int(float(frame_no))
 
-        # Set video to the frame number being parsed. 
-        self.video.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
+        if self.video is None:
+            return
 
-        # If video paused.
-        if self.is_paused:
-            
-            # Read the video.
-            ret, frame = self.video.read()
+        if self.seek_debounce_id is not None:
+            self.root.after_cancel(self.seek_debounce_id)
+
+        self.seek_debounce_id = self.root.after(SEEK_DEBOUNCE_MS, self.request_seek, int(float(frame_no)))
+
+
+    def request_seek(self, frame_number : int) -> None:
+
+        ''' Hand a settled seek over to the worker thread. '''
 
-            # If frame is retrieved successfully. 
-            if ret:
+        self.seek_debounce_id = None
 
-                frame = self.process_video_for_canvas(frame=frame)
+        with self.video_lock:
+            self.seek_request = frame_number
+
+        self.wake_event.set()
 
 
     def handle_video_state(self) -> None:
@@ -339,8 +542,9 @@ class VideoPlayer(object):
         '''
 
         if self.is_paused:
+            self.reset_playback_clock()
             self.is_paused = False
-            self.read_video()
+            self.wake_event.set()
             self.play_pause_btn.configure(image=self.pause_icon)
         
         else:
@@ -386,13 +590,70 @@ class VideoPlayer(object):
 
         self.is_stopped = True
         self.is_paused = True
+
+        if self.seek_debounce_id is not None:
+            self.root.after_cancel(self.seek_debounce_id)
+            self.seek_debounce_id = None
+
+        self.stop_processing()
+        self.seek_request = None
         self.current_frame = 0
 
-        self.video_canvas.delete('all')
-        self.video_canvas.imgtk = None
+        # The stream has ended, persist its tracks, clips and violations before another is imported.
+        flush_pipeline()
+
+        self.clear_canvas()
         self.video_seek_bar.set(self.current_frame)
         self.play_pause_btn.configure(image=self.play_icon)
 
         if self.video is not None:
             self.video.release()
             self.video = None
+
+        if self.overlay_file is not None:
+            self.overlay_file.close()
+            self.overlay_file = None
+
+
+    def open_overlay_output(self, video_capture_path : str) -> None:
+
+        '''
+            Open the file overlay messages are written to, stored alongside the video. JSON messages are written one per
+                line, binary messages prefixed by their length.
+        '''
+
+        extension = 'jsonl' if OVERLAY_ENCODING == 'json' else 'bin'
+
+        try:
+            self.overlay_file = open(f'{video_capture_path}.overlays.{extension}', 'wb')
+        except OSError as e:
+            print(f'Error occurred opening overlay output! \n{e}')
+
+
+    def write_overlay(self, frame, detections : list[dict], frame_timestamp : float = None) -> None:
+
+        ''' Encode a frames overlays and write the message, timestamped so viewers can match it to its frame. '''
+
+        frame_height, frame_width = frame.shape[:2]
+
+        message = render_overlay(
+            detections=detections,
+            frame_size=(frame_width, frame_height),
+            vision_type=self.current_vision_mode,
+            timestamp=frame_timestamp,
+            encoding=OVERLAY_ENCODING
+        )
+
+        if OVERLAY_ENCODING == 'json':
+            self.overlay_file.write(message + b'\n')
+        else:
+            self.overlay_file.write(struct.pack('<I', len(message)) + message)
+
+
+    def close_application(self) -> None:
+
+        ''' Stop any video being processed and shut the pipeline down, flushing its background workers, before closing. '''
+
+        self.delete_import()
+        shutdown_pipeline()
+        self.root.destroy()
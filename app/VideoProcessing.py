@@ -1,44 +1,243 @@
+import atexit
+import time
+import cv2
 import numpy as np
 
 from .Settings import *
 
 from .utils.ObjectDetection import ObjectDetection
 from .utils.ObjectTracking import ObjectTracking
+from .utils.TrajectoryArchive import TrajectoryArchive
+from .utils.EventLog import EventLog
 from .utils.SpeedEstimation import SpeedEstimation
+from .utils.SpeedTrap import SpeedTrap
 from .utils.Captures import Captures
+from .utils.EvidenceWriter import EvidenceWriter
+from .utils.FrameRingBuffer import FrameRingBuffer
+from .utils.ViolationStore import ViolationStore
 from .utils.ANPR import ANPR
+from .utils.PlateHotlist import PlateHotlist
+from .utils.AverageSpeedCheck import AverageSpeedCheck
 from .utils.Annotations import Annotations
 
 # Intstantiate objects to mimic singleton pipeline.
 annotations = Annotations()
 vehicle_detection = ObjectDetection(model=DETECTION_MODEL_PATH, confidence_threshold=BASE_YOLO_CONFIDENCE_THRESHOLD)
 plate_detection = ObjectDetection(model=PLATE_DETECTION_MODEL_PATH, confidence_threshold=PLATE_YOLO_CONFIDENCE_THRESHOLD)
-object_tracking = ObjectTracking()
+trajectory_archive = TrajectoryArchive(archive_dir=TRAJECTORY_ARCHIVE_DIR_PATH, chunk_size=TRAJECTORY_ARCHIVE_CHUNK_SIZE) if TRAJECTORY_ARCHIVE_ENABLED else None
+object_tracking = ObjectTracking(trajectory_archive=trajectory_archive)
 speed_estimation = SpeedEstimation()
-captures = Captures(annotations=annotations) 
-anpr = ANPR(detection_model=plate_detection, ocr_lang='en', ocr_gpu=True)
+offline_speed_estimation = SpeedEstimation(offline_mode=True)
+speed_trap = SpeedTrap(lanes=SPEED_TRAP_LANES)
+violation_store = ViolationStore(database_path=VIOLATION_DATABASE_PATH, batch_size=VIOLATION_BATCH_SIZE, flush_interval=VIOLATION_FLUSH_INTERVAL)
+evidence_writer = EvidenceWriter(
+    annotations=annotations,
+    output_dir=CAPTURES_DIR_PATH,
+    violation_store=violation_store,
+    jpeg_quality=EVIDENCE_JPEG_QUALITY,
+    max_queue_size=EVIDENCE_QUEUE_SIZE
+)
+frame_ring_buffer = FrameRingBuffer(
+    pre_event_seconds=EVIDENCE_CLIP_PRE_SECONDS,
+    post_event_seconds=EVIDENCE_CLIP_POST_SECONDS,
+    jpeg_quality=EVIDENCE_CLIP_JPEG_QUALITY,
+    scale=EVIDENCE_CLIP_SCALE,
+    violation_store=violation_store
+) if EVIDENCE_CLIPS_ENABLED else None
+captures = Captures(annotations=annotations, evidence_writer=evidence_writer, frame_ring_buffer=frame_ring_buffer, violation_store=violation_store)
+anpr = ANPR(
+    detection_model=plate_detection,
+    ocr_lang='en',
+    ocr_gpu=True,
+    ocr_batch_frames=ANPR_OCR_BATCH_FRAMES,
+    async_workers=ANPR_ASYNC_WORKERS,
+    async_queue_size=ANPR_ASYNC_QUEUE_SIZE,
+    max_read_attempts=ANPR_MAX_READ_ATTEMPTS,
+    consensus_margin=ANPR_CONSENSUS_MARGIN,
+    plate_search_size=ANPR_PLATE_SEARCH_SIZE,
+    plate_band_search_size=ANPR_PLATE_BAND_SEARCH_SIZE,
+    ocr_cache_size=ANPR_OCR_CACHE_SIZE
+)
+plate_hotlist = PlateHotlist(csv_path=PLATE_HOTLIST_PATH, confusion_map=anpr.char_2_int_dict)
+anpr.plate_hotlist = plate_hotlist
+
+# Reload hotlist changes in the background without pausing the pipeline.
+plate_hotlist.start_watching()
+
+event_log = EventLog(
+    output_dir=EVENT_LOG_DIR_PATH,
+    output_format=EVENT_LOG_FORMAT,
+    batch_rows=EVENT_LOG_BATCH_ROWS,
+    max_pending_batches=EVENT_LOG_MAX_PENDING_BATCHES,
+    max_file_seconds=EVENT_LOG_FILE_SECONDS
+) if EVENT_LOG_ENABLED else None
+
+average_speed_check = AverageSpeedCheck(
+    database_path=AVERAGE_SPEED_DATABASE_PATH,
+    camera_id=CAMERA_ID,
+    site_pairs=AVERAGE_SPEED_SITE_PAIRS,
+    sighting_window=AVERAGE_SPEED_SIGHTING_WINDOW
+)
 
 # Inform users whether hardware acceleration is being used or not. 
 vehicle_detection.check_for_hardware_acceleration()
 plate_detection.check_for_hardware_acceleration()
 
+# Whether shutdown_pipeline has run, it may be called by both the window closing and the interpreter exiting.
+pipeline_shut_down = False
+
+
+def reset_pipeline_state() -> None:
+
+    '''
+        Reset per stream state after seeking, so tracks are not matched across the jump and the first frames after a seek
+            do not produce speeds from positions before it. Per ID state elsewhere is left to expire, IDs are never reused.
+    '''
+
+    object_tracking.reset_tracker()
+    speed_estimation.reset_estimations()
+    offline_speed_estimation.reset_estimations()
+    speed_trap.reset_trap()
+
+    if frame_ring_buffer is not None:
+        frame_ring_buffer.reset()
+
+
+def flush_pipeline() -> None:
+
+    '''
+        End the current stream, persisting everything it left pending without stopping any background workers, so the
+            pipeline can go on to process another stream. Active tracks are ended, archiving their trajectories, clips
+            still collecting post event frames are written and buffered violations and sightings are committed.
+    '''
+
+    reset_pipeline_state()
+
+    # Tracks ended by the reset have their final offline speeds estimated.
+    record_final_speeds(time.time())
+
+    violation_store.flush()
+    average_speed_check.commit()
+
+    if trajectory_archive is not None:
+        trajectory_archive.commit()
+
+    if event_log is not None:
+        event_log.flush(block=True)
+
+
+def shutdown_pipeline() -> None:
+
+    '''
+        Flush the pipeline, then stop and join every background worker and close every store, once the application is
+            exiting. Workers are daemon threads, anything not flushed here would be lost on exit.
+    '''
+
+    global pipeline_shut_down
 
-def process_video(frame : np.ndarray, speed_limit : int = 0, frame_rate : int = 30, vision_type : str = 'object_detection', confidence_threshold :float = BASE_YOLO_CONFIDENCE_THRESHOLD) -> np.ndarray:
+    if pipeline_shut_down:
+        return
+
+    pipeline_shut_down = True
+
+    flush_pipeline()
+
+    anpr.shutdown()
+    plate_hotlist.stop_watching()
+
+    # Clips and evidence are written before the stores they are recorded in are closed.
+    if frame_ring_buffer is not None:
+        frame_ring_buffer.shutdown()
+
+    evidence_writer.shutdown()
+    violation_store.close()
+    average_speed_check.close()
+
+    if trajectory_archive is not None:
+        trajectory_archive.close()
+
+    # Completes the current log file, Parquet and Arrow IPC files are unreadable without their footer.
+    if event_log is not None:
+        event_log.shutdown()
+
+
+# Persist pending work however the application exits.
+atexit.register(shutdown_pipeline)
+
+
+def record_final_speeds(recorded_at : float) -> None:
+
+    ''' Write the final speeds of offline estimated tracks that have ended into the violation store and event log. '''
+
+    final_estimates = offline_speed_estimation.pop_final_estimates()
+
+    if not final_estimates:
+        return
+
+    captures.record_final_speeds(final_estimates, recorded_at=recorded_at)
+
+    if event_log is not None:
+        event_log.record_final_speeds(final_estimates, recorded_at=recorded_at)
+
+
+def process_video(frame : np.ndarray, speed_limit : int = 0, frame_rate : int = 30, vision_type : str = 'object_detection', confidence_threshold :float = BASE_YOLO_CONFIDENCE_THRESHOLD, speed_method : str = SPEED_ESTIMATION_METHOD, output_size : tuple[int, int] = None, output_rgb : bool = False, frame_timestamp : float = None) -> np.ndarray:
     
     '''
+        Analyse a frame and render its annotations, see analyse_frame and render_frame.
+
         Paramaters:
-            * 
+            * output_size : tuple[int, int] -> width and height to resize and annotate the output frame at, None for full
+                resolution. Analysis and evidence captures always use the full resolution frame.
+            * output_rgb : bool -> convert the output frame to RGB, at the output resolution, for display.
 
         Returns:
-            * 
+            * annotated_frame : np.ndarray -> annotated frame.
+    '''
+
+    detections = analyse_frame(
+        frame=frame,
+        speed_limit=speed_limit,
+        frame_rate=frame_rate,
+        confidence_threshold=confidence_threshold,
+        speed_method=speed_method,
+        frame_timestamp=frame_timestamp
+    )
+
+    return render_frame(frame=frame, detections=detections, vision_type=vision_type, output_size=output_size, output_rgb=output_rgb)
+
+
+def analyse_frame(frame : np.ndarray, speed_limit : int = 0, frame_rate : int = 30, confidence_threshold :float = BASE_YOLO_CONFIDENCE_THRESHOLD, speed_method : str = SPEED_ESTIMATION_METHOD, frame_timestamp : float = None) -> list[dict]:
+
     '''
+        Run every analysis stage of the pipeline on a frame, without annotating it. Frames that will not be displayed or
+            saved, whether dropped by the display or processed headless, only need analysing.
+
+        Paramaters:
+            * frame : np.ndarray -> full resolution frame.
+            * frame_timestamp : float -> presentation timestamp of the frame in seconds, from the capture, None for live
+                sources, which are timed by the current time. Times tracking, speed estimation and the speed trap.
+
+        Returns:
+            * detections : list[dict] -> fully processed detections, to be passed to render_frame.
+    '''
+
+    # Speeds are timed by the footage, staying accurate whether frames are processed faster or slower than real time.
+    # Stored and cross site records are stamped with wall clock time, comparable between streams and camera sites.
+    recorded_at = time.time()
+    stream_time = recorded_at if frame_timestamp is None else frame_timestamp
 
     # Update framerate variables once function is called from media being parsed to improve measurements accuracy.
     vehicle_detection.confidence_threshold = confidence_threshold
     object_tracking.frame_rate = frame_rate
     speed_estimation.frame_rate = frame_rate
+    offline_speed_estimation.frame_rate = frame_rate
     captures.speed_limit = speed_limit
 
+    # Buffer the raw frame for any evidence clips.
+    if frame_ring_buffer is not None:
+        frame_ring_buffer.set_frame_rate(frame_rate)
+        frame_ring_buffer.add_frame(frame, frame_timestamp=stream_time)
+
 
     ''' Object Detection. '''
 
@@ -48,26 +247,122 @@ def process_video(frame : np.ndarray, speed_limit : int = 0, frame_rate : int =
     ''' Object Tracking '''
 
     # Assign IDs to detections and update their center point values.
-    tracked_detections : list[dict] = object_tracking.update_tracker(detections=detections)
+    tracked_detections : list[dict] = object_tracking.update_tracker(detections=detections, updated_at=stream_time)
 
     ''' Speed Estimation. '''
 
-    # Estimate a detections speed by comparing current and previous center points. 
-    speed_estimation_detections : list[dict] = speed_estimation.apply_estimations(detections=tracked_detections)
+    if speed_method == 'speed_trap':
+        # Time detections crossing the configured lane lines, producing a single speed per vehicle.
+        speed_estimation_detections : list[dict] = speed_trap.apply_speed_trap(detections=tracked_detections, updated_at=stream_time)
+    elif speed_method == 'offline':
+        # Record whole trajectories, final speeds are estimated once each track ends.
+        speed_estimation_detections : list[dict] = offline_speed_estimation.apply_estimations(detections=tracked_detections, updated_at=stream_time)
+        record_final_speeds(recorded_at)
+    else:
+        # Estimate a detections speed by comparing current and previous center points. 
+        speed_estimation_detections : list[dict] = speed_estimation.apply_estimations(detections=tracked_detections, updated_at=stream_time)
+
+    ''' ANPR. '''
+
+    # Read plates ahead of violation checks so captures record any plate already confirmed.
+    anpr_detections = anpr.process_detection_plates(frame=frame, detections=speed_estimation_detections, updated_at=recorded_at)
 
     ''' Violation Checks. '''
 
-    captured_detections = captures.compare_speed(detections=speed_estimation_detections, frame=frame)
+    captured_detections = captures.compare_speed(detections=anpr_detections, frame=frame, detected_at=recorded_at)
 
-    ''' ANPR. '''
-  
-    anpr_detections = anpr.process_detection_plates(frame=frame, detections=captured_detections)
+    ''' Average Speed Checks. '''
+
+    # Match confirmed plates against sightings at paired camera sites, capturing those averaging over the limit.
+    average_speed_detections = average_speed_check.check_detections(detections=captured_detections, seen_at=recorded_at)
+
+    average_speed_captured_detections = captures.compare_speed(detections=average_speed_detections, frame=frame, speed_key='average_speed', detected_at=recorded_at)
 
-    ''' Frame Annotation. '''
+    ''' Trajectory Archive. '''
+
+    # Record each detections position, speed and plate, archived once its track ends.
+    if trajectory_archive is not None:
+        trajectory_archive.record_detections(detections=average_speed_captured_detections, recorded_at=recorded_at)
+
+    ''' Event Log. '''
+
+    # Record what was seen this frame, written in batches away from the frame loop.
+    if event_log is not None:
+        event_log.record_frame(detections=average_speed_captured_detections, recorded_at=recorded_at)
+
+    return average_speed_captured_detections
+
+
+def render_frame(frame : np.ndarray, detections : list[dict], vision_type : str = 'object_detection', output_size : tuple[int, int] = None, output_rgb : bool = False) -> np.ndarray:
+
+    '''
+        Annotate a frame with its analysed detections.
+
+        Paramaters:
+            * frame : np.ndarray -> full resolution frame the detections were analysed from.
+            * detections : list[dict] -> detections returned by analyse_frame.
+            * output_size : tuple[int, int] -> width and height to resize and annotate the output frame at, None for full
+                resolution.
+            * output_rgb : bool -> convert the output frame to RGB, at the output resolution, for display.
+
+        Returns:
+            * annotated_frame : np.ndarray -> annotated frame.
+    '''
 
     # Supply the final step of processed data to be annotated for traffic insights. 
-    annotated_frame = annotations.annotate_frame(frame=frame, detections=anpr_detections, vision_type=vision_type)
+    annotated_frame = annotations.annotate_frame(frame=frame, detections=detections, vision_type=vision_type, output_size=output_size)
+
+    # Convert colour after any resize, touching only output resolution pixels.
+    if output_rgb:
+        annotated_frame = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
 
     # Return frame whether modified or not. 
     return annotated_frame
 
+
+def present_frame(frame : np.ndarray, output_size : tuple[int, int] = None, output_rgb : bool = False) -> np.ndarray:
+
+    '''
+        Prepare a frame for display without annotating it, its overlays being rendered by the viewer from render_overlay.
+
+        Paramaters:
+            * frame : np.ndarray -> full resolution frame.
+            * output_size : tuple[int, int] -> width and height to resize the output frame to, None for full resolution.
+            * output_rgb : bool -> convert the output frame to RGB, at the output resolution, for display.
+
+        Returns:
+            * output_frame : np.ndarray -> untouched frame, resized and converted as requested.
+    '''
+
+    output_frame = frame
+
+    if output_size is not None:
+        output_width, output_height = int(output_size[0]), int(output_size[1])
+        interpolation = cv2.INTER_AREA if output_width < frame.shape[1] and output_height < frame.shape[0] else cv2.INTER_LINEAR
+        output_frame = cv2.resize(frame, (output_width, output_height), interpolation=interpolation)
+
+    if output_rgb:
+        output_frame = cv2.cvtColor(output_frame, cv2.COLOR_BGR2RGB)
+
+    return output_frame
+
+
+def render_overlay(detections : list[dict], frame_size : tuple[int, int], vision_type : str = 'object_detection', timestamp : float = None, encoding : str = OVERLAY_ENCODING) -> bytes:
+
+    '''
+        Describe a frames overlays as an encoded message instead of drawing them, leaving the frame untouched so it can be
+            passed through without re-encoding and the overlays rendered by the viewer.
+
+        Paramaters:
+            * detections : list[dict] -> detections returned by analyse_frame.
+            * frame_size : tuple[int, int] -> width and height of the analysed frame.
+            * timestamp : float -> timestamp of the frame within the stream.
+            * encoding : str -> 'json' or 'binary'.
+
+        Returns:
+            * message : bytes -> encoded overlay primitives.
+    '''
+
+    overlay = annotations.create_overlay(detections=detections, vision_type=vision_type, frame_size=frame_size, timestamp=timestamp)
+
+    return annotations.encode_overlay(overlay=overlay, encoding=encoding)
@@ -3,6 +3,12 @@ import cv2
 import numpy as np 
 import re 
 from .ObjectDetection import ObjectDetection
+from .BboxUtils import letterbox_frame
+from .ANPRWorkerPool import ANPRWorkerPool
+from .PlateReadScheduler import PlateReadScheduler
+from .PlateConsensus import PlateConsensus
+from .PlateReadCache import PlateReadCache
+from .PlateHotlist import PlateHotlist
 import time 
 from rapidfuzz import fuzz
 
@@ -11,15 +17,34 @@ class ANPR(object):
 
     ''' '''
 
-    def __init__(self, detection_model : ObjectDetection, ocr_lang='en', ocr_gpu=True, deregistration_time : int = 12, plate_similarity_threshold : int = 85):
+    def __init__(
+        self,
+        detection_model : ObjectDetection,
+        ocr_lang='en',
+        ocr_gpu=True,
+        deregistration_time : int = 12,
+        plate_similarity_threshold : int = 85,
+        recognition_only : bool = True,
+        ocr_batch_frames : int = 1,
+        ocr_batch_height : int = 64,
+        async_workers : int = 0,
+        async_queue_size : int = 8,
+        max_read_attempts : int = 5,
+        consensus_margin : float = 1.0,
+        plate_search_size : int = 320,
+        plate_band_search_size : int = 224,
+        ocr_cache_size : int = 256,
+        plate_hotlist : PlateHotlist = None,
+        hotlist_alert = None
+    ):
         
         ''' '''
 
         # Use object detection modules detection logic. 
         self.detection_model = detection_model
 
-        # Initialise ocr text reader. 
-        self.ocr_text_reader = easyocr.Reader([ocr_lang], gpu=ocr_gpu)
+        self.ocr_lang = ocr_lang
+        self.ocr_gpu = ocr_gpu
 
         # Maximum plate length allowed.
         self.UK_MAX_PLATE_LENGTH = 7 
@@ -33,16 +58,86 @@ class ANPR(object):
 
         self.plate_similarity_threshold = plate_similarity_threshold
 
+        # Skip EasyOCRs text detector on plates already localised by the plate detection model.
+        self.recognition_only = recognition_only
+
+        # Number of frames to accumulate plate crops over before reading them in a single batch.
+        self.ocr_batch_frames = max(1, ocr_batch_frames)
+        # Common height plate crops are resized to when batched.
+        self.ocr_batch_height = ocr_batch_height
+        self.pending_plate_reads = {}
+        self.batched_frames = 0
+
+        # Plates of interest every consensus plate is checked against, and an optional callable alerted of each match
+        # with the tracks ID, plate and matches.
+        self.plate_hotlist = plate_hotlist
+        self.hotlist_alert = hotlist_alert
+
+        # Reuse OCR results for near identical plate crops.
+        self.plate_read_cache = PlateReadCache(capacity=ocr_cache_size)
+
+        # Fixed size vehicle crops are letterboxed to so a frames plates are detected in a single batched pass.
+        self.plate_search_size = plate_search_size
+        # Smaller fixed size used when only searching the band of a vehicle its plate is expected in.
+        self.plate_band_search_size = plate_band_search_size
+
+        # Decide which frames are worth reading, bounding plate reads per track.
+        self.read_scheduler = PlateReadScheduler(max_attempts=max_read_attempts, deregistration_time=deregistration_time)
+
+        # Vote across successive reads of a track, finalising its plate once the reads agree.
+        self.plate_consensus = PlateConsensus(consensus_margin=consensus_margin, deregistration_time=deregistration_time)
+
         # Mapping dictionaries for characters that can be easily mistaken.
         self.char_2_int_dict = {'O': '0','I': '1','J': '3','A': '4','G': '6','S': '5'}
         self.int_2_char_dict = {'0': 'O','1': 'I','3': 'J','4': 'A','6': 'G','5': 'S'}
 
+        # Hand plate reads to background workers, each with their own models, when requested. Started last, as workers
+        # create their models from the configuration above.
+        self.worker_pool = None
+        self.submitted_plate_reads = set()
 
-    def process_detection_plates(self, frame : np.ndarray, detections : list[dict]) -> list[dict]:
+        if async_workers > 0:
+            self.ocr_text_reader = None
+            self.worker_pool = ANPRWorkerPool(worker_factory=self.create_worker, num_workers=async_workers, max_queue_size=async_queue_size)
+        else:
+            # Initialise ocr text reader. 
+            self.ocr_text_reader = easyocr.Reader([ocr_lang], gpu=ocr_gpu)
 
-        ''' '''
 
-        updated_at = time.time()
+    def process_detection_plates(self, frame : np.ndarray, detections : list[dict], updated_at : float = None) -> list[dict]:
+
+        '''
+            Read license plates on each detection not recently read. With a worker pool, vehicle crops are handed to the 
+                background workers and detections show as PENDING until their result arrives. Otherwise plate crops are
+                queued so every crop gathered over the batching window is read in a single batched OCR call.
+
+            Parameters:
+                * frame : np.ndarray -> current frame the detections were made upon.
+                * detections : list[dict] -> tracked detections.
+                * updated_at : float -> timestamp of the current frame, defaults to the current time.
+
+            Returns:
+                * detections : list[dict] -> detections updated with their license plate data.
+        '''
+
+        if updated_at is None:
+            updated_at = time.time()
+
+        # Plate detections of reads completed by the background workers, attached to their detections this frame.
+        plate_metadata = {}
+
+        # Attach any plates read by the background workers since the last frame.
+        if self.worker_pool is not None:
+            plate_results = self.worker_pool.collect_results()
+            self.submitted_plate_reads.difference_update(plate_results.keys())
+            plate_metadata = {ID : plate_detections for ID, (_, plate_detections) in plate_results.items()}
+            self.apply_plate_reads({ID : plate_read for ID, (plate_read, _) in plate_results.items()}, updated_at)
+
+            # Every worker failed to load its models, read plates inline instead.
+            if self.worker_pool.failed:
+                self.fall_back_to_inline_reads()
+
+        frame_vehicle_crops = {}
 
         # Iterate over each detection dictionary entry.
         for detection in detections:
@@ -50,69 +145,401 @@ class ANPR(object):
             ID = detection.get('ID')
 
             detection.setdefault('license_plate', {}).setdefault('plate_text', '')
-            self.detection_plates.setdefault(ID, {'plate_text' : 'OCCLUDED', 'last_seen' : 0})
+            self.detection_plates.setdefault(ID, {'plate_text' : 'PENDING'})['last_seen'] = updated_at
 
-            # Check if plate has already been handled. 
-            if updated_at - self.detection_plates[ID]['last_seen'] < self.deregistration_time:
-                detection.setdefault('license_plate', {})['plate_text'] = self.detection_plates[ID]['plate_text']
-                continue
+            # Confirmed tracks skip the scheduler and stop voting below, keep their state alive whilst they remain in view.
+            self.read_scheduler.touch(ID, updated_at)
+            self.plate_consensus.touch(ID, updated_at)
 
-            plate_found = False 
+            # Check if plate has already been confirmed or is awaiting a read. 
+            if self.read_scheduler.is_confirmed(ID) or \
+                ID in self.pending_plate_reads or \
+                ID in self.submitted_plate_reads:
+                detection['license_plate']['plate_text'] = self.fetch_plate_text(ID)
+                continue
 
             # Crop frame for focusing model inference. 
             detection_frame_crop = self.crop_frame_from_detection_data(frame, detection)
 
-            # Detect licence plate through applied transfer learning. 
-            plate_detections = self.detection_model.run_inference(detection_frame_crop)
+            # Only spend plate reads on the best crops of each track.
+            crop_score = self.read_scheduler.score_vehicle_crop(frame, detection, detection_frame_crop)
+
+            if not self.read_scheduler.should_attempt(ID, crop_score, updated_at):
+                # Tracks whose crops never score well enough to read are given up on once their time runs out.
+                self.mark_occluded(ID)
+                detection['license_plate']['plate_text'] = self.fetch_plate_text(ID)
+                continue
+
+            if self.worker_pool is not None:
+
+                # Workers own the crop, copy it out of the frame. Full queues are retried next frame.
+                if self.worker_pool.submit(ID, (detection_frame_crop.copy(), self.fetch_plate_search_band(detection))):
+                    self.submitted_plate_reads.add(ID)
+                    self.read_scheduler.record_attempt(ID, crop_score, updated_at)
+
+                detection['license_plate']['plate_text'] = self.fetch_plate_text(ID)
+                continue
 
-            if plate_detections:
+            self.read_scheduler.record_attempt(ID, crop_score, updated_at)
 
-                sorted_plates = sorted(plate_detections, key = lambda plate: plate['confidence_score'], reverse=True)
+            # Gather vehicle crops so plates are detected across the whole frame in one pass.
+            frame_vehicle_crops[ID] = (detection, detection_frame_crop)
 
-                for plate in sorted_plates:
-           
-                    license_plate = self.extract_license_plate(frame, detection, plate)
+        if frame_vehicle_crops:
 
-                    # If plate text has been returned.
-                    if license_plate:
+            # Detect licence plates through applied transfer learning. 
+            plate_results = self.detect_plate_crops(
+                [vehicle_crop for _, vehicle_crop in frame_vehicle_crops.values()],
+                [self.fetch_plate_search_band(detection) for detection, _ in frame_vehicle_crops.values()]
+            )
 
-                        self.detection_plates[ID]['plate_text'] = license_plate
-                        self.detection_plates[ID]['last_seen'] = updated_at
-                        plate_found = True
-                        continue
-                    
-            detection['license_plate']['metadata'] = plate_detections
-            detection['license_plate']['plate_text'] = self.detection_plates[ID]['plate_text']
+            for (ID, (detection, _)), (plate_detections, cropped_plates) in zip(frame_vehicle_crops.items(), plate_results):
 
-            if not plate_found:
-                self.detection_plates[ID]['plate_text'] = 'OCCLUDED'
+                # Queue plate crops in order of confidence for the batched read.
+                if cropped_plates:
+                    # Copied as reads may be batched across frames, whose buffers the frame source may reuse.
+                    self.pending_plate_reads[ID] = [cropped_plate.copy() for cropped_plate in cropped_plates]
+                else:
+                    self.apply_plate_reads({ID : None}, updated_at)
+                        
+                detection['license_plate']['metadata'] = plate_detections
+                detection['license_plate']['plate_text'] = self.detection_plates[ID]['plate_text']
+
+        # Read all queued plates once the batching window has elapsed.
+        self.batched_frames += 1
+
+        if self.batched_frames >= self.ocr_batch_frames:
+            self.flush_plate_reads(updated_at)
+
+        # Attach whether each detections plate is final and any hotlist matches for it.
+        for detection in detections:
+
+            if detection.get('ID') in plate_metadata:
+                detection['license_plate']['metadata'] = plate_metadata[detection.get('ID')]
+
+            self.check_hotlist(detection.get('ID'))
+
+            detection['license_plate']['final'] = self.plate_consensus.is_final(detection.get('ID'))
+            detection['license_plate']['hotlist_matches'] = self.detection_plates[detection.get('ID')].get('hotlist_matches', [])
 
         self.prune_outdated_objects(updated_at)
+        self.read_scheduler.prune_outdated_objects(updated_at)
+        self.plate_consensus.prune_outdated_objects(updated_at)
 
         return detections
-    
 
-    def extract_license_plate(self, frame, detection, license_plate):
 
-        ''' '''
+    def fall_back_to_inline_reads(self) -> None:
+
+        ''' Stop handing plate reads to the failed worker pool, loading an OCR reader to read plates within the frame loop. '''
+
+        print('ANPR workers unavailable, reading plates inline.')
+
+        self.worker_pool = None
+        self.submitted_plate_reads.clear()
+        self.ocr_text_reader = easyocr.Reader([self.ocr_lang], gpu=self.ocr_gpu)
+
+
+    def fetch_plate_text(self, ID : int) -> str:
+
+        ''' Fetch the plate text to display for a detection, PENDING whilst a background read is outstanding. '''
+
+        if ID in self.submitted_plate_reads:
+            return 'PENDING'
+
+        return self.detection_plates[ID]['plate_text']
+
+
+    def flush_plate_reads(self, updated_at : float) -> None:
+
+        '''
+            Read every queued plate crop in one batched OCR call, assigning each detection the first valid plate read 
+                from its crops.
+
+            Parameters:
+                * updated_at : float -> timestamp the reads were completed.
+
+            Returns:
+                * None.
+        '''
+
+        self.batched_frames = 0
+
+        if not self.pending_plate_reads:
+            return
 
-        abs_coords = (
-            int(detection['x1'])  + int(license_plate['x1']),
-            int(detection['y1'])  + int(license_plate['y1']),
-            int(detection['x1'])  + int(license_plate['x2']),
-            int(detection['y1'])  + int(license_plate['y2']),
+        pending_plate_reads, self.pending_plate_reads = self.pending_plate_reads, {}
+
+        self.apply_plate_reads(self.read_plate_crops(pending_plate_reads), updated_at)
+
+
+    def apply_plate_reads(self, plate_reads : dict, updated_at : float) -> None:
+
+        '''
+            Vote completed plate reads into their detection IDs consensus, confirming plates that reach it.
+
+            Parameters:
+                * plate_reads : dict -> plate text, OCR confidence, plate hash and whether it was served from the cache keyed
+                    by detection ID, None where no valid plate was read.
+                * updated_at : float -> timestamp the reads were completed.
+
+            Returns:
+                * None.
+        '''
+
+        for ID, license_plate in plate_reads.items():
+
+            detection_plate = self.detection_plates.setdefault(ID, {'plate_text' : 'PENDING', 'last_seen' : updated_at})
+
+            if license_plate:
+
+                plate_text, confidence, plate_hash, cached = license_plate
+
+                # A cached result repeats a read already made for this track, it is not an independent vote.
+                if cached:
+                    continue
+
+                consensus_plate_text, final = self.plate_consensus.add_read(ID, plate_text, confidence, updated_at, read_key=plate_hash)
+
+                detection_plate['plate_text'] = consensus_plate_text
+
+                # Plate agreed upon, no further reads are spent on this track.
+                if final:
+                    self.read_scheduler.confirm(ID, updated_at)
+
+            else:
+                self.mark_occluded(ID)
+
+
+    def mark_occluded(self, ID : int) -> None:
+
+        ''' Mark a tracks pending plate as occluded once the scheduler has given up reading it. '''
+
+        if self.read_scheduler.attempts_exhausted(ID) and self.detection_plates[ID]['plate_text'] == 'PENDING':
+            self.detection_plates[ID]['plate_text'] = 'OCCLUDED'
+
+
+    def check_hotlist(self, ID : int) -> None:
+
+        '''
+            Check a tracks plate against the hotlist whenever its consensus plate changes or a reloaded hotlist has been
+                swapped in, reporting any newly matched hotlisted plates.
+
+            Parameters:
+                * ID : int -> ID of the track.
+
+            Returns:
+                * None.
+        '''
+
+        detection_plate = self.detection_plates[ID]
+        plate_text = detection_plate['plate_text']
+
+        if self.plate_hotlist is None or plate_text in ('', 'PENDING', 'OCCLUDED'):
+            return
+
+        checked_key = (plate_text, self.plate_hotlist.version)
+
+        if detection_plate.get('hotlist_checked') == checked_key:
+            return
+
+        detection_plate['hotlist_checked'] = checked_key
+
+        previous_plates = {match['plate'] for match in detection_plate.get('hotlist_matches', [])}
+        hotlist_matches = self.plate_hotlist.lookup(plate_text)
+        detection_plate['hotlist_matches'] = hotlist_matches
+
+        if not hotlist_matches or {match['plate'] for match in hotlist_matches} <= previous_plates:
+            return
+
+        matched_plates = ', '.join(f"{match['plate']} ({match['match_type']})" for match in hotlist_matches)
+        print(f'Hotlist match for track {ID} read as {plate_text}: {matched_plates}')
+
+        if self.hotlist_alert is not None:
+            try:
+                self.hotlist_alert(ID, plate_text, hotlist_matches)
+            except Exception as e:
+                print(f'Error occurred alerting hotlist match! \n{e}')
+
+
+    def read_vehicle_plates(self, plate_jobs : dict) -> dict:
+
+        '''
+            Detect and read the plates of many vehicles at once, used by background workers.
+
+            Parameters:
+                * plate_jobs : dict -> vehicle crops and their plate search bands keyed by detection ID.
+
+            Returns:
+                * dict -> plate read and plate detections keyed by detection ID, matching the synchronous path, the plate
+                    read None where no valid plate was read.
+        '''
+
+        plate_results = self.detect_plate_crops(
+            [vehicle_crop for vehicle_crop, _ in plate_jobs.values()],
+            [search_band for _, search_band in plate_jobs.values()]
         )
 
-        # y1:y2, x1:x2
-        cropped_license_plate = frame[abs_coords[1]:abs_coords[3], abs_coords[0]:abs_coords[2]]
+        plate_crops = {ID : cropped_plates for ID, (_, cropped_plates) in zip(plate_jobs.keys(), plate_results)}
+        plate_reads = self.read_plate_crops(plate_crops)
 
-        cv2.imshow('cropped plate', cropped_license_plate)
+        return {ID : (plate_reads[ID], plate_detections) for ID, (plate_detections, _) in zip(plate_jobs.keys(), plate_results)}
 
-        ocr_read_plate_text = self.read_license_plate(cropped_license_plate)
-        
-        return self.correct_plate_text(ocr_read_plate_text)
+
+    def fetch_plate_search_band(self, detection : dict) -> tuple[float, float] | None:
+
+        ''' Fetch the fractions of a detections bbox height its plate is expected within, None to search the whole vehicle. '''
+
+        return detection.get('avg_class_dimensions', {}).get('plate_search_band')
 
 
+    def detect_plate_crops(self, vehicle_crops : list[np.ndarray], search_bands : list[tuple[float, float] | None] = None) -> list[tuple[list[dict], list[np.ndarray]]]:
+
+        '''
+            Run plate detection over many vehicle crops, first searching only the band of each vehicle its plate is expected
+                within at a reduced size, then falling back to searching the whole crop for vehicles where nothing was found.
+
+            Parameters:
+                * vehicle_crops : list[np.ndarray] -> crops of the vehicles to search.
+                * search_bands : list[tuple[float, float] | None] -> top and bottom fractions of each crops height to search
+                    first, None to search the whole crop straight away.
+
+            Returns:
+                * list[tuple[list[dict], list[np.ndarray]]] -> for each vehicle crop, its plate detections relative to the
+                    vehicle crop and their crops ordered by confidence.
+        '''
+
+        search_bands = search_bands or [None] * len(vehicle_crops)
+        plate_results = [([], []) for _ in vehicle_crops]
+
+        band_indices = [index for index, search_band in enumerate(search_bands) if search_band is not None]
+        full_indices = [index for index, search_band in enumerate(search_bands) if search_band is None]
+
+        # Search the expected plate band of each vehicle at the reduced size.
+        band_results = self.search_plate_crops(
+            [vehicle_crops[index] for index in band_indices],
+            [search_bands[index] for index in band_indices],
+            self.plate_band_search_size
+        )
+
+        for index, band_result in zip(band_indices, band_results):
+            if band_result[0]:
+                plate_results[index] = band_result
+            else:
+                full_indices.append(index)
+
+        # Fall back to the whole vehicle where the band search found nothing.
+        full_results = self.search_plate_crops(
+            [vehicle_crops[index] for index in full_indices],
+            [None] * len(full_indices),
+            self.plate_search_size
+        )
+
+        for index, full_result in zip(full_indices, full_results):
+            plate_results[index] = full_result
+
+        return plate_results
+
+
+    def search_plate_crops(self, vehicle_crops : list[np.ndarray], search_bands : list[tuple[float, float] | None], search_size : int) -> list[tuple[list[dict], list[np.ndarray]]]:
+
+        '''
+            Run plate detection over many vehicle crops in a single forward pass. The searched region of each crop is 
+                letterboxed to a small fixed size so they batch together, with the detected plate boxes mapped back onto 
+                each vehicle crop.
+
+            Parameters:
+                * vehicle_crops : list[np.ndarray] -> crops of the vehicles to search.
+                * search_bands : list[tuple[float, float] | None] -> top and bottom fractions of each crops height to 
+                    search, None for the whole crop.
+                * search_size : int -> fixed size in pixels searched regions are letterboxed to.
+
+            Returns:
+                * list[tuple[list[dict], list[np.ndarray]]] -> for each vehicle crop, its plate detections relative to the
+                    vehicle crop and their crops ordered by confidence.
+        '''
+
+        plate_results = [([], []) for _ in vehicle_crops]
+        search_regions = {}
+
+        # Cut out each searched region, remembering its offset within the vehicle crop.
+        for index, (vehicle_crop, search_band) in enumerate(zip(vehicle_crops, search_bands)):
+
+            band_top, band_bottom = search_band or (0.0, 1.0)
+            crop_height = vehicle_crop.shape[0]
+            region_y1, region_y2 = int(crop_height * band_top), int(crop_height * band_bottom)
+
+            if vehicle_crop[region_y1:region_y2].size > 0:
+                search_regions[index] = (region_y1, letterbox_frame(vehicle_crop[region_y1:region_y2], search_size))
+
+        if not search_regions:
+            return plate_results
+
+        batched_plate_detections = self.detection_model.run_batch_inference(
+            [letterboxed_region for _, (letterboxed_region, _, _) in search_regions.values()],
+            image_size=search_size
+        )
+
+        for (index, (region_y1, (_, scale, (pad_x, pad_y)))), plate_detections in zip(search_regions.items(), batched_plate_detections):
+
+            vehicle_crop = vehicle_crops[index]
+            crop_height, crop_width = vehicle_crop.shape[:2]
+
+            # Map plate boxes from the letterboxed region back onto the vehicle crop.
+            for plate in plate_detections:
+                plate['x1'] = min(max((plate['x1'] - pad_x) / scale, 0), crop_width)
+                plate['x2'] = min(max((plate['x2'] - pad_x) / scale, 0), crop_width)
+                plate['y1'] = min(max((plate['y1'] - pad_y) / scale + region_y1, 0), crop_height)
+                plate['y2'] = min(max((plate['y2'] - pad_y) / scale + region_y1, 0), crop_height)
+
+            sorted_plates = sorted(plate_detections, key = lambda plate: plate['confidence_score'], reverse=True)
+
+            cropped_plates = [
+                vehicle_crop[int(plate['y1']):int(plate['y2']), int(plate['x1']):int(plate['x2'])]
+                for plate in sorted_plates
+            ]
+
+            plate_results[index] = (plate_detections, [cropped_plate for cropped_plate in cropped_plates if cropped_plate.size > 0])
+
+        return plate_results
+
+
+    def read_plate_crops(self, plate_crops : dict) -> dict:
+
+        '''
+            Read every plate crop in one batched OCR call, keeping the first valid plate read per detection.
+
+            Parameters:
+                * plate_crops : dict -> lists of plate crops, ordered by confidence, keyed by detection ID.
+
+            Returns:
+                * plate_reads : dict -> plate text, OCR confidence, plate hash and whether it was served from the cache keyed
+                    by detection ID, None where no valid plate was read.
+        '''
+
+        # Flatten queued crops, remembering which ID each crop belongs to.
+        plate_IDs = [ID for ID, cropped_plates in plate_crops.items() for _ in cropped_plates]
+        cropped_plates = [cropped_plate for cropped_plates in plate_crops.values() for cropped_plate in cropped_plates]
+
+        ocr_read_plates = self.read_license_plates_batched(cropped_plates, plate_IDs)
+
+        plate_reads = {ID : None for ID in plate_crops}
+
+        for ID, ocr_read_plate in zip(plate_IDs, ocr_read_plates):
+
+            # Crops were queued by confidence, keep the first valid read per ID.
+            if plate_reads[ID] or ocr_read_plate is None:
+                continue
+
+            ocr_read_plate_text, confidence, plate_hash, cached = ocr_read_plate
+            license_plate = self.correct_plate_text(ocr_read_plate_text)
+
+            if license_plate:
+                plate_reads[ID] = (license_plate, confidence, plate_hash, cached)
+
+        return plate_reads
+    
+
     def crop_frame_from_detection_data(self, frame, detection):
 
         x1, y1, x2, y2 = map(int, (detection['x1'], detection['y1'], detection['x2'], detection['y2']))
@@ -235,21 +662,170 @@ class ANPR(object):
         return smoothed_plate
     
 
-    def read_license_plate(self, cropped_plate):
+    def read_license_plates_batched(self, cropped_plates : list[np.ndarray], plate_IDs : list[int]) -> list[tuple[list[str], float, int, bool] | None]:
 
-        ''' '''
+        '''
+            Read text from many localised plate crops. Crops near identical to ones recently read from the same track reuse
+                their cached result, the remainder are read together in a single batched OCR call.
+
+            Parameters:
+                * cropped_plates : list[np.ndarray] -> BGR crops each containing a license plate.
+                * plate_IDs : list[int] -> ID of the track each crop belongs to.
+
+            Returns:
+                * list[tuple[list[str], float, int, bool] | None] -> text read from each plate with its OCR confidence, the
+                    hash of the plate it was read from and whether it was served from the cache, in the order the crops
+                    were given.
+        '''
+
+        if not cropped_plates:
+            return []
+
+        ocr_read_plates = [None] * len(cropped_plates)
+        uncached_plates = {}
 
         try:
-            # Take cropped_plate frame and preprocess it for better model digestion.
-            processed_plate = self.preprocess_plate(cropped_plate)
-            # Use OCR model to read text from pre-processed plate.
-            return self.ocr_text_reader.readtext(processed_plate, detail=0)
+            # Preprocess and resize crops to the common batch height, preserving aspect ratios.
+            for index, (cropped_plate, ID) in enumerate(zip(cropped_plates, plate_IDs)):
+
+                processed_plate = self.preprocess_plate(cropped_plate)
+                plate_hash = self.plate_read_cache.hash_plate(processed_plate)
+                cached_read = self.plate_read_cache.lookup(ID, plate_hash)
+
+                if cached_read is not None:
+                    cached_hash, (cached_text, cached_confidence) = cached_read
+                    ocr_read_plates[index] = (cached_text, cached_confidence, cached_hash, True)
+                    continue
+
+                plate_height, plate_width = processed_plate.shape[:2]
+                resized_width = max(1, int(plate_width * self.ocr_batch_height / plate_height))
+                uncached_plates[index] = (plate_hash, cv2.resize(processed_plate, (resized_width, self.ocr_batch_height)))
+
+            if not uncached_plates:
+                return ocr_read_plates
+
+            recognised_plates = self.recognise_plates_batched([resized_plate for _, resized_plate in uncached_plates.values()])
+
+            for (index, (plate_hash, _)), recognised_plate in zip(uncached_plates.items(), recognised_plates):
+
+                if recognised_plate is not None:
+                    ocr_read_plates[index] = (*recognised_plate, plate_hash, False)
+                    self.plate_read_cache.store(plate_IDs[index], plate_hash, recognised_plate)
+
         except Exception as e:
             print(f'OCR model failed to read text.\n{e}')
 
-        return None
+        return ocr_read_plates
+
+
+    def recognise_plates_batched(self, resized_plates : list[np.ndarray]) -> list[tuple[list[str], float] | None]:
+
+        '''
+            Run OCR over many preprocessed plates of a common height in a single call. In recognition only mode plates are
+                laid side by side on one strip so the recognizer reads every plate box in one batch.
+
+            Parameters:
+                * resized_plates : list[np.ndarray] -> preprocessed plates resized to the batch height.
+
+            Returns:
+                * list[tuple[list[str], float] | None] -> text read from each plate with its OCR confidence.
+        '''
+
+        if not self.recognition_only:
+            # Fall back to running EasyOCRs full pipeline over the batch.
+            max_width = max(resized_plate.shape[1] for resized_plate in resized_plates)
+            batched_results = self.ocr_text_reader.readtext_batched(
+                resized_plates,
+                n_width=max_width,
+                n_height=self.ocr_batch_height,
+                detail=1
+            )
+
+            # Join each plates text regions, averaging their confidences.
+            return [
+                ([text for _, text, _ in ocr_results], float(np.mean([confidence for _, _, confidence in ocr_results])))
+                if ocr_results else None
+                for ocr_results in batched_results
+            ]
+
+        # Lay every plate out on one strip, separated by a gap, recording each plates box.
+        gap = self.ocr_batch_height // 4
+        strip_width = sum(resized_plate.shape[1] for resized_plate in resized_plates) + gap * (len(resized_plates) - 1)
+        plate_strip = np.zeros((self.ocr_batch_height, strip_width), dtype=np.uint8)
+        plate_boxes, plate_indices = [], {}
+        x_offset = 0
+
+        for index, resized_plate in enumerate(resized_plates):
+            resized_width = resized_plate.shape[1]
+            plate_strip[:, x_offset:x_offset + resized_width] = resized_plate
+            plate_boxes.append([x_offset, x_offset + resized_width, 0, self.ocr_batch_height])
+            plate_indices[x_offset] = index
+            x_offset += resized_width + gap
+
+        ocr_results = self.ocr_text_reader.recognize(
+            plate_strip,
+            horizontal_list=plate_boxes,
+            free_list=[],
+            batch_size=len(plate_boxes),
+            detail=1
+        )
+
+        # Map each result back to its plate using the left edge of its box.
+        recognised_plates = [None] * len(resized_plates)
+
+        for box, text, confidence in ocr_results:
+            index = plate_indices.get(int(box[0][0]))
+            if index is not None:
+                recognised_plates[index] = ([text], float(confidence))
+
+        return recognised_plates
+    
+
+    def fetch_ocr_cache_statistics(self) -> dict:
+
+        '''
+            Aggregate OCR cache hit and miss counters across this instance and any background workers.
+
+            Returns:
+                * dict -> hits, misses and hit rate of the OCR result caches.
+        '''
+
+        plate_read_caches = [self.plate_read_cache]
+
+        if self.worker_pool is not None:
+            plate_read_caches += [worker.plate_read_cache for worker in self.worker_pool.worker_instances]
+
+        hits = sum(plate_read_cache.hits for plate_read_cache in plate_read_caches)
+        misses = sum(plate_read_cache.misses for plate_read_cache in plate_read_caches)
+
+        return {'hits' : hits, 'misses' : misses, 'hit_rate' : hits / (hits + misses) if hits + misses else 0.0}
+
+
+    def create_worker(self):
+
+        ''' Create an ANPR instance, with its own plate detection and OCR models, for a background worker. '''
+
+        return ANPR(
+            detection_model=ObjectDetection(model=self.detection_model.model_path, confidence_threshold=self.detection_model.confidence_threshold),
+            ocr_lang=self.ocr_lang,
+            ocr_gpu=self.ocr_gpu,
+            plate_similarity_threshold=self.plate_similarity_threshold,
+            recognition_only=self.recognition_only,
+            ocr_batch_height=self.ocr_batch_height,
+            plate_search_size=self.plate_search_size,
+            plate_band_search_size=self.plate_band_search_size,
+            ocr_cache_size=self.plate_read_cache.capacity
+        )
     
 
+    def shutdown(self) -> None:
+
+        ''' Stop any background plate reading workers. '''
+
+        if self.worker_pool is not None:
+            self.worker_pool.shutdown()
+
+
     def prune_outdated_objects(self, updated_at):
 
         '''
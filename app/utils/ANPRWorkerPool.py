@@ -0,0 +1,166 @@
+import queue
+import threading
+import numpy as np
+
+
+class ANPRWorkerPool(object):
+
+    '''
+        Pool of background threads handling plate detection and OCR away from the frame loop. Each worker owns its own
+            models, created by the supplied factory within the worker thread, and is fed plate read jobs through a bounded queue.
+    '''
+
+    def __init__(self, worker_factory, num_workers : int = 1, max_queue_size : int = 8, max_batch_size : int = 8):
+
+        '''
+            Parameters:
+                * worker_factory : callable -> returns an object exposing read_vehicle_plates(plate_jobs) for each worker,
+                    returning each jobs plate read and plate detections keyed by ID.
+                * num_workers : int -> number of worker threads to start.
+                * max_queue_size : int -> maximum number of jobs waiting to be read.
+                * max_batch_size : int -> maximum number of jobs a worker reads in one batch.
+        '''
+
+        self.job_queue = queue.Queue(maxsize=max_queue_size)
+        self.result_queue = queue.Queue()
+        self.max_batch_size = max_batch_size
+        self.stop_event = threading.Event()
+        self.dropped_jobs = 0
+        self.worker_instances = []
+
+        # Workers whose models could not be created, the pool has failed once none are left.
+        self.failed_workers = 0
+        self.failed = False
+        self.failure_lock = threading.Lock()
+
+        self.workers = [
+            threading.Thread(target=self.run_worker, args=(worker_factory,), daemon=True)
+            for _ in range(max(1, num_workers))
+        ]
+
+        for worker in self.workers:
+            worker.start()
+
+
+    def submit(self, ID : int, plate_job : tuple[np.ndarray, tuple[float, float] | None]) -> bool:
+
+        '''
+            Queue a vehicle to have its plate read without blocking the caller.
+
+            Parameters:
+                * ID : int -> ID of the detection the job belongs to.
+                * plate_job : tuple -> crop of the vehicle, owned by the pool once submitted, and its plate search band.
+
+            Returns:
+                * bool -> True if queued, False if the queue is full and the job should be submitted again later, or the
+                    pool has failed.
+        '''
+
+        if self.failed:
+            return False
+
+        try:
+            self.job_queue.put_nowait((ID, plate_job))
+            return True
+        except queue.Full:
+            self.dropped_jobs += 1
+            return False
+
+
+    def collect_results(self) -> dict:
+
+        '''
+            Drain every plate read completed since the last call. Once the pool has failed, jobs no worker is left to read
+                are returned without a plate.
+
+            Returns:
+                * results : dict -> plate read and plate detections keyed by detection ID, the plate read None where no
+                    valid plate was read.
+        '''
+
+        results = {}
+
+        while True:
+            try:
+                ID, plate_result = self.result_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            results[ID] = plate_result
+
+        if self.failed:
+            results.update({ID : (None, []) for ID in self.drain_jobs()})
+
+        return results
+
+
+    def drain_jobs(self) -> list[int]:
+
+        ''' Remove every job still waiting to be read, returning their IDs. '''
+
+        IDs = []
+
+        while True:
+            try:
+                ID, _ = self.job_queue.get_nowait()
+            except queue.Empty:
+                return IDs
+
+            IDs.append(ID)
+
+
+    def run_worker(self, worker_factory) -> None:
+
+        ''' Worker thread loop, reading queued jobs in batches until the pool is shut down. '''
+
+        # Models are created within the thread that uses them.
+        try:
+            worker = worker_factory()
+        except Exception as e:
+            print(f'ANPR worker failed to load its models.\n{e}')
+
+            with self.failure_lock:
+                self.failed_workers += 1
+                # Without any workers left, callers fall back to reading plates themselves.
+                self.failed = self.failed_workers >= len(self.workers)
+
+            return
+
+        self.worker_instances.append(worker)
+
+        while not self.stop_event.is_set():
+
+            try:
+                ID, plate_job = self.job_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            plate_jobs = {ID : plate_job}
+
+            # Gather any other waiting jobs into the same batch.
+            while len(plate_jobs) < self.max_batch_size:
+                try:
+                    ID, plate_job = self.job_queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                plate_jobs[ID] = plate_job
+
+            try:
+                results = worker.read_vehicle_plates(plate_jobs)
+            except Exception as e:
+                print(f'ANPR worker failed to read plates.\n{e}')
+                results = {ID : (None, []) for ID in plate_jobs}
+
+            for ID, plate_result in results.items():
+                self.result_queue.put((ID, plate_result))
+
+
+    def shutdown(self) -> None:
+
+        ''' Stop all worker threads, waiting for any in progress reads to finish. '''
+
+        self.stop_event.set()
+
+        for worker in self.workers:
+            worker.join()
@@ -1,4 +1,8 @@
+import copy
+import json
+import struct
 import cv2 
+from functools import lru_cache
 from .BboxUtils import calculate_center_point
 import numpy as np
 
@@ -7,7 +11,7 @@ class Annotations(object):
 
     ''' '''
 
-    def __init__(self):
+    def __init__(self, text_cache_size : int = 1024, sprite_cache_size : int = 128):
         
         self.bbox_colours = {
             'standard' : (10, 255, 10),
@@ -34,23 +38,200 @@ class Annotations(object):
         self.size_factor = 0.5
         self.thickness_factor = 0.01
         self.thickness = 8
+        self.evidence_min_width = 960
+        self.sprite_cache_size = sprite_cache_size
 
+        # Copies of these annotations with their styling scaled for drawing at display resolution, keyed by scale.
+        self.scaled_annotations = {}
 
-    def annotate_frame(self, frame, detections : list[dict], vision_type : str):
+        # Labels rarely change between frames, cache their measurements and rendered sprites. lru_cache is thread safe,
+        # evidence is rendered from the evidence writer thread.
+        self.cached_text_properties = lru_cache(maxsize=text_cache_size)(self.calculate_text_properties)
+        self.cached_label_sprite = lru_cache(maxsize=sprite_cache_size)(self.render_label_sprite)
 
-        ''' '''
 
-        for detection in detections:
+    def annotate_frame(self, frame, detections : list[dict], vision_type : str, output_size : tuple[int, int] = None):
+
+        '''
+            Annotate detections onto the frame. Given an output size, the frame is resized first and overlays are drawn at
+                that resolution in scaled coordinates, rather than drawing every full resolution pixel only to discard
+                them when the frame is displayed.
 
-            # Annotate vehicle corners.
-            frame = self.annotate_bbox_corners(frame, detection)
+            Paramaters:
+                * frame : (np.ndarray) : frame to be drawn upon.
+                * detections : (list[dict]) : detections to annotate.
+                * vision_type : (str) : vision type determining the labels shown.
+                * output_size : (tuple[int, int]) : width and height to render at, None to annotate at full resolution.
+            Returns:
+                * frame : (np.ndarray) : annotated frame.
+        '''
+
+        if output_size is not None and tuple(output_size) != (frame.shape[1], frame.shape[0]):
+            return self.annotate_frame_at_size(frame, detections, vision_type, output_size)
+
+        # Annotate every vehicles corners, then trails, in as few draw calls as possible.
+        frame = self.annotate_bbox_corners_batched(frame, detections)
+
+        if vision_type == 'object_tracking':
+            frame = self.annotate_center_point_trails_batched(frame, [detection.get('center_points', []) for detection in detections])
+
+        for detection in detections:
 
             # Annotate metadata labels.
-            frame = self.annotate_label(frame, detection, vision_type)
+            frame = self.annotate_label(frame, detection, vision_type, annotate_trail=False)
 
         return frame
     
 
+    def annotate_frame_at_size(self, frame : np.ndarray, detections : list[dict], vision_type : str, output_size : tuple[int, int]) -> np.ndarray:
+
+        ''' Resize the frame to the output size, annotating scaled copies of the detections with scaled styling. '''
+
+        output_width, output_height = int(output_size[0]), int(output_size[1])
+        scale_x, scale_y = output_width / frame.shape[1], output_height / frame.shape[0]
+
+        interpolation = cv2.INTER_AREA if scale_x < 1 and scale_y < 1 else cv2.INTER_LINEAR
+        output_frame = cv2.resize(frame, (output_width, output_height), interpolation=interpolation)
+
+        # Copies leave the full resolution detections untouched for the rest of the pipeline.
+        scaled_detections = [
+            {
+                **detection,
+                'x1' : detection['x1'] * scale_x, 'x2' : detection['x2'] * scale_x,
+                'y1' : detection['y1'] * scale_y, 'y2' : detection['y2'] * scale_y,
+                'center_points' : [(int(x * scale_x), int(y * scale_y)) for x, y in detection.get('center_points', [])]
+            }
+            for detection in detections
+        ]
+
+        return self.fetch_scaled_annotations(min(scale_x, scale_y)).annotate_frame(output_frame, scaled_detections, vision_type)
+
+
+    def fetch_scaled_annotations(self, scale : float) -> 'Annotations':
+
+        '''
+            Fetch a copy of these annotations with sizes scaled, so overlays keep their proportions at display resolution.
+
+            Paramaters:
+                * scale : (float) : scale between the full resolution and output frames.
+            Returns:
+                * Annotations : annotations styled for the given scale.
+        '''
+
+        scale = round(scale, 2)
+
+        if scale in self.scaled_annotations:
+            return self.scaled_annotations[scale]
+
+        # Canvas resizing only produces a handful of scales.
+        if len(self.scaled_annotations) >= 16:
+            self.scaled_annotations.clear()
+
+        scaled_annotations = copy.copy(self)
+        scaled_annotations.scaled_annotations = {}
+
+        for attribute in (
+            'min_corner_radius', 'max_corner_radius', 'min_thickness', 'max_thickness', 'font_thickness', 'border_radius',
+            'label_padding', 'padding', 'center_point_radius', 'trail_thickness', 'end_point_thickness', 'thickness'
+        ):
+            setattr(scaled_annotations, attribute, max(1, int(round(getattr(self, attribute) * scale))))
+
+        scaled_annotations.font_scale = self.font_scale * scale
+
+        # Sprites are rendered with the copies own styling, text measurements are keyed by scale and can be shared.
+        scaled_annotations.cached_label_sprite = lru_cache(maxsize=self.sprite_cache_size)(scaled_annotations.render_label_sprite)
+
+        self.scaled_annotations[scale] = scaled_annotations
+
+        return scaled_annotations
+
+
+    def create_overlay(self, detections : list[dict], vision_type : str, frame_size : tuple[int, int], timestamp : float = None) -> dict:
+
+        '''
+            Describe a frames overlays as primitives rather than drawing them, so viewers can render them over the untouched
+                frame themselves and no OpenCV drawing is required.
+
+            Paramaters:
+                * detections : (list[dict]) : detections to describe.
+                * vision_type : (str) : vision type determining the labels and trails included.
+                * frame_size : (tuple[int, int]) : width and height of the frame the coordinates refer to.
+                * timestamp : (float) : timestamp of the frame within the stream, so overlays can be matched to frames.
+            Returns:
+                * overlay : (dict) : boxes with their colours, labels and trails, colours in RGB.
+        '''
+
+        primitives = []
+
+        for detection in detections:
+
+            # Viewers expect RGB, colours are stored as BGR.
+            colour = self.fetch_bbox_colour(detection)[::-1]
+
+            primitive = {
+                'ID' : detection.get('ID'),
+                'box' : [round(float(detection[key]), 1) for key in ('x1', 'y1', 'x2', 'y2')],
+                'colour' : list(colour),
+                'offender' : bool(detection.get('offender', False)),
+                'label' : self.create_label(detection=detection, vision_type=vision_type)
+            }
+
+            if vision_type == 'object_tracking':
+                primitive['trail'] = [[int(x), int(y)] for x, y in detection.get('center_points', [])]
+
+            primitives.append(primitive)
+
+        return {
+            'timestamp' : timestamp,
+            'frame_size' : [int(frame_size[0]), int(frame_size[1])],
+            'trail_colour' : list(self.bbox_colours['trail'][::-1]),
+            'detections' : primitives
+        }
+
+
+    def encode_overlay(self, overlay : dict, encoding : str = 'json') -> bytes:
+
+        '''
+            Encode an overlay as a message to send alongside its frame.
+
+            Paramaters:
+                * overlay : (dict) : overlay created by create_overlay.
+                * encoding : (str) : 'json', or 'binary' for a compact little endian message of a header, followed by each
+                    detections ID, box, RGB colour, offender flag, length prefixed UTF-8 label and length prefixed int16 trail.
+            Returns:
+                * message : (bytes) : encoded overlay.
+        '''
+
+        if encoding == 'json':
+            return json.dumps(overlay, separators=(',', ':')).encode('utf-8')
+
+        timestamp = overlay['timestamp']
+        frame_width, frame_height = overlay['frame_size']
+
+        # Magic, version, timestamp (NaN if absent), frame size, trail colour and number of detections.
+        message = [struct.pack(
+            '<4sBdHH3BH',
+            b'OVRL', 1,
+            float('nan') if timestamp is None else timestamp,
+            frame_width, frame_height,
+            *overlay['trail_colour'],
+            len(overlay['detections'])
+        )]
+
+        for primitive in overlay['detections']:
+
+            ID = primitive['ID']
+            label = primitive['label'].encode('utf-8')[:65535]
+            trail = primitive.get('trail', [])[-65535:]
+
+            message.append(struct.pack('<i4f3B?H', -1 if ID is None else ID, *primitive['box'], *primitive['colour'], primitive['offender'], len(label)))
+            message.append(label)
+            message.append(struct.pack('<H', len(trail)))
+            message.append(np.clip(np.asarray(trail, dtype=np.int32).reshape(-1, 2), -32768, 32767).astype('<i2').tobytes())
+
+        return b''.join(message)
+
+
     def fetch_bbox_colour(self, detection : dict) -> tuple[int, int, int]:
 
         '''
@@ -84,6 +265,50 @@ class Annotations(object):
             * annotated_frame : np.ndarray -> Annotated frame with a detections given bounding box. 
         '''
 
+        corner_arcs, colour, thickness = self.calculate_bbox_corners(detection)
+
+        cv2.polylines(frame, corner_arcs, False, colour, thickness)
+
+        return frame
+
+
+    def annotate_bbox_corners_batched(self, frame : np.ndarray, detections : list[dict]) -> np.ndarray:
+
+        '''
+            Annotate the bounding box corners of every detection, with a single draw call per colour and thickness.
+
+            Parameters: 
+                * frame : np.ndarray -> frame to be drawn upon.
+                * detections : list[dict] -> detections to annotate.
+
+            Returns:
+                * frame : np.ndarray -> frame with every detections bounding box corners drawn.
+        '''
+
+        grouped_corner_arcs = {}
+
+        for detection in detections:
+            corner_arcs, colour, thickness = self.calculate_bbox_corners(detection)
+            grouped_corner_arcs.setdefault((colour, thickness), []).extend(corner_arcs)
+
+        for (colour, thickness), corner_arcs in grouped_corner_arcs.items():
+            cv2.polylines(frame, corner_arcs, False, colour, thickness)
+
+        return frame
+
+
+    def calculate_bbox_corners(self, detection : dict) -> tuple[list[np.ndarray], tuple[int, int, int], int]:
+
+        '''
+            Calculate the corner arcs of a detections bounding box, sized relative to the detection.
+
+            Parameters: 
+                * detection : dict -> detection dictionary containing its bounding box.
+
+            Returns:
+                * tuple[list[np.ndarray], tuple[int, int, int], int] -> the four corner arcs as polylines, their colour and thickness.
+        '''
+
         # Fetch detection bounding box values, typecast to full integer values. 
         x1, y1, x2, y2 = int(detection['x1']), int(detection['y1']), int(detection['x2']), int(detection['y2'])
 
@@ -97,43 +322,56 @@ class Annotations(object):
         # Fetch appropriate colour for detection.
         colour = self.fetch_bbox_colour(detection=detection)       
 
-        # Store corner values within a list.
-        bbox_corners = [
-            ((x1 + corner_radius, y1 + corner_radius), 180, 270),
-            ((x1 + corner_radius, y2 - corner_radius), 90, 180),
-            ((x2 - corner_radius, y1 + corner_radius), 270, 360),
-            ((x2 - corner_radius, y2 - corner_radius), 0, 90)
-        ]
-        
-        # Iterate over bbox corner values, annotate with ellipses.
-        for (center_x, center_y), start_angle, end_angle in bbox_corners:
+        # Arc centers, in the same order as the cached arcs.
+        arc_centers = (
+            (x1 + corner_radius, y1 + corner_radius),
+            (x1 + corner_radius, y2 - corner_radius),
+            (x2 - corner_radius, y1 + corner_radius),
+            (x2 - corner_radius, y2 - corner_radius)
+        )
 
-            cv2.ellipse(
-                frame, 
-                (int(center_x), int(center_y)),
-                (corner_radius, corner_radius),
-                0, start_angle, end_angle,
-                colour, 
-                thickness
-            )
+        corner_arcs = [arc + np.array(arc_center, dtype=np.int32) for arc, arc_center in zip(self.fetch_corner_arcs(corner_radius), arc_centers)]
 
-        return frame
+        return corner_arcs, colour, thickness
+
+
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def fetch_corner_arcs(corner_radius : int) -> tuple[np.ndarray, ...]:
+
+        ''' Precompute the four corner arcs of a given radius around the origin, as polylines offset onto each corner. '''
+
+        # Top left, bottom left, top right and bottom right.
+        corner_angles = ((180, 270), (90, 180), (270, 360), (0, 90))
+
+        return tuple(
+            cv2.ellipse2Poly((0, 0), (corner_radius, corner_radius), 0, start_angle, end_angle, 5).astype(np.int32)
+            for start_angle, end_angle in corner_angles
+        )
     
 
     def fetch_text_properties(self, label : str, frame : np.ndarray) -> tuple[tuple[int, int], float]:
         
-        ''' '''
+        ''' Fetch the size and font scale of a label fitted to the frames width, from the cache where possible. '''
 
-        current_font_scale = self.font_scale
-        min_font_scale = 0.8
         max_text_width = frame.shape[1] - self.label_padding * 2
 
-        text_width, text_height = cv2.getTextSize(label, self.font, current_font_scale, self.font_thickness)[0]
+        return self.cached_text_properties(label, self.font, self.font_scale, self.font_thickness, max_text_width)
+
+
+    def calculate_text_properties(self, label : str, font : int, font_scale : float, font_thickness : int, max_text_width : int) -> tuple[tuple[int, int], float]:
+
+        ''' Shrink the font scale until the label fits within the maximum width. '''
+
+        current_font_scale = font_scale
+        min_font_scale = 0.8
+
+        text_width, text_height = cv2.getTextSize(label, font, current_font_scale, font_thickness)[0]
 
         while text_width > max_text_width and current_font_scale > min_font_scale:
 
             current_font_scale -= 0.1
-            text_width, text_height = cv2.getTextSize(label, self.font, current_font_scale, self.font_thickness)[0]
+            text_width, text_height = cv2.getTextSize(label, font, current_font_scale, font_thickness)[0]
 
         return (text_width, text_height), current_font_scale
     
@@ -158,16 +396,17 @@ class Annotations(object):
         return box_width, box_height
 
 
-    def draw_label_background(self, frame, position) -> np.ndarray:
+    def draw_label_background(self, frame, position, colour = None) -> np.ndarray:
 
         ''' '''
 
         x, y = position['x'], position['y']
         w, h = position['width'], position['height']
         radius = self.border_radius
+        colour = self.bg_colour if colour is None else colour
 
-        cv2.rectangle(frame, (x + radius, y), ( x + w - radius, y + h), self.bg_colour, -1)
-        cv2.rectangle(frame, (x, y + radius), (x + w, y + h - radius), self.bg_colour, -1)
+        cv2.rectangle(frame, (x + radius, y), ( x + w - radius, y + h), colour, -1)
+        cv2.rectangle(frame, (x, y + radius), (x + w, y + h - radius), colour, -1)
 
         label_corners = [
             # top left.
@@ -187,7 +426,7 @@ class Annotations(object):
                 (center_x, center_y),
                 (radius, radius),
                 0, start_angle, end_angle,
-                self.bg_colour,
+                colour,
                 -1
             )
 
@@ -213,7 +452,7 @@ class Annotations(object):
         )
 
     
-    def annotate_label(self, frame : np.ndarray, detection : dict, vision_type : str) -> np.ndarray:
+    def annotate_label(self, frame : np.ndarray, detection : dict, vision_type : str, annotate_trail : bool = True) -> np.ndarray:
 
         '''
         '''
@@ -224,14 +463,78 @@ class Annotations(object):
         y2= int(detection['y2'])
         center_x, center_y = calculate_center_point(detection)
 
-        if vision_type == 'object_tracking':
+        if vision_type == 'object_tracking' and annotate_trail:
             self.annotate_center_point_trail(frame=frame, center_points=detection.get('center_points', []))
 
         text_size, font_scale = self.fetch_text_properties(detection_label, frame)
         label_position = self.calculate_label_position(y2, (center_x, center_y), text_size)
 
-        self.draw_label_background(frame, label_position)
-        self.draw_label_text(frame, detection_label, label_position, text_size, font_scale)
+        self.blit_label_sprite(frame, detection_label, label_position, text_size, font_scale)
+
+        return frame
+
+
+    def render_label_sprite(self, label : str, text_size : tuple[int, int], font_scale : float) -> tuple[np.ndarray, np.ndarray]:
+
+        '''
+            Render a label, its rounded background and text, once onto its own canvas.
+
+            Paramaters:
+                * label : (str) : text of the label.
+                * text_size : (tuple[int, int]) : width and height of the text.
+                * font_scale : (float) : scale the text is rendered at.
+            Returns:
+                * tuple[np.ndarray, np.ndarray] : the rendered label and the mask of its rounded background.
+        '''
+
+        position = {'x' : 0, 'y' : 0, 'width' : text_size[0] + 2 * self.label_padding, 'height' : text_size[1] + 2 * self.label_padding}
+
+        sprite = np.zeros((position['height'] + 1, position['width'] + 1, 3), dtype=np.uint8)
+        self.draw_label_background(sprite, position)
+        self.draw_label_text(sprite, label, position, text_size, font_scale)
+
+        # Draw the background alone to mask out the rounded corners, as a single channel mask for cv2.copyTo.
+        mask = self.draw_label_background(np.zeros(sprite.shape[:2], dtype=np.uint8), position, colour=255)
+
+        return sprite, mask
+
+
+    def blit_label_sprite(self, frame : np.ndarray, label : str, position : dict, text_size : tuple[int, int], font_scale : float) -> np.ndarray:
+
+        '''
+            Copy a cached label sprite onto the frame, clipped to the frames bounds.
+
+            Paramaters:
+                * frame : (np.ndarray) : frame to be drawn upon.
+                * label : (str) : text of the label.
+                * position : (dict) : top left position of the label.
+                * text_size : (tuple[int, int]) : width and height of the text.
+                * font_scale : (float) : scale the text is rendered at.
+            Returns:
+                * frame : (np.ndarray) : frame with the label drawn.
+        '''
+
+        sprite, mask = self.cached_label_sprite(label, tuple(text_size), font_scale)
+
+        h, w = frame.shape[:2]
+        x, y = position['x'], position['y']
+
+        # Clip the sprite to the visible part of the frame.
+        frame_x1, frame_y1 = max(x, 0), max(y, 0)
+        frame_x2, frame_y2 = min(x + sprite.shape[1], w), min(y + sprite.shape[0], h)
+
+        if frame_x1 >= frame_x2 or frame_y1 >= frame_y2:
+            return frame
+
+        sprite_x1, sprite_y1 = frame_x1 - x, frame_y1 - y
+        sprite_x2, sprite_y2 = frame_x2 - x, frame_y2 - y
+
+        # Masked copy straight into the frame region, far cheaper than a broadcast numpy mask.
+        cv2.copyTo(
+            sprite[sprite_y1:sprite_y2, sprite_x1:sprite_x2],
+            mask[sprite_y1:sprite_y2, sprite_x1:sprite_x2],
+            frame[frame_y1:frame_y2, frame_x1:frame_x2]
+        )
 
         return frame
     
@@ -291,24 +594,32 @@ class Annotations(object):
                 * frame : (np.ndarray) : Modified frame where trail has been drawn. 
         '''
 
-        if len(center_points) < 2:
+        return self.annotate_center_point_trails_batched(frame, [center_points])
+
+
+    def annotate_center_point_trails_batched(self, frame : np.ndarray, trails : list[list[tuple[int, int]]]) -> np.ndarray:
+
+        '''
+            Annotate every detections center point trail with a single polyline draw call, and their end points with another.
+
+            Paramaters:
+                * frame : (np.ndarray) : The frame to be drawn upon.
+                * trails : (list[list[tuple[int, int]]]) : Each detections prior center points.
+            Returns:
+                * frame : (np.ndarray) : Modified frame where trails have been drawn. 
+        '''
+
+        trails = [np.asarray(center_points, dtype=np.int32).reshape(-1, 1, 2) for center_points in trails if len(center_points) >= 2]
+
+        if not trails:
             return frame
 
-        # Iterate over center points list entries and render each onto frame.
-        for x in range(1, len(center_points)):
+        cv2.polylines(frame, trails, False, self.bbox_colours['trail'], self.trail_thickness)
 
-            cv2.line(
-                frame,
-                center_points[x - 1],
-                center_points[x],
-                self.bbox_colours['trail'],
-                self.trail_thickness
-            )
+        # Zero length segments draw as filled dots, marking the first and current center points.
+        end_points = [trail[index][None].repeat(2, axis=0) for trail in trails for index in (0, -1)]
 
-        # Annotate last most center point.
-        self.annotate_center_point(frame, center_points[0])
-        # Render current most center point value.
-        self.annotate_center_point(frame, center_points[-1])
+        cv2.polylines(frame, end_points, False, self.bbox_colours['offender'], self.center_point_radius * 2 + self.thickness)
 
         return frame
     
@@ -408,4 +719,76 @@ class Annotations(object):
         )
 
         return annotated_frame
-    
\ No newline at end of file
+
+
+    def crop_violation_region(self, frame : np.ndarray, detection : dict) -> tuple[np.ndarray, tuple[int, int]]:
+
+        '''
+            Fetch the padded region surrounding an offending detection, as a view onto the frame.
+
+            Paramaters:
+                * frame : (np.ndarray) : frame the detection was made upon.
+                * detection : (dict) : offending detection.
+            Returns:
+                * tuple[np.ndarray, tuple[int, int]] : the region and its top left offset within the frame.
+        '''
+
+        h, w = frame.shape[:2]
+
+        padded_x1 = int(max(0, detection['x1'] - self.padding))
+        padded_y1 = int(max(0, detection['y1'] - self.padding))
+        padded_x2 = int(min(w, detection['x2'] + self.padding))
+        padded_y2 = int(min(h, detection['y2'] + self.padding))
+
+        return frame[padded_y1:padded_y2, padded_x1:padded_x2], (padded_x1, padded_y1)
+
+
+    def render_violation_evidence(self, region : np.ndarray, region_offset : tuple[int, int], detection : dict, captured_at : str) -> np.ndarray:
+
+        '''
+            Render violation evidence from only the region surrounding the offender, upscaling small regions for legibility
+                and appending the capture metadata and plate beneath it.
+
+            Paramaters:
+                * region : (np.ndarray) : padded region surrounding the offender, drawn upon.
+                * region_offset : (tuple[int, int]) : top left offset of the region within its frame.
+                * detection : (dict) : offending detection.
+                * captured_at : (str) : formatted time of capture.
+            Returns:
+                * evidence : (np.ndarray) : rendered evidence image.
+        '''
+
+        offset_x, offset_y = region_offset
+
+        # Upscale small regions so overlays remain legible.
+        scale = max(1.0, self.evidence_min_width / max(region.shape[1], 1))
+        evidence_region = cv2.resize(region, None, fx=scale, fy=scale) if scale > 1.0 else region
+
+        # Shift the detection into the regions coordinates.
+        region_detection = {
+            **detection,
+            'x1' : (detection['x1'] - offset_x) * scale, 'x2' : (detection['x2'] - offset_x) * scale,
+            'y1' : (detection['y1'] - offset_y) * scale, 'y2' : (detection['y2'] - offset_y) * scale
+        }
+
+        self.annotate_bbox_corners(evidence_region, region_detection)
+
+        # Append capture metadata and plate beneath the region.
+        license_plate = detection.get('license_plate', {}).get('plate_text', 'OCCLUDED')
+        label = f"{self.create_label(detection, 'traffic_violation', captured_at)} | Plate: {license_plate}"
+        (label_text_width, label_text_height), label_font_scale = self.fetch_text_properties(label, evidence_region)
+
+        label_height = label_text_height + self.label_padding * 2
+        label_bar = np.zeros((label_height, evidence_region.shape[1], 3), dtype=evidence_region.dtype)
+
+        cv2.putText(
+            label_bar,
+            label,
+            ((label_bar.shape[1] - label_text_width) // 2, label_height // 2 + label_text_height // 2),
+            self.font,
+            label_font_scale,
+            self.font_colour,
+            self.font_thickness
+        )
+
+        return np.vstack((evidence_region, label_bar))
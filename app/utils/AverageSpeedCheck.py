@@ -0,0 +1,182 @@
+import sqlite3
+import time
+
+
+class AverageSpeedCheck(object):
+
+    '''
+        Module for average speed enforcement between camera sites a known distance apart. Confirmed plate reads are recorded
+            as sightings (plate, camera, timestamp) within a SQLite index shared by every site, standing in for the inter site
+            link, and each sighting at an exit camera is matched against earlier sightings at its paired entry camera to
+            calculate the vehicles average speed. Sightings older than the matching window are evicted to bound storage.
+    '''
+
+    def __init__(
+        self,
+        database_path : str,
+        camera_id : str,
+        site_pairs : list[dict] = None,
+        sighting_window : float = 3600,
+        commit_interval : float = 1.0,
+        eviction_interval : float = 60.0,
+        deregistration_time : int = 12,
+        measurement : str = 'mph'
+    ):
+
+        '''
+            Parameters:
+                * database_path : str -> path to the SQLite sightings index, shared between sites.
+                * camera_id : str -> ID of the camera this pipeline processes.
+                * site_pairs : list[dict] -> pairs of sites, each with an 'entry_camera', 'exit_camera' and the 'distance'
+                    in METERS between them.
+                * sighting_window : float -> seconds sightings are kept and matched within.
+                * commit_interval : float -> seconds between batched commits of new sightings.
+                * eviction_interval : float -> seconds between evictions of sightings outside the window.
+                * deregistration_time : int -> seconds before an unseen detection is pruned.
+                * measurement : str -> unit of measurement for the produced speeds.
+        '''
+
+        self.camera_id = camera_id
+        self.site_pairs = site_pairs or []
+        self.sighting_window = sighting_window
+        self.commit_interval = commit_interval
+        self.eviction_interval = eviction_interval
+        self.deregistration_time = deregistration_time
+        self.measurement = measurement
+        self.recorded_detections = {}
+        self.last_committed = time.time()
+        self.last_evicted = time.time()
+
+        # Conversion values from meters per second.
+        self.conversion_factors = {'mph': 2.23,  'kmh': 3.6}
+
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
+
+        # Allow other sites to read whilst this site writes.
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS sightings (plate TEXT NOT NULL, camera_id TEXT NOT NULL, seen_at REAL NOT NULL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS sightings_plate_camera_time ON sightings (plate, camera_id, seen_at)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS sightings_time ON sightings (seen_at)')
+        self.connection.commit()
+
+
+    def check_detections(self, detections : list[dict], seen_at : float = None) -> list[dict]:
+
+        '''
+            Record a sighting for each detection once its plate has been confirmed, attaching the average speed to
+                detections matched with a sighting at a paired entry camera.
+
+            Parameters:
+                * detections : list[dict] -> detections containing their license plate data.
+                * seen_at : float -> timestamp of the current frame, defaults to the current time.
+
+            Returns:
+                * detections : list[dict] -> detections, those matched updated with their average speed.
+        '''
+
+        if seen_at is None:
+            seen_at = time.time()
+
+        for detection in detections:
+
+            ID = detection.get('ID')
+            license_plate = detection.get('license_plate', {})
+
+            # Only confirmed plates are recorded, so a changing read cannot leave stray sightings.
+            if ID is None or not license_plate.get('final'):
+                continue
+
+            if ID not in self.recorded_detections:
+                self.recorded_detections[ID] = {'average_speed' : self.record_sighting(license_plate['plate_text'], seen_at)}
+
+            self.recorded_detections[ID]['last_seen'] = seen_at
+
+            if self.recorded_detections[ID]['average_speed'] is not None:
+                detection['average_speed'] = self.recorded_detections[ID]['average_speed']
+
+        self.maintain_index(seen_at)
+        self.prune_outdated_objects(seen_at)
+
+        return detections
+
+
+    def record_sighting(self, plate_text : str, seen_at : float) -> float | None:
+
+        '''
+            Record a plate sighting at this camera, matching it against the latest sighting at any paired entry camera.
+
+            Parameters:
+                * plate_text : str -> confirmed plate.
+                * seen_at : float -> timestamp of the sighting.
+
+            Returns:
+                * float | None -> average speed across the matched section, None if no match was found.
+        '''
+
+        self.connection.execute('INSERT INTO sightings (plate, camera_id, seen_at) VALUES (?, ?, ?)', (plate_text, self.camera_id, seen_at))
+
+        for site_pair in self.site_pairs:
+
+            if site_pair['exit_camera'] != self.camera_id:
+                continue
+
+            entry_sighting = self.connection.execute(
+                'SELECT MAX(seen_at) FROM sightings WHERE plate = ? AND camera_id = ? AND seen_at >= ? AND seen_at < ?',
+                (plate_text, site_pair['entry_camera'], seen_at - self.sighting_window, seen_at)
+            ).fetchone()[0]
+
+            if entry_sighting is not None:
+                average_speed = (site_pair['distance'] / (seen_at - entry_sighting)) * self.conversion_factors[self.measurement]
+                return round(float(average_speed), 2)
+
+        return None
+
+
+    def maintain_index(self, updated_at : float) -> None:
+
+        ''' Commit batched sightings and evict those outside the window once their intervals have elapsed. '''
+
+        if updated_at - self.last_evicted >= self.eviction_interval:
+            self.connection.execute('DELETE FROM sightings WHERE seen_at < ?', (updated_at - self.sighting_window,))
+            self.last_evicted = updated_at
+
+        if updated_at - self.last_committed >= self.commit_interval:
+            self.connection.commit()
+            self.last_committed = updated_at
+
+
+    def commit(self) -> None:
+
+        ''' Commit outstanding sightings without waiting for the commit interval. '''
+
+        self.connection.commit()
+        self.last_committed = time.time()
+
+
+    def close(self) -> None:
+
+        ''' Commit outstanding sightings and close the index. '''
+
+        self.connection.commit()
+        self.connection.close()
+
+
+    def prune_outdated_objects(self, updated_at):
+
+        '''
+            Iterate over parameterised detections and prune those exceeding the set time limit threshold.
+
+            Parameters:
+                * updated_at : float -> timestamp of the current update.
+            Returns:
+                * None.
+        '''
+
+        # Initialise list to store ID values of detections to be pruned.
+        stale_detections = [ID for ID, detection in self.recorded_detections.items()
+                            if (updated_at - detection['last_seen']) > self.deregistration_time]
+
+        # Iterate over the IDs present.
+        for ID in stale_detections:
+            # Use IDs to delete entries from tracked objects.
+            del self.recorded_detections[ID]
@@ -313,3 +313,79 @@ def measure_euclidean_distance(p1, p2):
     '''
 
     return (p1[0] - p2[0]) **2 + (p1[1] - p2[1]) **2
+
+
+def calculate_line_crossing(p1, p2, line):
+
+    '''
+        Function to determine whether the segment travelled between two center points crosses a given line, returning how
+            far along the travelled segment the crossing occurred so timestamps can be interpolated between frames.
+
+        Paramaters:
+
+            * p1 : tuple -> (x1, y1), detections previous center point.
+            * p2 : tuple -> (x2, y2), detections current center point.
+            * line : tuple -> ((lx1, ly1), (lx2, ly2)), end points of the line to test against.
+
+        Returns:
+
+            * crossing_fraction : float | None -> value between 0 and 1 representing where along p1 -> p2 the line was 
+                crossed, None if the segment does not cross the line.
+    '''
+
+    (lx1, ly1), (lx2, ly2) = line
+
+    # Direction vectors of the travelled segment and the line.
+    segment_dx, segment_dy = p2[0] - p1[0], p2[1] - p1[1]
+    line_dx, line_dy = lx2 - lx1, ly2 - ly1
+
+    # Cross product of both directions, zero when parallel.
+    denominator = segment_dx * line_dy - segment_dy * line_dx
+
+    if denominator == 0:
+        return None
+
+    # Solve for the intersection position along both the segment and the line.
+    segment_fraction = ((lx1 - p1[0]) * line_dy - (ly1 - p1[1]) * line_dx) / denominator
+    line_fraction = ((lx1 - p1[0]) * segment_dy - (ly1 - p1[1]) * segment_dx) / denominator
+
+    # Only count crossings occuring within both finite segments.
+    if 0 <= segment_fraction <= 1 and 0 <= line_fraction <= 1:
+        return segment_fraction
+
+    return None
+
+
+def letterbox_frame(frame, size, pad_colour=(114, 114, 114)):
+
+    '''
+        Function to resize a frame to fit within a fixed square size whilst preserving its aspect ratio, padding the remaining
+            area so many frames of differing shapes can be batched together for inference.
+
+        Paramaters:
+
+            * frame : np.ndarray -> frame to be letterboxed.
+            * size : int -> width and height in pixels of the letterboxed output.
+            * pad_colour : tuple -> BGR values used for the padded area.
+
+        Returns:
+
+            * letterboxed_frame, scale, (pad_x, pad_y) : tuple -> the letterboxed frame, the scale applied to the frame and
+                the padding added to its left and top, required to map coordinates back onto the original frame.
+    '''
+
+    frame_height, frame_width = frame.shape[:2]
+
+    # Scale the longest side to fit, preserving the aspect ratio.
+    scale = size / max(frame_height, frame_width)
+    resized_width, resized_height = max(1, int(round(frame_width * scale))), max(1, int(round(frame_height * scale)))
+
+    resized_frame = cv2.resize(frame, (resized_width, resized_height), interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+
+    # Center the resized frame within the padded square.
+    pad_x, pad_y = (size - resized_width) // 2, (size - resized_height) // 2
+
+    letterboxed_frame = np.full((size, size, frame.shape[2]), pad_colour, dtype=frame.dtype)
+    letterboxed_frame[pad_y:pad_y + resized_height, pad_x:pad_x + resized_width] = resized_frame
+
+    return letterboxed_frame, scale, (pad_x, pad_y)
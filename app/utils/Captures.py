@@ -1,64 +1,112 @@
 import datetime
-import cv2 
 from ..Settings import CAPTURES_DIR_PATH, BASE_YOLO_CONFIDENCE_THRESHOLD
 import time
 import os
 from .Annotations import Annotations
+from .EvidenceWriter import EvidenceWriter
+from .FrameRingBuffer import FrameRingBuffer
+from .ViolationStore import ViolationStore
 
 
 class Captures(object):
 
 
-    def __init__(self, annotations : Annotations, speed_limit = 0, deregistration_time=12):
+    def __init__(self, annotations : Annotations, speed_limit = 0, deregistration_time=12, evidence_writer : EvidenceWriter = None, frame_ring_buffer : FrameRingBuffer = None, violation_store : ViolationStore = None):
         self.annotations = annotations
         self.speed_limit = speed_limit
         self.captured_offenders = {}
         self.deregistration_time = deregistration_time
 
+        # Optional store violations are recorded in.
+        self.violation_store = violation_store
 
-    def capture_offense(self, detection, frame):
+        # Render and write evidence in the background, away from the frame loop.
+        self.evidence_writer = evidence_writer or EvidenceWriter(annotations=annotations, output_dir=CAPTURES_DIR_PATH, violation_store=violation_store)
 
-        detection['offender'] = True
+        # Optional buffer of recent frames to write pre and post event clips from.
+        self.frame_ring_buffer = frame_ring_buffer
+
+        os.makedirs(CAPTURES_DIR_PATH, exist_ok=True)
 
-        captured_at = datetime.datetime.now().strftime('%a-%b-%Y_%I-%M-%S%p')
 
-        filename = os.path.join(CAPTURES_DIR_PATH, f'{captured_at}.jpg')
+    def capture_offense(self, detection, frame, speed_key : str = 'speed', captured_timestamp : float = None):
 
-        cropped_frame = self.annotations.capture_traffic_violation(frame, detection, captured_at)
-       
-        try:
-            cv2.imwrite(filename, cropped_frame)
-        except Exception as e:
-            print(f'Error occurded writing out capture to application directory! \n{e}')
+        detection['offender'] = True
+
+        if captured_timestamp is None:
+            captured_timestamp = time.time()
+        captured_at = datetime.datetime.fromtimestamp(captured_timestamp).strftime('%a-%b-%Y_%I-%M-%S%p')
+
+        violation = {
+            'captured_at' : captured_timestamp,
+            'track_id' : detection.get('ID'),
+            'plate' : detection.get('license_plate', {}).get('plate_text'),
+            'speed' : detection.get(speed_key),
+            'speed_key' : speed_key,
+            'speed_limit' : self.speed_limit,
+            'status' : 'captured'
+        }
+
+        # Recorded as soon as it is captured, so dropped or failed evidence never loses the violation.
+        if self.violation_store is not None:
+            self.violation_store.record_violation(violation)
+
+        if self.frame_ring_buffer is not None:
+            # Millisecond capture time and track ID keep clips of offenders captured together apart, the clip path is
+            # filled in on the violation once the clip has been written.
+            clip_path = os.path.join(CAPTURES_DIR_PATH, f'{int(captured_timestamp * 1000)}_ID-{detection.get("ID")}.mp4')
+            self.frame_ring_buffer.request_clip(clip_path, violation)
+
+        # Evidence is named by its content and filled in on the violation once written.
+        self.evidence_writer.submit(frame, detection, captured_at, violation)
+
+        return captured_timestamp
     
 
-    def compare_speed(self, detections, frame):
+    def compare_speed(self, detections, frame, speed_key : str = 'speed', detected_at : float = None):
+
+        '''
+            Capture detections whose speed exceeds the speed limit, once per detection.
+
+            Parameters:
+                * detections : list[dict] -> detections to check.
+                * frame : np.ndarray -> frame the detections were made upon.
+                * speed_key : str -> detection speed to compare, 'speed' for point speeds or 'average_speed' for speeds
+                    averaged between camera sites.
+                * detected_at : float -> timestamp of the current frame, defaults to the current time.
 
-        ''' '''
+            Returns:
+                * detections : list[dict] -> detections, offenders marked as such.
+        '''
 
-        detected_at = time.time()
-        already_captured = False
+        if detected_at is None:
+            detected_at = time.time()
 
         for detection in detections:
 
             ID = detection.get('ID')
-            speed = detection.get('speed')
+            speed = detection.get(speed_key)
             confidence_score = detection.get('confidence_score')
 
+            # Track offenders separately per speed measure so each can raise its own violation.
+            offender_key = (speed_key, ID)
+
             if  speed is not None and \
                 speed > self.speed_limit and \
-                confidence_score > BASE_YOLO_CONFIDENCE_THRESHOLD and \
-                not already_captured:
+                confidence_score > BASE_YOLO_CONFIDENCE_THRESHOLD:
+
+                if offender_key not in self.captured_offenders:
+                    self.captured_offenders[offender_key] = { 'last_detected' : detected_at, 'already_captured' : False }
 
-                if ID not in self.captured_offenders:
-                    self.captured_offenders[ID] = { 'last_detected' : detected_at, 'already_captured' : already_captured }
+                self.captured_offenders[offender_key]['last_detected'] = detected_at
 
-                self.captured_offenders[ID]['last_detected'] = detected_at
+                if not self.captured_offenders[offender_key]['already_captured']:
+                    captured_offender = self.captured_offenders[offender_key]
+                    captured_offender['captured_at'] = self.capture_offense(detection, frame, speed_key, detected_at)
+                    captured_offender['plate_recorded'] = bool(detection.get('license_plate', {}).get('final'))
+                    captured_offender['already_captured'] = True
 
-                if not self.captured_offenders[ID]['already_captured']:
-                    self.capture_offense(detection, frame)
-                    self.captured_offenders[ID]['already_captured'] = True
-                    already_captured = True
+            self.record_confirmed_plate(offender_key, detection)
 
         self.prune_outdated_objects(detected_at)
 
@@ -66,6 +114,76 @@ class Captures(object):
         return detections
     
 
+    def record_final_speeds(self, final_estimates : dict, recorded_at : float = None) -> None:
+
+        '''
+            Record the final speeds of offline estimated tracks once they have ended, confirming or voiding violations
+                captured at their provisional speed and recording tracks only found to be speeding once their whole
+                trajectory was fitted.
+
+            Parameters:
+                * final_estimates : dict -> final speed estimates keyed by track ID, see SpeedEstimation.finalise_trajectory.
+                * recorded_at : float -> timestamp the tracks were found to have ended, defaults to the current time.
+
+            Returns:
+                * None.
+        '''
+
+        if self.violation_store is None:
+            return
+
+        if recorded_at is None:
+            recorded_at = time.time()
+
+        for ID, estimate in final_estimates.items():
+
+            captured_offender = self.captured_offenders.get(('speed', ID), {})
+            already_captured = captured_offender.get('already_captured', False)
+
+            since = captured_offender['captured_at'] if already_captured else estimate['first_seen_at']
+            updated_violations = self.violation_store.update_final_speed(ID, estimate['speed'], since=since)
+
+            if already_captured or updated_violations or estimate['speed'] <= self.speed_limit:
+                continue
+
+            # No frame is left to render evidence from once the track has ended.
+            self.violation_store.record_violation({
+                'captured_at' : recorded_at,
+                'track_id' : ID,
+                'speed' : estimate['speed'],
+                'speed_key' : 'speed',
+                'speed_limit' : self.speed_limit,
+                'final_speed' : estimate['speed'],
+                'status' : 'confirmed'
+            })
+
+
+    def record_confirmed_plate(self, offender_key, detection):
+
+        '''
+            Fill in the plate of a violation captured before the offenders plate was confirmed.
+
+            Parameters:
+                * offender_key : tuple -> speed measure and ID of the offender.
+                * detection : dict -> offending detection, containing its license plate data.
+
+            Returns:
+                * None.
+        '''
+
+        captured_offender = self.captured_offenders.get(offender_key)
+        license_plate = detection.get('license_plate', {})
+
+        if  self.violation_store is None or \
+            captured_offender is None or \
+            captured_offender.get('plate_recorded', True) or \
+            not license_plate.get('final'):
+            return
+
+        self.violation_store.update_plate(detection.get('ID'), license_plate['plate_text'], since=captured_offender['captured_at'])
+        captured_offender['plate_recorded'] = True
+
+
     def prune_outdated_objects(self, updated_at):
 
         '''
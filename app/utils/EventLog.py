@@ -0,0 +1,330 @@
+import json
+import os
+import queue
+import threading
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+
+class EventLog(object):
+
+    '''
+        Machine readable log of what the pipeline saw each frame. Each detection is reduced to a row of scalars within the
+            frame loop, with rows handed over in batches through a bounded queue to a worker thread writing them as
+            Parquet or Arrow IPC row groups, falling back to JSONL when pyarrow is not installed. Batches are dropped, and
+            counted, rather than stalling playback when the queue is full.
+    '''
+
+    def __init__(
+        self,
+        output_dir : str,
+        output_format : str = 'parquet',
+        batch_rows : int = 8192,
+        max_pending_batches : int = 16,
+        flush_interval : float = 5.0,
+        max_file_rows : int = 1_000_000,
+        max_file_seconds : float = 60.0
+    ):
+
+        '''
+            Parameters:
+                * output_dir : str -> directory event logs are written to.
+                * output_format : str -> 'parquet', 'arrow' for Arrow IPC, or 'jsonl'.
+                * batch_rows : int -> number of rows buffered before being handed to the writer.
+                * max_pending_batches : int -> maximum number of batches waiting to be written before further batches are dropped.
+                * flush_interval : float -> maximum seconds rows are buffered before being handed to the writer.
+                * max_file_rows : int -> number of rows after which a new log file is started, completing the previous one.
+                * max_file_seconds : float -> seconds after which a log file is completed, Parquet and Arrow IPC files are
+                    only readable once completed, so at most this much of the log is unreadable at any time.
+        '''
+
+        if output_format in ('parquet', 'arrow') and pa is None:
+            print(f'pyarrow is not installed, event log falling back from {output_format} to jsonl.')
+            output_format = 'jsonl'
+
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.max_file_rows = max_file_rows
+        self.max_file_seconds = max_file_seconds
+        self.buffered_rows = []
+        self.last_flushed = time.time()
+        self.frame_index = 0
+        self.batch_queue = queue.Queue(maxsize=max_pending_batches)
+        self.stop_event = threading.Event()
+
+        # Writer state, only touched by the worker.
+        self.writer = None
+        self.file_rows = 0
+        self.file_opened_at = 0.0
+
+        # Column names and types of each row.
+        self.columns = (
+            ('recorded_at', 'float64'),
+            ('frame_index', 'int64'),
+            ('track_id', 'int64'),
+            ('classname', 'string'),
+            ('confidence_score', 'float32'),
+            ('x1', 'float32'), ('y1', 'float32'), ('x2', 'float32'), ('y2', 'float32'),
+            ('speed', 'float32'),
+            ('average_speed', 'float32'),
+            ('plate_text', 'string'),
+            ('plate_final', 'bool_'),
+            ('hotlist_plate', 'string'),
+            ('hotlist_match_type', 'string'),
+            ('offender', 'bool_'),
+            ('speed_final', 'bool_')
+        )
+
+        if pa is not None:
+            self.schema = pa.schema([(name, getattr(pa, column_type)()) for name, column_type in self.columns])
+
+        # Backpressure metrics.
+        self.metrics = {
+            'rows_written' : 0,
+            'batches_written' : 0,
+            'rows_dropped' : 0,
+            'failed' : 0,
+            'total_write_time' : 0.0
+        }
+
+        os.makedirs(output_dir, exist_ok=True)
+
+        self.worker = threading.Thread(target=self.run_worker, daemon=True)
+        self.worker.start()
+
+
+    def record_frame(self, detections : list[dict], recorded_at : float = None) -> list[dict]:
+
+        '''
+            Record a row for every detection within the current frame.
+
+            Parameters:
+                * detections : list[dict] -> fully processed detections.
+                * recorded_at : float -> timestamp of the current frame, defaults to the current time.
+
+            Returns:
+                * detections : list[dict] -> detections, unmodified.
+        '''
+
+        if recorded_at is None:
+            recorded_at = time.time()
+
+        frame_index = self.frame_index
+        self.frame_index += 1
+
+        for detection in detections:
+
+            license_plate = detection.get('license_plate', {})
+
+            # Hotlist matches are ordered exact, confusion then fuzzy, the first being the closest.
+            hotlist_match = (license_plate.get('hotlist_matches') or [{}])[0]
+
+            self.buffered_rows.append((
+                recorded_at,
+                frame_index,
+                detection.get('ID'),
+                detection.get('classname'),
+                detection.get('confidence_score'),
+                detection.get('x1'), detection.get('y1'), detection.get('x2'), detection.get('y2'),
+                detection.get('speed'),
+                detection.get('average_speed'),
+                license_plate.get('plate_text'),
+                bool(license_plate.get('final', False)),
+                hotlist_match.get('plate'),
+                hotlist_match.get('match_type'),
+                bool(detection.get('offender', False)),
+                False
+            ))
+
+        self.flush_if_due()
+
+        return detections
+
+
+    def record_final_speeds(self, final_estimates : dict, recorded_at : float = None) -> None:
+
+        '''
+            Record a row for every offline estimated track that has ended, holding its final speed, marked by speed_final.
+
+            Parameters:
+                * final_estimates : dict -> final speed estimates keyed by track ID, see SpeedEstimation.finalise_trajectory.
+                * recorded_at : float -> timestamp the tracks were found to have ended, defaults to the current time.
+
+            Returns:
+                * None.
+        '''
+
+        if recorded_at is None:
+            recorded_at = time.time()
+
+        for ID, estimate in final_estimates.items():
+            self.buffered_rows.append((
+                recorded_at,
+                self.frame_index,
+                ID,
+                estimate.get('classname'),
+                None,
+                None, None, None, None,
+                estimate['speed'],
+                None,
+                None,
+                False,
+                None,
+                None,
+                False,
+                True
+            ))
+
+        self.flush_if_due()
+
+
+    def flush_if_due(self) -> None:
+
+        ''' Hand the buffered rows to the writer once a full batch is buffered or they have been held too long. '''
+
+        if len(self.buffered_rows) >= self.batch_rows or (self.buffered_rows and time.time() - self.last_flushed >= self.flush_interval):
+            self.flush()
+
+
+    def flush(self, block : bool = False) -> None:
+
+        '''
+            Hand the buffered rows to the writer.
+
+            Parameters:
+                * block : bool -> wait for room in the queue rather than dropping the rows when it is full.
+
+            Returns:
+                * None.
+        '''
+
+        buffered_rows, self.buffered_rows = self.buffered_rows, []
+        self.last_flushed = time.time()
+
+        if not buffered_rows:
+            return
+
+        try:
+            self.batch_queue.put(buffered_rows, block=block)
+        except queue.Full:
+            self.metrics['rows_dropped'] += len(buffered_rows)
+
+
+    def run_worker(self) -> None:
+
+        ''' Worker thread loop, writing queued batches until stopped and the queue has drained. '''
+
+        while not self.stop_event.is_set() or not self.batch_queue.empty():
+
+            try:
+                rows = self.batch_queue.get(timeout=0.1)
+            except queue.Empty:
+                # Complete files left open whilst idle.
+                if self.file_due():
+                    self.close_writer()
+                continue
+
+            started_at = time.perf_counter()
+
+            try:
+                self.write_batch(rows)
+
+                self.metrics['rows_written'] += len(rows)
+                self.metrics['batches_written'] += 1
+            except Exception as e:
+                self.metrics['failed'] += 1
+                print(f'Error occurred writing out event log! \n{e}')
+
+            self.metrics['total_write_time'] += time.perf_counter() - started_at
+
+        self.close_writer()
+
+
+    def write_batch(self, rows : list[tuple]) -> None:
+
+        ''' Write a batch of rows to the current log file, completing the file once it is full or has been open too long. '''
+
+        if self.writer is None:
+            self.open_writer()
+
+        if self.output_format == 'jsonl':
+            names = [name for name, _ in self.columns]
+            # Numpy scalars are converted to their Python equivalents.
+            self.writer.write(''.join(json.dumps(dict(zip(names, row)), default=lambda value: value.item()) + '\n' for row in rows))
+            self.writer.flush()
+        else:
+            # Transpose rows into columns, written as a single row group.
+            table = pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(zip(*rows), self.schema)],
+                schema=self.schema
+            )
+            self.writer.write_table(table)
+
+        self.file_rows += len(rows)
+
+        if self.file_due():
+            self.close_writer()
+
+
+    def file_due(self) -> bool:
+
+        ''' Whether the current log file is due to be completed. '''
+
+        return self.writer is not None and (
+            self.file_rows >= self.max_file_rows or time.time() - self.file_opened_at >= self.max_file_seconds
+        )
+
+
+    def open_writer(self) -> None:
+
+        ''' Start a new log file named by the time it was started. '''
+
+        filename = os.path.join(self.output_dir, f'events_{int(time.time() * 1000)}.{self.output_format}')
+
+        if self.output_format == 'parquet':
+            self.writer = pq.ParquetWriter(filename, self.schema)
+        elif self.output_format == 'arrow':
+            self.writer = pa_ipc.new_file(filename, self.schema)
+        else:
+            self.writer = open(filename, 'a', encoding='utf-8')
+
+        self.file_rows = 0
+        self.file_opened_at = time.time()
+
+
+    def close_writer(self) -> None:
+
+        ''' Complete the current log file, making columnar files readable. '''
+
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+    def fetch_metrics(self) -> dict:
+
+        ''' Fetch backpressure metrics, including the current queue depth and average batch write time in milliseconds. '''
+
+        return {
+            **self.metrics,
+            'queue_depth' : self.batch_queue.qsize(),
+            'avg_write_ms' : (self.metrics['total_write_time'] / self.metrics['batches_written']) * 1000 if self.metrics['batches_written'] else 0.0
+        }
+
+
+    def shutdown(self) -> None:
+
+        ''' Hand over any buffered rows and stop the worker once every batch has been written. '''
+
+        # Waits for the worker to make room, so the final rows are never dropped.
+        self.flush(block=True)
+        self.stop_event.set()
+        self.worker.join()
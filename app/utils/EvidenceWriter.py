@@ -0,0 +1,159 @@
+import hashlib
+import os
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+from .Annotations import Annotations
+from .ViolationStore import ViolationStore
+
+
+class EvidenceWriter(object):
+
+    '''
+        Background writer for traffic violation evidence. Only the padded region around an offender is copied out of the
+            frame within the frame loop, with overlay rendering and JPEG encoding handed to a worker thread through a bounded
+            queue. Captures are dropped, and counted, rather than stalling playback when the queue is full. Evidence is
+            named by the hash of its encoded bytes, so captures can never overwrite one another, and filled in on the
+            violation already recorded in the violation store once written.
+    '''
+
+    def __init__(
+        self,
+        annotations : Annotations,
+        output_dir : str,
+        violation_store : ViolationStore = None,
+        jpeg_quality : int = 90,
+        max_queue_size : int = 32
+    ):
+
+        '''
+            Parameters:
+                * annotations : Annotations -> annotations used to render evidence overlays.
+                * output_dir : str -> directory evidence is written to.
+                * violation_store : ViolationStore -> store the image path of each written violation is filled in on.
+                * jpeg_quality : int -> JPEG quality, between 0 and 100, evidence is encoded at.
+                * max_queue_size : int -> maximum number of captures waiting to be written.
+        '''
+
+        self.annotations = annotations
+        self.output_dir = output_dir
+        self.violation_store = violation_store
+        self.jpeg_quality = jpeg_quality
+        self.capture_queue = queue.Queue(maxsize=max_queue_size)
+        self.stop_event = threading.Event()
+
+        # Backpressure metrics.
+        self.metrics = {
+            'queued' : 0,
+            'written' : 0,
+            'dropped' : 0,
+            'failed' : 0,
+            'max_queue_depth' : 0,
+            'total_write_time' : 0.0
+        }
+
+        self.worker = threading.Thread(target=self.run_worker, daemon=True)
+        self.worker.start()
+
+
+    def submit(self, frame : np.ndarray, detection : dict, captured_at : str, violation : dict) -> bool:
+
+        '''
+            Copy the region of interest around an offender and queue it to be rendered and written.
+
+            Parameters:
+                * frame : np.ndarray -> frame the offender was detected upon.
+                * detection : dict -> offending detection.
+                * captured_at : str -> formatted time of capture.
+                * violation : dict -> violation already recorded in the store, its image path filled in once written.
+
+            Returns:
+                * bool -> True if queued, False if dropped as the queue is full.
+        '''
+
+        # Copy only the padded region around the offender out of the frame.
+        region, region_offset = self.annotations.crop_violation_region(frame, detection)
+
+        # Snapshot the detection so later pipeline updates do not alter the evidence.
+        capture = (region.copy(), region_offset, dict(detection), captured_at, dict(violation))
+
+        try:
+            self.capture_queue.put_nowait(capture)
+        except queue.Full:
+            self.metrics['dropped'] += 1
+            return False
+
+        self.metrics['queued'] += 1
+        self.metrics['max_queue_depth'] = max(self.metrics['max_queue_depth'], self.capture_queue.qsize())
+
+        return True
+
+
+    def run_worker(self) -> None:
+
+        ''' Worker thread loop, rendering and encoding queued captures until stopped and the queue has drained. '''
+
+        while not self.stop_event.is_set() or not self.capture_queue.empty():
+
+            try:
+                region, region_offset, detection, captured_at, violation = self.capture_queue.get(timeout=0.1)
+            except queue.Empty:
+                # Write out violations left buffered whilst idle.
+                if self.violation_store is not None:
+                    self.violation_store.flush_if_due()
+                continue
+
+            started_at = time.perf_counter()
+
+            try:
+                evidence = self.annotations.render_violation_evidence(region, region_offset, detection, captured_at)
+
+                encoded, encoded_evidence = cv2.imencode('.jpg', evidence, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+
+                if not encoded:
+                    raise IOError('cv2 could not encode evidence')
+
+                encoded_evidence = encoded_evidence.tobytes()
+
+                # Content addressed, identical evidence is only written once.
+                filename = os.path.join(self.output_dir, f'{hashlib.sha256(encoded_evidence).hexdigest()}.jpg')
+
+                if not os.path.exists(filename):
+                    with open(filename, 'wb') as evidence_file:
+                        evidence_file.write(encoded_evidence)
+
+                if self.violation_store is not None:
+                    self.violation_store.update_image_path(violation, filename)
+
+                self.metrics['written'] += 1
+            except Exception as e:
+                self.metrics['failed'] += 1
+                print(f'Error occurded writing out capture to application directory! \n{e}')
+
+            self.metrics['total_write_time'] += time.perf_counter() - started_at
+
+
+    def fetch_metrics(self) -> dict:
+
+        ''' Fetch backpressure metrics, including the current queue depth and average write time in milliseconds. '''
+
+        completed = self.metrics['written'] + self.metrics['failed']
+
+        return {
+            **self.metrics,
+            'queue_depth' : self.capture_queue.qsize(),
+            'avg_write_ms' : (self.metrics['total_write_time'] / completed) * 1000 if completed else 0.0
+        }
+
+
+    def shutdown(self) -> None:
+
+        ''' Stop the worker once every queued capture has been written. '''
+
+        self.stop_event.set()
+        self.worker.join()
+
+        if self.violation_store is not None:
+            self.violation_store.flush()
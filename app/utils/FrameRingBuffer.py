@@ -0,0 +1,339 @@
+import queue
+import threading
+import time
+from collections import deque
+import cv2
+import numpy as np
+from .ViolationStore import ViolationStore
+
+
+class FrameRingBuffer(object):
+
+    '''
+        Ring buffer holding the last few seconds of a stream as JPEG encoded frames, keeping memory bounded, from which pre
+            and post event evidence clips are written to disk when a violation is captured. Frames are only downscaled
+            within the frame loop, JPEG encoding happens on an encoder thread and clips are written on a writer thread.
+            Frames, clip requests and resets are handed to the encoder through a single queue so they apply in stream order.
+            Each frame keeps its timestamp, frames dropped under load are filled by repeating the previous frame so clips
+            play back in real time, and a clip is only recorded against its violation once written.
+    '''
+
+    def __init__(
+        self,
+        pre_event_seconds : float = 5.0,
+        post_event_seconds : float = 3.0,
+        frame_rate : float = 30,
+        jpeg_quality : int = 70,
+        scale : float = 0.5,
+        max_pending_clips : int = 4,
+        max_pending_frames : int = 8,
+        violation_store : ViolationStore = None
+    ):
+
+        '''
+            Parameters:
+                * pre_event_seconds : float -> seconds of frames buffered before a violation.
+                * post_event_seconds : float -> seconds of frames collected after a violation.
+                * frame_rate : float -> frame rate of the stream, determining how many frames are buffered.
+                * jpeg_quality : int -> JPEG quality, between 0 and 100, buffered frames are encoded at.
+                * scale : float -> factor frames are resized by before encoding, trading detail for memory and encoding time.
+                * max_pending_clips : int -> maximum number of clips waiting to be written before further clips are dropped.
+                * max_pending_frames : int -> maximum number of frames waiting to be encoded before further frames are dropped.
+                * violation_store : ViolationStore -> store the clip path of each written violation is filled in on.
+        '''
+
+        self.pre_event_seconds = pre_event_seconds
+        self.post_event_seconds = post_event_seconds
+        self.jpeg_quality = jpeg_quality
+        self.scale = scale
+        self.violation_store = violation_store
+        self.frame_rate = None
+        self.requested_frame_rate = None
+        self.pending_clips = []
+        self.frame_queue = queue.Queue(maxsize=max_pending_frames)
+        self.clip_queue = queue.Queue(maxsize=max_pending_clips)
+        self.encoder_stop_event = threading.Event()
+        self.stop_event = threading.Event()
+
+        # Memory and encoding cost metrics.
+        self.metrics = {
+            'buffered_bytes' : 0,
+            'encoded_frames' : 0,
+            'dropped_frames' : 0,
+            'total_encode_time' : 0.0,
+            'clips_written' : 0,
+            'clips_dropped' : 0
+        }
+
+        self.set_frame_rate(frame_rate)
+        self.apply_frame_rate(self.requested_frame_rate)
+
+        self.encoder = threading.Thread(target=self.run_encoder, daemon=True)
+        self.encoder.start()
+
+        self.worker = threading.Thread(target=self.run_worker, daemon=True)
+        self.worker.start()
+
+
+    def set_frame_rate(self, frame_rate : float) -> None:
+
+        ''' Resize the buffer to hold the pre event duration at the given frame rate, clearing it if the rate changes. '''
+
+        frame_rate = max(float(frame_rate or 0), 1.0)
+
+        if frame_rate == self.requested_frame_rate:
+            return
+
+        # The encoder thread owns the buffer, applied once it is reached in the queue.
+        if self.requested_frame_rate is not None:
+            self.frame_queue.put(('frame_rate', frame_rate))
+
+        self.requested_frame_rate = frame_rate
+
+
+    def apply_frame_rate(self, frame_rate : float) -> None:
+
+        ''' Recreate the buffer for a new frame rate. '''
+
+        self.frame_rate = frame_rate
+        self.buffered_frames = deque(maxlen=max(1, int(self.pre_event_seconds * frame_rate)))
+        self.metrics['buffered_bytes'] = 0
+
+
+    def add_frame(self, frame : np.ndarray, frame_timestamp : float = None) -> None:
+
+        '''
+            Hand a frame to the encoder thread, downscaled first so the queued frame is owned by the buffer, dropping it
+                if the encoder has fallen behind.
+
+            Parameters:
+                * frame : np.ndarray -> raw frame from the stream.
+                * frame_timestamp : float -> timestamp of the frame in seconds, defaults to the current time.
+
+            Returns:
+                * None.
+        '''
+
+        if frame_timestamp is None:
+            frame_timestamp = time.time()
+
+        # Frame sources may reuse their buffers, the encoder must hold its own frame.
+        if self.scale != 1.0:
+            frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        else:
+            frame = frame.copy()
+
+        try:
+            self.frame_queue.put_nowait(('frame', (frame_timestamp, frame)))
+        except queue.Full:
+            self.metrics['dropped_frames'] += 1
+
+
+    def request_clip(self, filename : str, violation : dict = None) -> None:
+
+        '''
+            Start a clip from the frames buffered up to now, written once the post event frames have been collected.
+
+            Parameters:
+                * filename : str -> path the clip is written to.
+                * violation : dict -> violation already recorded in the store, its clip path filled in once written.
+
+            Returns:
+                * None.
+        '''
+
+        # Never dropped, queued behind the frames already handed over.
+        self.frame_queue.put(('clip', (filename, violation)))
+
+
+    def reset(self) -> None:
+
+        '''
+            Drop buffered frames after the stream has been sought, so clips never span the jump. Clips still collecting
+                post event frames are written with the frames collected before the seek.
+        '''
+
+        self.frame_queue.put(('reset', None))
+
+
+    def run_encoder(self) -> None:
+
+        ''' Encoder thread loop, applying queued frames, clip requests and resets in order until stopped and drained. '''
+
+        while not self.encoder_stop_event.is_set() or not self.frame_queue.empty():
+
+            try:
+                item_type, item = self.frame_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            try:
+                if item_type == 'frame':
+                    self.encode_frame(*item)
+                elif item_type == 'clip':
+                    self.start_clip(*item)
+                elif item_type == 'frame_rate':
+                    self.apply_frame_rate(item)
+                else:
+                    self.clear_buffer()
+            except Exception as e:
+                print(f'Error occurded buffering frame for evidence clips! \n{e}')
+
+
+    def encode_frame(self, frame_timestamp : float, frame : np.ndarray) -> None:
+
+        ''' Encode a frame into the buffer, evicting the oldest once full, and hand it to any clips awaiting post event frames. '''
+
+        started_at = time.perf_counter()
+
+        encoded, encoded_frame = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+
+        self.metrics['total_encode_time'] += time.perf_counter() - started_at
+        self.metrics['encoded_frames'] += 1
+
+        if not encoded:
+            return
+
+        encoded_frame = (frame_timestamp, encoded_frame.tobytes())
+
+        # Account for the frame about to be evicted.
+        if len(self.buffered_frames) == self.buffered_frames.maxlen:
+            self.metrics['buffered_bytes'] -= len(self.buffered_frames[0][1])
+
+        self.buffered_frames.append(encoded_frame)
+        self.metrics['buffered_bytes'] += len(encoded_frame[1])
+
+        # Collect post event frames, queueing clips once complete.
+        for pending_clip in self.pending_clips:
+            pending_clip['frames'].append(encoded_frame)
+
+        for pending_clip in [pending_clip for pending_clip in self.pending_clips if frame_timestamp >= pending_clip['ends_at']]:
+            self.pending_clips.remove(pending_clip)
+            self.queue_clip(pending_clip)
+
+
+    def start_clip(self, filename : str, violation : dict = None) -> None:
+
+        ''' Start a clip from the currently buffered frames, collecting post event frames until the post event duration has passed. '''
+
+        captured_at = self.buffered_frames[-1][0] if self.buffered_frames else time.time()
+
+        self.pending_clips.append({
+            'filename' : filename,
+            'violation' : violation,
+            'frames' : list(self.buffered_frames),
+            'ends_at' : captured_at + self.post_event_seconds
+        })
+
+
+    def clear_buffer(self) -> None:
+
+        ''' Write out clips still collecting post event frames and drop every buffered frame. '''
+
+        self.queue_pending_clips()
+        self.buffered_frames.clear()
+        self.metrics['buffered_bytes'] = 0
+
+
+    def queue_pending_clips(self, block : bool = False) -> None:
+
+        ''' Hand every clip still collecting post event frames to the writer with the frames collected so far. '''
+
+        for pending_clip in self.pending_clips:
+            self.queue_clip(pending_clip, block)
+
+        self.pending_clips = []
+
+
+    def queue_clip(self, pending_clip : dict, block : bool = False) -> None:
+
+        ''' Hand a clip to the writer, dropping it if the queue is full unless asked to wait. '''
+
+        try:
+            self.clip_queue.put((pending_clip['filename'], pending_clip['violation'], pending_clip['frames'], self.frame_rate), block=block)
+        except queue.Full:
+            self.metrics['clips_dropped'] += 1
+
+
+    def run_worker(self) -> None:
+
+        '''
+            Writer thread loop, decoding queued clips and writing them to disk until stopped and the queue has drained.
+                Each frame is held until the next frames timestamp is reached, so gaps left by dropped frames keep their
+                duration at the clips constant frame rate.
+        '''
+
+        while not self.stop_event.is_set() or not self.clip_queue.empty():
+
+            try:
+                filename, violation, encoded_frames, frame_rate = self.clip_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            video_writer = None
+            written = False
+
+            try:
+                if not encoded_frames:
+                    continue
+
+                first_timestamp = encoded_frames[0][0]
+                written_frames = 0
+                previous_frame = None
+
+                for frame_timestamp, encoded_frame in encoded_frames:
+
+                    frame = cv2.imdecode(np.frombuffer(encoded_frame, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+                    if video_writer is None:
+                        frame_height, frame_width = frame.shape[:2]
+                        video_writer = cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*'mp4v'), frame_rate, (frame_width, frame_height))
+
+                    # Hold the previous frame over any gap before this frame is due.
+                    if previous_frame is not None:
+                        for _ in range(int(round((frame_timestamp - first_timestamp) * frame_rate)) - written_frames):
+                            video_writer.write(previous_frame)
+                            written_frames += 1
+
+                    video_writer.write(frame)
+                    written_frames += 1
+                    previous_frame = frame
+
+                written = True
+                self.metrics['clips_written'] += 1
+            except Exception as e:
+                print(f'Error occurded writing out evidence clip to application directory! \n{e}')
+            finally:
+                if video_writer is not None:
+                    video_writer.release()
+
+            # Clips that were never written are left off their violation.
+            if written and violation is not None and self.violation_store is not None:
+                self.violation_store.update_clip_path(violation, filename)
+
+
+    def fetch_metrics(self) -> dict:
+
+        ''' Fetch memory usage and encoding cost metrics, including the average encoding time in milliseconds. '''
+
+        return {
+            **self.metrics,
+            'buffered_frames' : len(self.buffered_frames),
+            'queued_frames' : self.frame_queue.qsize(),
+            'pending_clips' : len(self.pending_clips) + self.clip_queue.qsize(),
+            'avg_encode_ms' : (self.metrics['total_encode_time'] / self.metrics['encoded_frames']) * 1000 if self.metrics['encoded_frames'] else 0.0
+        }
+
+
+    def shutdown(self) -> None:
+
+        ''' Encode every queued frame, write out clips still collecting post event frames and stop once every clip has been written. '''
+
+        self.encoder_stop_event.set()
+        self.encoder.join()
+
+        # Clips cut short by the end of the stream keep the frames collected so far.
+        self.queue_pending_clips(block=True)
+
+        self.stop_event.set()
+        self.worker.join()
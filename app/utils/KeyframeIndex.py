@@ -0,0 +1,135 @@
+import bisect
+import json
+import os
+
+try:
+    import av
+except ImportError:
+    av = None
+
+
+class KeyframeIndex(object):
+
+    '''
+        Index of a videos keyframes, by frame number and presentation timestamp, built by demuxing packets with PyAV
+            without decoding them and cached to disk next to the video. Seeking to the nearest keyframe and decoding
+            forward avoids the decoder restarting from an earlier keyframe on every seek. Without PyAV, or if the video
+            cannot be demuxed, the index is empty and seeks fall back to the capture backend.
+    '''
+
+    def __init__(self, video_path : str, cache_suffix : str = '.keyframes.json'):
+
+        '''
+            Parameters:
+                * video_path : str -> path to the video being indexed.
+                * cache_suffix : str -> suffix of the cached index, stored alongside the video.
+        '''
+
+        self.video_path = video_path
+        self.cache_path = f'{video_path}{cache_suffix}'
+        self.keyframes = []
+        self.keyframe_timestamps = []
+
+        if not self.load_cache():
+            self.build_index()
+            self.save_cache()
+
+
+    def fetch_video_signature(self) -> dict:
+
+        ''' Fetch the size and modification time of the video, invalidating cached indexes of changed videos. '''
+
+        video_stat = os.stat(self.video_path)
+
+        return {'size' : video_stat.st_size, 'mtime' : video_stat.st_mtime}
+
+
+    def load_cache(self) -> bool:
+
+        '''
+            Load the cached index, if present and built from the video as it currently is.
+
+            Returns:
+                * bool -> True if loaded.
+        '''
+
+        try:
+            with open(self.cache_path, encoding='utf-8') as cache_file:
+                cached_index = json.load(cache_file)
+        except (OSError, ValueError):
+            return False
+
+        if cached_index.get('video') != self.fetch_video_signature():
+            return False
+
+        self.keyframes = cached_index['keyframes']
+        self.keyframe_timestamps = cached_index['keyframe_timestamps']
+
+        return True
+
+
+    def build_index(self) -> None:
+
+        ''' Demux every video packet, recording the frame number and timestamp in seconds of each keyframe. '''
+
+        if av is None:
+            print('PyAV is not installed, seeking without a keyframe index.')
+            return
+
+        keyframes = []
+
+        try:
+            with av.open(self.video_path) as container:
+
+                stream = container.streams.video[0]
+                frame_rate = float(stream.average_rate or stream.guessed_rate or 30)
+                time_base = float(stream.time_base)
+                start_time = stream.start_time or 0
+
+                for packet in container.demux(stream):
+                    if packet.is_keyframe and packet.pts is not None:
+                        keyframe_timestamp = (packet.pts - start_time) * time_base
+                        keyframes.append((int(round(keyframe_timestamp * frame_rate)), keyframe_timestamp))
+        except Exception as e:
+            print(f'Error occurred indexing video keyframes! \n{e}')
+            return
+
+        keyframes.sort()
+
+        self.keyframes = [frame_number for frame_number, _ in keyframes]
+        self.keyframe_timestamps = [keyframe_timestamp for _, keyframe_timestamp in keyframes]
+
+
+    def save_cache(self) -> None:
+
+        ''' Cache the index alongside the video, skipped if its directory cannot be written to. '''
+
+        if not self.keyframes:
+            return
+
+        try:
+            with open(self.cache_path, 'w', encoding='utf-8') as cache_file:
+                json.dump({
+                    'video' : self.fetch_video_signature(),
+                    'keyframes' : self.keyframes,
+                    'keyframe_timestamps' : self.keyframe_timestamps
+                }, cache_file)
+        except OSError as e:
+            print(f'Error occurred caching keyframe index! \n{e}')
+
+
+    def nearest_keyframe(self, frame_number : int) -> int | None:
+
+        '''
+            Find the last keyframe at or before a frame.
+
+            Parameters:
+                * frame_number : int -> frame being sought.
+
+            Returns:
+                * int | None -> frame number of the keyframe, None if the video has not been indexed.
+        '''
+
+        position = bisect.bisect_right(self.keyframes, frame_number)
+
+        return self.keyframes[position - 1] if position else None
@@ -16,23 +16,25 @@ class ObjectDetection(object):
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
         # Load specific model from constructor. 
+        self.model_path = model
         self.detection_model = YOLO(model)
 
         self.class_list = self.detection_model.names
 
         #  Most likely classnames for traffic management and their average sizes in METERS found in the UK. 
+        #  Plate search bands are the top and bottom fractions of a vehicles bbox height where its plate is expected to be.
         self.classes_of_interest = {
             'car' : {
-                'width' : 1.821, 'height' : 1.534
+                'width' : 1.821, 'height' : 1.534, 'plate_search_band' : (0.45, 1.0)
             },
             'motorcycle' : {
-                'width' : 0.995, 'height' : 2.190
+                'width' : 0.995, 'height' : 2.190, 'plate_search_band' : (0.5, 1.0)
             },
             'bus' : {
-                'width' :  2.560, 'height' : 4.200
+                'width' :  2.560, 'height' : 4.200, 'plate_search_band' : (0.6, 1.0)
             },
             'truck' : {
-                'width' :  2.400, 'height' : 2.590
+                'width' :  2.400, 'height' : 2.590, 'plate_search_band' : (0.6, 1.0)
             },
             'License_Plate' : {
                 'width': 0.52, 'height': 0.11
@@ -60,12 +62,57 @@ class ObjectDetection(object):
         if frame is None or not isinstance(frame, np.ndarray):
             raise ValueError('Frame input is not valid! Must be a numpy array!')
 
-        # Initialise empty list. 
-        filtrated_detections = []
-
         # detections from a given frame formatted into a structured output. 
         detections = self.detection_model(frame, verbose=False, device=self.device)[0]
 
+        # Return filtrated data.
+        return self.filtrate_detections(detections)
+
+
+    def run_batch_inference(self, frames : list[np.ndarray], image_size : int = None) -> list[list[dict]]:
+
+        '''
+            Function to run the models inference over many frames in a single forward pass, most effective when frames
+                share the same size such as those letterboxed to a fixed square.
+
+            Parameters:
+            * frames : list[np.ndarray] -> input images for the detection model to run inference on.
+            * image_size : int -> inference size in pixels, defaults to the models own.
+
+            Returns:
+            * list[list[dict]] -> filtrated detections for each frame, in the order the frames were given. 
+        '''
+
+        if not frames:
+            return []
+
+        # Ensure input frames are valid data types.
+        if any(frame is None or not isinstance(frame, np.ndarray) for frame in frames):
+            raise ValueError('Frame input is not valid! Must be a numpy array!')
+
+        inference_arguments = {'verbose' : False, 'device' : self.device}
+
+        if image_size is not None:
+            inference_arguments['imgsz'] = image_size
+
+        return [self.filtrate_detections(detections) for detections in self.detection_model(frames, **inference_arguments)]
+
+
+    def filtrate_detections(self, detections) -> list[dict]:
+
+        '''
+            Filter a models results down to detections of interest above the confidence threshold.
+
+            Parameters:
+            * detections : ultralytics.engine.results.Results -> results of the models inference on a single frame.
+
+            Returns:
+            * filtrated_detections : list[dict] -> list of dictionaries containing detection metadata to be processed.
+        '''
+
+        # Initialise empty list. 
+        filtrated_detections = []
+
         # Iterate over each detection within a given inferred run. 
         for detection in detections.boxes.data.tolist():
             
@@ -1,11 +1,12 @@
 from .BboxUtils import calculate_center_point, measure_euclidean_distance
 from time import time 
+from .TrajectoryArchive import TrajectoryArchive
 
 class ObjectTracking(object):
 
     ''' Module to parse detection data, track them by assigning IDs and pruning them when no longer required. '''
 
-    def __init__(self, euclidean_distance_threshold : float = 10, deregistration_time : int = 10, frame_rate : int = 30):
+    def __init__(self, euclidean_distance_threshold : float = 10, deregistration_time : int = 10, frame_rate : int = 30, trajectory_archive : TrajectoryArchive = None):
 
         '''
         
@@ -21,15 +22,19 @@ class ObjectTracking(object):
 
         self.frame_rate = frame_rate
 
+        # Optional archive completed trajectories are persisted to once pruned.
+        self.trajectory_archive = trajectory_archive
+
     
-    def update_tracker(self, detections):
+    def update_tracker(self, detections, updated_at : float = None):
 
         ''' '''
 
         if detections is None or not isinstance(detections, list):
             raise ValueError('Detections being parsed not a list of dictionaries.')
 
-        updated_at = time()
+        if updated_at is None:
+            updated_at = time()
 
         parsed_detections = []
 
@@ -126,3 +131,23 @@ class ObjectTracking(object):
         for ID in stale_detections:
             # Use IDs to delete entries from tracked objects. 
             del self.tracked_objects[ID]
+
+            # Persist the completed trajectory before it is lost.
+            if self.trajectory_archive is not None:
+                self.trajectory_archive.archive_trajectory(ID)
+
+
+    def reset_tracker(self):
+
+        '''
+            Drop every tracked object, after the stream has been sought, so tracks cannot be matched across the jump.
+                IDs keep incrementing so they remain unique within the session.
+        '''
+
+        for ID in list(self.tracked_objects.keys()):
+
+            del self.tracked_objects[ID]
+
+            # Persist the ended trajectory before it is lost.
+            if self.trajectory_archive is not None:
+                self.trajectory_archive.archive_trajectory(ID)
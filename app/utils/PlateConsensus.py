@@ -0,0 +1,132 @@
+from collections import defaultdict
+
+
+class PlateConsensus(object):
+
+    '''
+        Module combining successive plate reads of a track through character level voting weighted by OCR confidence. A
+            tracks plate is declared final once every character of the leading candidate leads its runner up by the
+            configured margin, allowing further plate reads for that track to be skipped.
+    '''
+
+    def __init__(self, consensus_margin : float = 1.0, min_read_weight : float = 0.05, deregistration_time : int = 12):
+
+        '''
+            Parameters:
+                * consensus_margin : float -> summed confidence each character must lead its runner up by to be final.
+                * min_read_weight : float -> minimum weight a single read contributes, however low its confidence.
+                * deregistration_time : int -> seconds before an unseen track is pruned.
+        '''
+
+        self.consensus_margin = consensus_margin
+        self.min_read_weight = min_read_weight
+        self.deregistration_time = deregistration_time
+        self.plate_votes = {}
+
+
+    def add_read(self, ID : int, plate_text : str, confidence : float, updated_at : float, read_key = None) -> tuple[str, bool]:
+
+        '''
+            Add a plate read to a tracks votes.
+
+            Parameters:
+                * ID : int -> ID of the track the plate was read from.
+                * plate_text : str -> corrected plate text.
+                * confidence : float -> OCR confidence of the read, between 0 and 1.
+                * updated_at : float -> timestamp of the read.
+                * read_key -> identifies the plate crop the read came from, reads of a crop already voted for the track
+                    are not counted again, so reused cached results cannot outweigh independent reads.
+
+            Returns:
+                * tuple[str, bool] -> the tracks current consensus plate and whether it is final.
+        '''
+
+        plate_votes = self.plate_votes.setdefault(ID, {'votes' : {}, 'read_keys' : set(), 'final' : False})
+        plate_votes['last_seen'] = updated_at
+
+        if plate_votes['final']:
+            return plate_votes['plate_text'], True
+
+        if read_key is not None:
+
+            if read_key in plate_votes['read_keys']:
+                return plate_votes['plate_text'], False
+
+            plate_votes['read_keys'].add(read_key)
+
+        weight = max(float(confidence), self.min_read_weight)
+
+        # Votes are kept per plate length so characters are only compared against the same position.
+        position_votes = plate_votes['votes'].setdefault(len(plate_text), [defaultdict(float) for _ in plate_text])
+
+        for position, character in enumerate(plate_text):
+            position_votes[position][character] += weight
+
+        plate_text, margin = self.fetch_consensus(plate_votes['votes'])
+
+        plate_votes['plate_text'] = plate_text
+        plate_votes['final'] = margin >= self.consensus_margin
+
+        return plate_text, plate_votes['final']
+
+
+    def fetch_consensus(self, votes : dict) -> tuple[str, float]:
+
+        '''
+            Build the leading candidate from the most voted character at each position.
+
+            Parameters:
+                * votes : dict -> per position character weights keyed by plate length.
+
+            Returns:
+                * tuple[str, float] -> leading candidate and the smallest lead any of its characters holds.
+        '''
+
+        # Choose the plate length with the most weight behind it.
+        position_votes = max(votes.values(), key=lambda position_votes: sum(position_votes[0].values()))
+
+        plate_text, margin = '', float('inf')
+
+        for character_votes in position_votes:
+
+            ranked_weights = sorted(character_votes.values(), reverse=True) + [0.0]
+            plate_text += max(character_votes, key=character_votes.get)
+            margin = min(margin, ranked_weights[0] - ranked_weights[1])
+
+        return plate_text, margin
+
+
+    def touch(self, ID : int, updated_at : float) -> None:
+
+        ''' Refresh when a track was last seen, so final plates are kept whilst the track remains in view without new reads. '''
+
+        if ID in self.plate_votes:
+            self.plate_votes[ID]['last_seen'] = updated_at
+
+
+    def is_final(self, ID : int) -> bool:
+
+        ''' Whether a tracks plate has reached consensus. '''
+
+        return ID in self.plate_votes and self.plate_votes[ID]['final']
+
+
+    def prune_outdated_objects(self, updated_at):
+
+        '''
+            Iterate over parameterised detections and prune those exceeding the set time limit threshold.
+
+            Parameters:
+                * updated_at : float -> timestamp of the current update.
+            Returns:
+                * None.
+        '''
+
+        # Initialise list to store ID values of detections to be pruned.
+        stale_detections = [ID for ID, detection in self.plate_votes.items()
+                            if (updated_at - detection['last_seen']) > self.deregistration_time]
+
+        # Iterate over the IDs present.
+        for ID in stale_detections:
+            # Use IDs to delete entries from tracked objects.
+            del self.plate_votes[ID]
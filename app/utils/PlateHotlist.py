@@ -0,0 +1,245 @@
+import csv
+import os
+import threading
+from collections import defaultdict
+from rapidfuzz import process
+from rapidfuzz.distance import Levenshtein
+
+
+class PlateHotlist(object):
+
+    '''
+        Index of plates of interest (stolen, uninsured, etc.) loaded from CSV, supporting exact lookups alongside confusion
+            aware fuzzy lookups. Plates are canonicalised by collapsing characters OCR commonly confuses into a single class.
+            Canonical plates are bucketed by length and by their leading and trailing characters, a plate one edit away
+            always shares one of the two with the read, so fuzzy lookups only score a small bucket with rapidfuzz. The
+            index is built on a background thread whenever the CSV changes and swapped in whole, so neither start up nor
+            lookups pause whilst it loads.
+    '''
+
+    def __init__(self, csv_path : str, confusion_map : dict = None, max_edit_distance : int = 1, bucket_key_length : int = 3):
+
+        '''
+            Parameters:
+                * csv_path : str -> path to the hotlist CSV, with a 'plate' column and any further columns kept as the record.
+                * confusion_map : dict -> characters mapped onto the character they are commonly confused with.
+                * max_edit_distance : int -> 0 for exact and confusion lookups only, 1 to also match plates one edit away.
+                * bucket_key_length : int -> number of leading and trailing characters canonical plates are bucketed by.
+        '''
+
+        self.csv_path = csv_path
+        self.confusion_map = confusion_map or {}
+        self.confusion_table = str.maketrans(self.confusion_map)
+        self.max_edit_distance = min(max(max_edit_distance, 0), 1)
+        self.bucket_key_length = bucket_key_length
+        self.loaded_mtime = None
+        self.stop_event = threading.Event()
+        self.reload_lock = threading.Lock()
+        self.watcher = None
+
+        # Lookups match nothing until the first index has been built. The version changes with every index swapped in,
+        # so plates already checked can be checked again against a reloaded hotlist.
+        self.index = self.build_index((), [])
+        self.version = 0
+
+        self.loader = threading.Thread(target=self.reload, daemon=True)
+        self.loader.start()
+
+
+    def canonicalise_plate(self, plate_text : str) -> str:
+
+        ''' Normalise a plate, collapsing commonly confused characters into the same class. '''
+
+        cleansed_plate_text = plate_text.upper().replace(' ', '').strip()
+
+        return cleansed_plate_text.translate(self.confusion_table)
+
+
+    def fetch_bucket_keys(self, canonical_plate : str) -> tuple:
+
+        ''' Fetch the keys of the buckets a canonical plate is indexed under, a single key for plates too short to split. '''
+
+        length = len(canonical_plate)
+
+        if length < 2 * self.bucket_key_length:
+            return (('length', length),)
+
+        return (('prefix', length, canonical_plate[:self.bucket_key_length]), ('suffix', length, canonical_plate[-self.bucket_key_length:]))
+
+
+    def build_index(self, fieldnames : tuple, rows : list[tuple]) -> dict:
+
+        '''
+            Build the lookup structures for the rows of a hotlist.
+
+            Parameters:
+                * fieldnames : tuple -> CSV column names, shared by every row rather than repeated per record.
+                * rows : list[tuple] -> hotlist rows, each containing at least a 'plate'.
+
+            Returns:
+                * index : dict -> exact, canonical and bucket lookup tables.
+        '''
+
+        plate_column = fieldnames.index('plate') if 'plate' in fieldnames else None
+        exact_plates = {}
+        canonical_plates = defaultdict(list)
+        bucketed_plates = defaultdict(list)
+
+        if plate_column is None:
+            rows = ()
+
+        for row in rows:
+
+            plate_text = row[plate_column].upper().replace(' ', '').strip() if len(row) > plate_column else ''
+
+            if not plate_text or plate_text in exact_plates:
+                continue
+
+            exact_plates[plate_text] = row
+            canonical_plate = self.canonicalise_plate(plate_text)
+
+            # Only bucket each canonical plate once.
+            if canonical_plate not in canonical_plates and self.max_edit_distance > 0:
+                for bucket_key in self.fetch_bucket_keys(canonical_plate):
+                    bucketed_plates[bucket_key].append(canonical_plate)
+
+            canonical_plates[canonical_plate].append(plate_text)
+
+        return {'fieldnames' : fieldnames, 'exact' : exact_plates, 'canonical' : dict(canonical_plates), 'buckets' : dict(bucketed_plates)}
+
+
+    def lookup(self, plate_text : str) -> list[dict]:
+
+        '''
+            Find hotlist entries matching a plate read.
+
+            Parameters:
+                * plate_text : str -> plate read by ANPR.
+
+            Returns:
+                * list[dict] -> matches, each containing the hotlisted 'plate', its 'record' and the 'match_type' of
+                    'exact', 'confusion' or 'fuzzy'. Empty if nothing matched.
+        '''
+
+        # Hold a reference so a reload mid lookup cannot mix two indexes.
+        index = self.index
+
+        if not plate_text:
+            return []
+
+        plate_text = plate_text.upper().replace(' ', '').strip()
+
+        if plate_text in index['exact']:
+            return [self.create_match(index, plate_text, 'exact')]
+
+        canonical_plate = self.canonicalise_plate(plate_text)
+
+        matches = [self.create_match(index, hotlist_plate, 'confusion') for hotlist_plate in index['canonical'].get(canonical_plate, [])]
+
+        if matches or self.max_edit_distance == 0:
+            return matches
+
+        # An insertion, deletion or substitution leaves either the leading or trailing characters of the read intact.
+        candidate_plates = set()
+
+        for length in range(len(canonical_plate) - 1, len(canonical_plate) + 2):
+
+            if length < 2 * self.bucket_key_length:
+                candidate_plates.update(index['buckets'].get(('length', length), []))
+            else:
+                candidate_plates.update(index['buckets'].get(('prefix', length, canonical_plate[:self.bucket_key_length]), []))
+                candidate_plates.update(index['buckets'].get(('suffix', length, canonical_plate[-self.bucket_key_length:]), []))
+
+        fuzzy_plates = process.extract(
+            canonical_plate,
+            list(candidate_plates),
+            scorer=Levenshtein.distance,
+            score_cutoff=self.max_edit_distance,
+            limit=None
+        )
+
+        for candidate_plate, _, _ in fuzzy_plates:
+            matches += [self.create_match(index, hotlist_plate, 'fuzzy') for hotlist_plate in index['canonical'][candidate_plate]]
+
+        return matches
+
+
+    def create_match(self, index : dict, hotlist_plate : str, match_type : str) -> dict:
+
+        ''' Create a match, expanding the hotlisted plates row into its record. '''
+
+        return {'plate' : hotlist_plate, 'record' : dict(zip(index['fieldnames'], index['exact'][hotlist_plate])), 'match_type' : match_type}
+
+
+    def reload(self) -> bool:
+
+        '''
+            Rebuild the index from the CSV if it has changed since last loaded, swapping it in once complete. Called from
+                background threads, a reload already in progress is not repeated.
+
+            Returns:
+                * bool -> True if a new index was loaded.
+        '''
+
+        if not self.reload_lock.acquire(blocking=False):
+            return False
+
+        try:
+            try:
+                mtime = os.path.getmtime(self.csv_path)
+            except OSError:
+                return False
+
+            if mtime == self.loaded_mtime:
+                return False
+
+            try:
+                with open(self.csv_path, newline='', encoding='utf-8') as csv_file:
+                    csv_reader = csv.reader(csv_file)
+                    fieldnames = tuple(next(csv_reader, ()))
+
+                    if 'plate' not in fieldnames:
+                        raise ValueError('hotlist has no plate column')
+
+                    # Rows are kept as tuples, far smaller than a dictionary per record.
+                    index = self.build_index(fieldnames, (tuple(row) for row in csv_reader))
+            except Exception as e:
+                print(f'Error occurred loading plate hotlist! \n{e}')
+                return False
+
+            # Swap the whole index at once, lookups in progress keep using the previous one.
+            self.index = index
+            self.loaded_mtime = mtime
+            self.version += 1
+
+            print(f'Plate hotlist loaded with {len(self.index["exact"])} plates.')
+
+            return True
+        finally:
+            self.reload_lock.release()
+
+
+    def start_watching(self, poll_interval : float = 5.0) -> None:
+
+        ''' Start a background thread reloading the hotlist whenever its CSV changes. '''
+
+        if self.watcher is not None:
+            return
+
+        def watch():
+            while not self.stop_event.wait(poll_interval):
+                self.reload()
+
+        self.watcher = threading.Thread(target=watch, daemon=True)
+        self.watcher.start()
+
+
+    def stop_watching(self) -> None:
+
+        ''' Stop the background reload thread. '''
+
+        self.stop_event.set()
+
+        if self.watcher is not None:
+            self.watcher.join()
+            self.watcher = None
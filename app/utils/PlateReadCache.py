@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+from collections import OrderedDict
+
+
+class PlateReadCache(object):
+
+    '''
+        LRU cache of OCR results keyed by track ID and a perceptual difference hash (dHash) of the preprocessed plate.
+            Plates whose hashes are within a Hamming distance tolerance of an entry cached for the same track reuse its
+            result, so near identical crops from slow moving or queued vehicles are not read again. Results are never
+            shared between tracks, as differing plates can hash alike.
+    '''
+
+    def __init__(self, capacity : int = 256, hamming_tolerance : int = 8, hash_width : int = 32, hash_height : int = 8):
+
+        '''
+            Parameters:
+                * capacity : int -> maximum number of cached results before the least recently used is evicted.
+                * hamming_tolerance : int -> maximum number of differing hash bits for two plates to be considered the same.
+                * hash_width : int -> hash columns, wide to match the plates aspect ratio so each character spans several.
+                * hash_height : int -> hash rows, producing a hash_width * hash_height bit hash.
+        '''
+
+        self.capacity = capacity
+        self.hamming_tolerance = hamming_tolerance
+        self.hash_width = hash_width
+        self.hash_height = hash_height
+        self.cached_reads = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+
+    def hash_plate(self, processed_plate : np.ndarray) -> int:
+
+        '''
+            Calculate the difference hash of a preprocessed plate, comparing the brightness of horizontally adjacent pixels
+                on a heavily downscaled copy.
+
+            Parameters:
+                * processed_plate : np.ndarray -> single channel preprocessed plate.
+
+            Returns:
+                * int -> plate hash.
+        '''
+
+        resized_plate = cv2.resize(processed_plate, (self.hash_width + 1, self.hash_height), interpolation=cv2.INTER_AREA)
+        differences = resized_plate[:, 1:] > resized_plate[:, :-1]
+
+        return int.from_bytes(np.packbits(differences).tobytes(), 'big')
+
+
+    def lookup(self, ID : int, plate_hash : int):
+
+        '''
+            Fetch the cached result of the closest plate within tolerance read from the same track, marking it as recently
+                used.
+
+            Parameters:
+                * ID : int -> ID of the track the plate belongs to.
+                * plate_hash : int -> hash of the plate being read.
+
+            Returns:
+                * tuple[int, cached OCR result] | None -> hash of the matched plate and its cached result, None on a miss.
+        '''
+
+        # Exact matches are most common, avoid scanning for them.
+        matched_key = (ID, plate_hash) if (ID, plate_hash) in self.cached_reads else None
+
+        if matched_key is None:
+
+            closest_distance = self.hamming_tolerance + 1
+
+            for cached_key in self.cached_reads:
+
+                if cached_key[0] != ID:
+                    continue
+
+                distance = (plate_hash ^ cached_key[1]).bit_count()
+
+                if distance < closest_distance:
+                    matched_key, closest_distance = cached_key, distance
+
+        if matched_key is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.cached_reads.move_to_end(matched_key)
+
+        return matched_key[1], self.cached_reads[matched_key]
+
+
+    def store(self, ID : int, plate_hash : int, ocr_read_plate) -> None:
+
+        ''' Cache an OCR result against a tracks plate hash, evicting the least recently used result when full. '''
+
+        self.cached_reads[(ID, plate_hash)] = ocr_read_plate
+        self.cached_reads.move_to_end((ID, plate_hash))
+
+        if len(self.cached_reads) > self.capacity:
+            self.cached_reads.popitem(last=False)
+
+
+    def fetch_hit_rate(self) -> float:
+
+        ''' Fraction of lookups served from the cache. '''
+
+        lookups = self.hits + self.misses
+
+        return self.hits / lookups if lookups else 0.0
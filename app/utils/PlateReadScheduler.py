@@ -0,0 +1,202 @@
+import cv2
+import numpy as np
+
+
+class PlateReadScheduler(object):
+
+    '''
+        Module deciding when a tracked vehicle is worth spending plate detection and OCR on. Each vehicle crop is scored
+            cheaply from its size, sharpness and distance from the frame edge, reads are only attempted on the best scoring
+            frames, and every track is limited to a maximum number of attempts, stopping altogether once a plate is confirmed.
+            Tracks going too long without a crop worth reading are given up on as if their attempts were spent.
+    '''
+
+    def __init__(
+        self,
+        max_attempts : int = 5,
+        min_quality_score : float = 0.25,
+        improvement_margin : float = 0.1,
+        retry_interval : float = 1.0,
+        target_crop_height : int = 160,
+        sharpness_reference : float = 100.0,
+        edge_margin : int = 32,
+        unreadable_timeout : float = 3.0,
+        deregistration_time : int = 12
+    ):
+
+        '''
+            Parameters:
+                * max_attempts : int -> maximum number of plate reads attempted per track.
+                * min_quality_score : float -> minimum crop score, between 0 and 1, for a read to be attempted.
+                * improvement_margin : float -> fraction a crop must improve on the best attempted score to be read early.
+                * retry_interval : float -> seconds after which a crop scoring no better may be read again.
+                * target_crop_height : int -> vehicle crop height in pixels considered large enough for a full size score.
+                * sharpness_reference : float -> Laplacian variance at which the sharpness score reaches one half.
+                * edge_margin : int -> distance in pixels from the frame edge below which crops are considered cut off.
+                * unreadable_timeout : float -> seconds a track may go without a crop scoring min_quality_score before its
+                    attempts are considered exhausted.
+                * deregistration_time : int -> seconds before an unseen track is pruned.
+        '''
+
+        self.max_attempts = max_attempts
+        self.min_quality_score = min_quality_score
+        self.improvement_margin = improvement_margin
+        self.retry_interval = retry_interval
+        self.target_crop_height = target_crop_height
+        self.sharpness_reference = sharpness_reference
+        self.edge_margin = edge_margin
+        self.unreadable_timeout = unreadable_timeout
+        self.deregistration_time = deregistration_time
+        self.read_states = {}
+
+        # Width vehicle crops are downscaled to before measuring sharpness.
+        self.sharpness_sample_width = 96
+
+
+    def score_vehicle_crop(self, frame : np.ndarray, detection : dict, vehicle_crop : np.ndarray) -> float:
+
+        '''
+            Score how likely a vehicle crop is to yield a readable plate.
+
+            Parameters:
+                * frame : np.ndarray -> frame the detection was made upon.
+                * detection : dict -> detection the crop was taken from.
+                * vehicle_crop : np.ndarray -> crop of the vehicle.
+
+            Returns:
+                * float -> score between 0 and 1, higher being better.
+        '''
+
+        if vehicle_crop.size == 0:
+            return 0.0
+
+        crop_height, crop_width = vehicle_crop.shape[:2]
+        frame_height, frame_width = frame.shape[:2]
+
+        # Larger vehicles have larger, more legible plates.
+        size_score = min(crop_height / self.target_crop_height, 1.0)
+
+        # Measure sharpness on a small greyscale copy to keep the cost negligible.
+        sample_height = max(1, int(crop_height * self.sharpness_sample_width / crop_width))
+        grey_sample = cv2.cvtColor(cv2.resize(vehicle_crop, (self.sharpness_sample_width, sample_height)), cv2.COLOR_BGR2GRAY)
+        sharpness = cv2.Laplacian(grey_sample, cv2.CV_64F).var()
+        sharpness_score = sharpness / (sharpness + self.sharpness_reference)
+
+        # Vehicles entering or leaving the frame are likely to have their plate cut off.
+        edge_distance = min(detection['x1'], detection['y1'], frame_width - detection['x2'], frame_height - detection['y2'])
+        edge_score = min(max(edge_distance, 0) / self.edge_margin, 1.0)
+
+        return float(size_score * sharpness_score * edge_score)
+
+
+    def should_attempt(self, ID : int, score : float, updated_at : float) -> bool:
+
+        '''
+            Decide whether a read should be attempted for a track given its current crop score.
+
+            Parameters:
+                * ID : int -> ID of the track.
+                * score : float -> score of the tracks current crop.
+                * updated_at : float -> timestamp of the current frame.
+
+            Returns:
+                * bool -> True if the read should be attempted.
+        '''
+
+        read_state = self.fetch_read_state(ID, updated_at)
+
+        if score >= self.min_quality_score:
+            read_state['last_readable'] = updated_at
+
+        if read_state['confirmed'] or read_state['attempts'] >= self.max_attempts or score < self.min_quality_score:
+            return False
+
+        if read_state['attempts'] == 0:
+            return True
+
+        # Read again early only for a clearly better crop, otherwise wait for the retry interval.
+        return score >= read_state['best_score'] * (1 + self.improvement_margin) or \
+            updated_at - read_state['last_attempted'] >= self.retry_interval
+
+
+    def record_attempt(self, ID : int, score : float, updated_at : float) -> None:
+
+        ''' Record that a read has been attempted for a track on a crop with the given score. '''
+
+        read_state = self.fetch_read_state(ID, updated_at)
+        read_state['attempts'] += 1
+        read_state['best_score'] = max(read_state['best_score'], score)
+        read_state['last_attempted'] = updated_at
+
+
+    def confirm(self, ID : int, updated_at : float) -> None:
+
+        ''' Mark a tracks plate as confirmed, no further reads will be attempted. '''
+
+        self.fetch_read_state(ID, updated_at)['confirmed'] = True
+
+
+    def is_confirmed(self, ID : int) -> bool:
+
+        ''' Whether a tracks plate has been confirmed. '''
+
+        return ID in self.read_states and self.read_states[ID]['confirmed']
+
+
+    def attempts_exhausted(self, ID : int) -> bool:
+
+        ''' Whether a track has used its read budget, or gone too long without a readable crop, without a plate being confirmed. '''
+
+        if ID not in self.read_states or self.read_states[ID]['confirmed']:
+            return False
+
+        read_state = self.read_states[ID]
+
+        return read_state['attempts'] >= self.max_attempts or \
+            read_state['last_seen'] - read_state['last_readable'] >= self.unreadable_timeout
+
+
+    def touch(self, ID : int, updated_at : float) -> None:
+
+        ''' Refresh when a track was last seen, so tracks no longer being read are not pruned whilst still in view. '''
+
+        if ID in self.read_states:
+            self.read_states[ID]['last_seen'] = updated_at
+
+
+    def fetch_read_state(self, ID : int, updated_at : float) -> dict:
+
+        ''' Fetch a tracks read state, registering it on first sighting and refreshing when it was last seen. '''
+
+        read_state = self.read_states.setdefault(ID, {
+            'attempts' : 0,
+            'best_score' : 0.0,
+            'last_attempted' : 0.0,
+            'last_readable' : updated_at,
+            'confirmed' : False
+        })
+
+        read_state['last_seen'] = updated_at
+
+        return read_state
+
+
+    def prune_outdated_objects(self, updated_at):
+
+        '''
+            Iterate over parameterised detections and prune those exceeding the set time limit threshold.
+
+            Parameters:
+                * updated_at : float -> timestamp of the current update.
+            Returns:
+                * None.
+        '''
+
+        # Initialise list to store ID values of detections to be pruned.
+        stale_detections = [ID for ID, detection in self.read_states.items()
+                            if (updated_at - detection['last_seen']) > self.deregistration_time]
+
+        # Iterate over the IDs present.
+        for ID in stale_detections:
+            # Use IDs to delete entries from tracked objects.
+            del self.read_states[ID]
@@ -0,0 +1,280 @@
+import cv2
+import numpy as np
+
+try:
+    import av
+except ImportError:
+    av = None
+
+
+class PyAVCapture(object):
+
+    '''
+        Frame source decoding with PyAV, a drop in replacement for the parts of cv2.VideoCapture the application uses
+            (read, grab, retrieve, get, set, isOpened and release). Codec threading is enabled so decoding is spread
+            across cores, 4:2:0 frames are converted into a small pool of reused arrays rather than a new allocation per
+            frame, and positions are taken from each frames presentation timestamp.
+
+        Frames returned by read and retrieve are only valid until pool_size further frames have been read, copy any frame
+            that must be kept for longer.
+    '''
+
+    # Whether PyAV is installed and this backend can be used.
+    available = av is not None
+
+    def __init__(self, video_path : str, thread_type : str = 'AUTO', thread_count : int = 0, pool_size : int = 4):
+
+        '''
+            Parameters:
+                * video_path : str -> path to the video to decode.
+                * thread_type : str -> PyAV codec threading, 'AUTO' for frame and slice threading where supported.
+                * thread_count : int -> number of decoding threads, 0 to match the number of cores.
+                * pool_size : int -> number of reused frame buffers.
+        '''
+
+        self.container = None
+        self.grabbed_frame = None
+        self.frame_pool = []
+        self.pool_size = pool_size
+        self.pool_index = 0
+        self.position = 0
+        self.timestamp = 0.0
+
+        try:
+            self.container = av.open(video_path)
+            self.stream = self.container.streams.video[0]
+        except Exception as e:
+            print(f'Error occurred opening video with PyAV! \n{e}')
+            self.container = None
+            return
+
+        self.stream.thread_type = thread_type
+        self.stream.codec_context.thread_count = thread_count
+
+        self.frame_rate = float(self.stream.average_rate or self.stream.guessed_rate or 30)
+        self.time_base = float(self.stream.time_base)
+        self.start_time = self.stream.start_time or 0
+
+        self.decoded_frames = self.container.decode(self.stream)
+
+
+    def isOpened(self) -> bool:
+
+        ''' Whether the video was opened successfully and has not been released. '''
+
+        return self.container is not None
+
+
+    def grab(self) -> bool:
+
+        '''
+            Decode the next frame without converting it, as skipped frames never need converting.
+
+            Returns:
+                * bool -> True if a frame was decoded.
+        '''
+
+        if self.container is None:
+            return False
+
+        try:
+            self.grabbed_frame = next(self.decoded_frames)
+        except (StopIteration, av.error.EOFError):
+            self.grabbed_frame = None
+            return False
+
+        if self.grabbed_frame.pts is not None:
+            self.timestamp = (self.grabbed_frame.pts - self.start_time) * self.time_base
+            self.position = int(round(self.timestamp * self.frame_rate)) + 1
+        else:
+            self.timestamp = self.position / self.frame_rate
+            self.position += 1
+
+        return True
+
+
+    def retrieve(self) -> tuple[bool, np.ndarray | None]:
+
+        '''
+            Convert the grabbed frame to BGR. 8 bit 4:2:0 frames, the format of almost all H.264 and H.265 footage, have
+                their planes packed into a pooled I420 buffer and are converted straight into the next pooled BGR buffer,
+                so no frame sized array is allocated. Frames in any other format are converted by PyAV.
+
+            Returns:
+                * tuple[bool, np.ndarray | None] -> whether a frame was retrieved, and the frame.
+        '''
+
+        if self.grabbed_frame is None:
+            return False, None
+
+        frame_width, frame_height = self.grabbed_frame.width, self.grabbed_frame.height
+
+        # OpenCV only converts even sized, limited range 4:2:0 frames.
+        if self.grabbed_frame.format.name != 'yuv420p' or frame_width % 2 or frame_height % 2:
+            return True, self.grabbed_frame.to_ndarray(format='bgr24')
+
+        yuv_frame, frame = self.fetch_pooled_buffers(frame_width, frame_height)
+
+        # Luma, followed by the quarter sized chroma planes, packed without their row padding.
+        packed_planes = yuv_frame.reshape(-1)
+        plane_offset = 0
+
+        for plane, (plane_width, plane_height) in zip(self.grabbed_frame.planes, ((frame_width, frame_height), *[(frame_width // 2, frame_height // 2)] * 2)):
+
+            plane_view = np.frombuffer(plane, dtype=np.uint8).reshape(plane_height, plane.line_size)[:, :plane_width]
+            np.copyto(packed_planes[plane_offset:plane_offset + plane_width * plane_height].reshape(plane_height, plane_width), plane_view)
+            plane_offset += plane_width * plane_height
+
+        cv2.cvtColor(yuv_frame, cv2.COLOR_YUV2BGR_I420, dst=frame)
+
+        self.pool_index = (self.pool_index + 1) % self.pool_size
+
+        return True, frame
+
+
+    def fetch_pooled_buffers(self, frame_width : int, frame_height : int) -> tuple[np.ndarray, np.ndarray]:
+
+        ''' Fetch the next pooled I420 and BGR buffers, allocating them only until the pool is full or if the frame size changes. '''
+
+        if len(self.frame_pool) < self.pool_size or self.frame_pool[self.pool_index][1].shape[:2] != (frame_height, frame_width):
+
+            buffers = (
+                np.empty((frame_height * 3 // 2, frame_width), dtype=np.uint8),
+                np.empty((frame_height, frame_width, 3), dtype=np.uint8)
+            )
+
+            if len(self.frame_pool) < self.pool_size:
+                self.frame_pool.append(buffers)
+                self.pool_index = len(self.frame_pool) - 1
+            else:
+                self.frame_pool[self.pool_index] = buffers
+
+        return self.frame_pool[self.pool_index]
+
+
+    def read(self) -> tuple[bool, np.ndarray | None]:
+
+        ''' Decode and retrieve the next frame, matching cv2.VideoCapture.read. '''
+
+        if not self.grab():
+            return False, None
+
+        return self.retrieve()
+
+
+    def get(self, property_ID : int) -> float:
+
+        '''
+            Fetch a property of the video, supporting the cv2 properties used by the application.
+
+            Parameters:
+                * property_ID : int -> cv2.CAP_PROP_* property.
+
+            Returns:
+                * float -> value of the property, 0 if unsupported, matching cv2.VideoCapture.
+        '''
+
+        if self.container is None:
+            return 0.0
+
+        if property_ID == cv2.CAP_PROP_FPS:
+            return self.frame_rate
+
+        if property_ID == cv2.CAP_PROP_FRAME_COUNT:
+            if self.stream.frames:
+                return float(self.stream.frames)
+            if self.stream.duration is not None:
+                return float(int(self.stream.duration * self.time_base * self.frame_rate))
+            return float(int((self.container.duration or 0) / av.time_base * self.frame_rate))
+
+        if property_ID == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+
+        if property_ID == cv2.CAP_PROP_POS_MSEC:
+            return self.timestamp * 1000
+
+        if property_ID == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.stream.codec_context.width)
+
+        if property_ID == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.stream.codec_context.height)
+
+        return 0.0
+
+
+    def set(self, property_ID : int, value : float) -> bool:
+
+        '''
+            Seek to a frame, supporting cv2.CAP_PROP_POS_FRAMES and cv2.CAP_PROP_POS_MSEC. Seeks land on the keyframe
+                before the target, decoding forward without converting frames until the target is reached.
+
+            Parameters:
+                * property_ID : int -> cv2.CAP_PROP_* property.
+                * value : float -> frame number or milliseconds to seek to.
+
+            Returns:
+                * bool -> True if the seek succeeded.
+        '''
+
+        if self.container is None:
+            return False
+
+        if property_ID == cv2.CAP_PROP_POS_FRAMES:
+            target_frame = int(value)
+        elif property_ID == cv2.CAP_PROP_POS_MSEC:
+            target_frame = int(round(value / 1000 * self.frame_rate))
+        else:
+            return False
+
+        try:
+            self.container.seek(
+                int(target_frame / self.frame_rate / self.time_base) + self.start_time,
+                stream=self.stream,
+                backward=True,
+                any_frame=False
+            )
+        except av.error.FFmpegError as e:
+            print(f'Error occurred seeking video with PyAV! \n{e}')
+            return False
+
+        self.decoded_frames = self.container.decode(self.stream)
+
+        # Decode forward from the keyframe, leaving the target as the next frame read.
+        while True:
+
+            try:
+                pending_frame = next(self.decoded_frames)
+            except (StopIteration, av.error.EOFError):
+                break
+
+            frame_position = int(round((pending_frame.pts - self.start_time) * self.time_base * self.frame_rate)) if pending_frame.pts is not None else self.position
+
+            if frame_position >= target_frame:
+                # Hand the target back as the next decoded frame.
+                self.decoded_frames = self.chain_frame(pending_frame, self.decoded_frames)
+                break
+
+        self.position = target_frame
+
+        return True
+
+
+    @staticmethod
+    def chain_frame(frame, decoded_frames):
+
+        ''' Yield an already decoded frame ahead of the remaining decoded frames. '''
+
+        yield frame
+        yield from decoded_frames
+
+
+    def release(self) -> None:
+
+        ''' Close the video, matching cv2.VideoCapture.release. '''
+
+        if self.container is not None:
+            self.container.close()
+            self.container = None
+
+        self.grabbed_frame = None
+        self.frame_pool = []
@@ -13,7 +13,15 @@ class SpeedEstimation(object):
         frame_rate : int = 30, 
         deregistration_time : int = 12,
         rolling_window_size : int = 5,
-        ppm_smoothing_factor : float = 0.7
+        ppm_smoothing_factor : float = 0.7,
+        offline_mode : bool = False,
+        min_trajectory_samples : int = 8,
+        refit_interval : int = 15,
+        provisional_window : int = 32,
+        max_trajectory_samples : int = 512,
+        ransac_iterations : int = 64,
+        ransac_inlier_threshold : float = 0.5,
+        confidence_z_score : float = 1.96
     ):
 
         self.frame_rate = frame_rate
@@ -22,12 +30,33 @@ class SpeedEstimation(object):
         self.ppm_smoothing_factor = ppm_smoothing_factor
         self.detection_speeds = {}
 
+        # Offline mode records whole trajectories, estimating one speed per detection once its track has ended.
+        self.offline_mode = offline_mode
+        self.min_trajectory_samples = min_trajectory_samples
+        # Number of frames between provisional fits of a trajectory still being recorded, each over its latest samples.
+        self.refit_interval = refit_interval
+        self.provisional_window = provisional_window
+        # Samples kept per trajectory, long lived tracks are decimated to bound memory and the cost of their final fit.
+        self.max_trajectory_samples = max_trajectory_samples
+        self.ransac_iterations = ransac_iterations
+        # Maximum distance in METERS for a sample to be considered an inlier of the fitted trajectory.
+        self.ransac_inlier_threshold = ransac_inlier_threshold
+        self.confidence_z_score = confidence_z_score
+        self.trajectories = {}
+        self.final_estimates = {}
+        self.frame_count = 0
+        self.rng = np.random.default_rng()
+
     
-    def apply_estimations(self, detections):
+    def apply_estimations(self, detections, updated_at : float = None):
 
         ''' '''
 
-        updated_at = time()
+        if self.offline_mode:
+            return self.record_trajectories(detections, updated_at)
+
+        if updated_at is None:
+            updated_at = time()
 
         for detection in detections:
 
@@ -209,4 +238,199 @@ class SpeedEstimation(object):
         for ID in stale_detections:
             # Use IDs to delete entries from tracked objects. 
             del self.detection_speeds[ID]
-    
\ No newline at end of file
+
+
+    def reset_estimations(self) -> None:
+
+        ''' Drop per detection speed state after the stream has been sought, finalising any offline trajectories. '''
+
+        if self.offline_mode:
+            self.finalise_trajectories()
+
+        self.detection_speeds.clear()
+
+
+    def record_trajectories(self, detections : list[dict], updated_at : float = None) -> list[dict]:
+
+        '''
+            Offline counterpart to apply_estimations, appending each detections center point and scale to its trajectory
+                without any per frame speed calculations. Without frame timestamps, timestamps are derived from the frame
+                count so recorded footage processed slower than real time still produces accurate speeds. The latest
+                samples are refitted every few frames so detections carry a provisional speed until their track ends and
+                its final speed is estimated from the whole trajectory. Trajectories reaching the sample limit are halved,
+                recording every other frame from then on.
+
+            Parameters:
+                * detections : list[dict] -> tracked detections containing their ID and center points.
+                * updated_at : float -> timestamp of the current frame, taken from the stream.
+
+            Returns:
+                * detections : list[dict] -> detections, with provisional speeds once enough samples were recorded.
+        '''
+
+        self.frame_count += 1
+
+        # Wall clock time of the frame, bounding which violations a tracks final speed applies to.
+        seen_at = time()
+
+        if updated_at is None:
+            updated_at = self.frame_count / max(self.frame_rate, 1)
+
+        for detection in detections:
+
+            if not self.validate_detection(detection):
+                continue
+
+            ID = detection['ID']
+            center_x, center_y = detection['center_points'][-1]
+
+            trajectory = self.trajectories.setdefault(ID, {
+                'samples' : [],
+                'classname' : detection.get('classname'),
+                'first_seen_at' : seen_at,
+                'frames' : 0,
+                'stride' : 1
+            })
+            trajectory['updated_at'] = updated_at
+            trajectory['frames'] += 1
+
+            if trajectory['frames'] % trajectory['stride'] == 0:
+                trajectory['samples'].append((updated_at, center_x, center_y, self.calibrate_ppm(detection)))
+
+            if len(trajectory['samples']) > self.max_trajectory_samples:
+                trajectory['samples'] = trajectory['samples'][::2]
+                trajectory['stride'] *= 2
+
+            # Provisional fits only cover the latest samples, keeping their cost constant however long the track lives.
+            if len(trajectory['samples']) >= self.min_trajectory_samples and trajectory['frames'] % self.refit_interval == 0:
+                latest_samples = np.asarray(trajectory['samples'][-self.provisional_window:], dtype=np.float64)
+                trajectory['estimate'] = self.estimate_trajectory_speed(latest_samples) or trajectory.get('estimate')
+
+            if trajectory.get('estimate') is not None:
+                detection['speed'] = trajectory['estimate']['speed']
+
+        # Tracks no longer seen have ended, estimate their final speeds.
+        ended_trajectories = [ID for ID, trajectory in self.trajectories.items()
+                              if (updated_at - trajectory['updated_at']) > self.deregistration_time]
+
+        for ID in ended_trajectories:
+            self.finalise_trajectory(ID)
+
+        return detections
+
+
+    def finalise_trajectories(self) -> dict:
+
+        '''
+            Estimate final speeds for every trajectory still being recorded, to be called once a file has finished processing.
+
+            Returns:
+                * final_estimates : dict -> final speed estimates keyed by detection ID.
+        '''
+
+        for ID in list(self.trajectories.keys()):
+            self.finalise_trajectory(ID)
+
+        return self.final_estimates
+
+
+    def finalise_trajectory(self, ID : int) -> None:
+
+        '''
+            Remove a detections trajectory from the recording, storing its final speed estimate when enough samples
+                were collected.
+
+            Parameters:
+                * ID : int -> ID of the detection whose track has ended.
+
+            Returns:
+                * None.
+        '''
+
+        trajectory = self.trajectories.pop(ID)
+
+        if len(trajectory['samples']) < self.min_trajectory_samples:
+            return
+
+        estimate = self.estimate_trajectory_speed(np.asarray(trajectory['samples'], dtype=np.float64))
+
+        if estimate is not None:
+            estimate['classname'] = trajectory['classname']
+            estimate['first_seen_at'] = trajectory['first_seen_at']
+            self.final_estimates[ID] = estimate
+
+
+    def pop_final_estimates(self) -> dict:
+
+        '''
+            Hand over the final speed estimates of tracks ended since last called, removing them from the estimator.
+
+            Returns:
+                * final_estimates : dict -> final speed estimates keyed by detection ID.
+        '''
+
+        final_estimates, self.final_estimates = self.final_estimates, {}
+
+        return final_estimates
+
+
+    def estimate_trajectory_speed(self, samples : np.ndarray) -> dict | None:
+
+        '''
+            Fit a constant velocity model to a whole trajectory in ground coordinates using a vectorised RANSAC pass, 
+                refining the best model with least squares over its inliers to produce a speed and confidence interval.
+
+            Parameters:
+                * samples : np.ndarray -> (N, 4) array of timestamp, center x, center y and pixels per meter.
+
+            Returns:
+                * dict | None -> speed, confidence interval, inlier ratio and sample count, None if no fit was possible.
+        '''
+
+        timestamps = samples[:, 0] - samples[0, 0]
+
+        # Project center points into ground coordinates using the tracks median scale.
+        ground_points = samples[:, 1:3] / np.median(samples[:, 3])
+
+        # Draw candidate models from random sample pairs, discarding pairs sharing a timestamp.
+        first_indices = self.rng.integers(0, len(samples), self.ransac_iterations)
+        second_indices = self.rng.integers(0, len(samples), self.ransac_iterations)
+        time_deltas = timestamps[second_indices] - timestamps[first_indices]
+        valid_pairs = time_deltas != 0
+
+        if not np.any(valid_pairs):
+            return None
+
+        first_indices, second_indices, time_deltas = first_indices[valid_pairs], second_indices[valid_pairs], time_deltas[valid_pairs]
+
+        # Candidate velocities and origins, shape (K, 2).
+        velocities = (ground_points[second_indices] - ground_points[first_indices]) / time_deltas[:, None]
+        origins = ground_points[first_indices] - velocities * timestamps[first_indices, None]
+
+        # Residuals of every sample against every candidate model, shape (K, N).
+        predictions = origins[:, None, :] + velocities[:, None, :] * timestamps[None, :, None]
+        residuals = np.linalg.norm(ground_points[None, :, :] - predictions, axis=2)
+        inliers = residuals[np.argmax(np.sum(residuals <= self.ransac_inlier_threshold, axis=1))] <= self.ransac_inlier_threshold
+
+        if np.sum(inliers) < 4 or np.ptp(timestamps[inliers]) <= 0:
+            return None
+
+        # Refine with least squares over the inliers, using the slope variances for the confidence interval.
+        (velocity_x, _), covariance_x = np.polyfit(timestamps[inliers], ground_points[inliers, 0], 1, cov=True)
+        (velocity_y, _), covariance_y = np.polyfit(timestamps[inliers], ground_points[inliers, 1], 1, cov=True)
+
+        speed = float(np.hypot(velocity_x, velocity_y))
+
+        # Propagate slope uncertainty onto the speed magnitude.
+        speed_error = float(np.sqrt((velocity_x ** 2 * covariance_x[0, 0] + velocity_y ** 2 * covariance_y[0, 0]) / max(speed ** 2, 1e-9)))
+        margin = self.confidence_z_score * speed_error
+
+        return {
+            'speed' : round(self.unit_conversion(speed, 'mph'), 2),
+            'confidence_interval' : (
+                round(self.unit_conversion(max(speed - margin, 0.0), 'mph'), 2),
+                round(self.unit_conversion(speed + margin, 'mph'), 2)
+            ),
+            'inlier_ratio' : round(float(np.mean(inliers)), 2),
+            'samples' : int(len(samples))
+        }
@@ -0,0 +1,155 @@
+from time import time
+from .BboxUtils import calculate_line_crossing
+
+
+class SpeedTrap(object):
+
+    '''
+        Module to estimate a detections speed through section timing, where operators define two virtual lines per lane at a
+            known ground distance apart. Entry and exit crossings are timed from tracked center point trajectories, producing
+            a single speed per vehicle rather than estimating on every frame.
+    '''
+
+    def __init__(self, lanes : list[dict] = None, deregistration_time : int = 12, measurement : str = 'mph'):
+
+        '''
+            Parameters:
+                * lanes : list[dict] -> lane definitions, each containing an 'entry_line' and 'exit_line' given as
+                    ((x1, y1), (x2, y2)) pixel coordinates and the 'distance' in METERS between them.
+                * deregistration_time : int -> seconds before an unseen detection is pruned.
+                * measurement : str -> unit of measurement for the produced speeds.
+        '''
+
+        self.lanes = lanes or []
+        self.deregistration_time = deregistration_time
+        self.measurement = measurement
+        self.trap_states = {}
+
+        # Conversion values from meters per second.
+        self.conversion_factors = {'mph': 2.23,  'kmh': 3.6}
+
+
+    def apply_speed_trap(self, detections : list[dict], updated_at : float = None) -> list[dict]:
+
+        '''
+            Check each tracked detections latest movement against every lanes lines, timing crossings and assigning a speed
+                once a detection has crossed both lines of a lane.
+
+            Parameters:
+                * detections : list[dict] -> tracked detections containing their ID and center points.
+                * updated_at : float -> timestamp for the current frame, defaults to the current time.
+
+            Returns:
+                * detections : list[dict] -> detections, those timed through a lane updated with a speed.
+        '''
+
+        if updated_at is None:
+            updated_at = time()
+
+        for detection in detections:
+
+            ID = detection.get('ID')
+            center_points = detection.get('center_points')
+
+            if ID is None or not center_points:
+                continue
+
+            current_center_point = center_points[-1]
+
+            # Register detection on first sighting, nothing to compare against yet.
+            if ID not in self.trap_states:
+                self.trap_states[ID] = {
+                    'last_center' : current_center_point,
+                    'updated_at' : updated_at,
+                    'crossings' : {},
+                    'speed' : None
+                }
+                continue
+
+            trap_state = self.trap_states[ID]
+
+            # Only time crossings until a speed has been produced.
+            if trap_state['speed'] is None:
+                self.check_lane_crossings(trap_state, current_center_point, updated_at)
+
+            trap_state['last_center'] = current_center_point
+            trap_state['updated_at'] = updated_at
+
+            if trap_state['speed'] is not None:
+                detection['speed'] = trap_state['speed']
+
+        self.prune_outdated_objects(updated_at)
+
+        return detections
+
+
+    def check_lane_crossings(self, trap_state : dict, current_center_point : tuple[int, int], updated_at : float) -> None:
+
+        '''
+            Test the segment travelled since the previous frame against each lanes lines, interpolating the crossing
+                timestamp between frames and calculating the speed once both lines of a lane have been crossed.
+
+            Parameters:
+                * trap_state : dict -> the detections speed trap state.
+                * current_center_point : tuple[int, int] -> detections current center point.
+                * updated_at : float -> timestamp for the current frame.
+
+            Returns:
+                * None.
+        '''
+
+        previous_center_point = trap_state['last_center']
+        previous_time = trap_state['updated_at']
+
+        for lane_index, lane in enumerate(self.lanes):
+
+            lane_crossings = trap_state['crossings'].setdefault(lane_index, {})
+
+            for line_name in ('entry_line', 'exit_line'):
+
+                if line_name in lane_crossings:
+                    continue
+
+                crossing_fraction = calculate_line_crossing(previous_center_point, current_center_point, lane[line_name])
+
+                if crossing_fraction is not None:
+                    # Interpolate when the line was crossed between the two frames.
+                    lane_crossings[line_name] = previous_time + crossing_fraction * (updated_at - previous_time)
+
+            # Both lines crossed, in either direction, produce the section speed.
+            if len(lane_crossings) == 2:
+
+                elapsed_time = abs(lane_crossings['exit_line'] - lane_crossings['entry_line'])
+
+                if elapsed_time > 0:
+                    speed = (lane['distance'] / elapsed_time) * self.conversion_factors[self.measurement]
+                    trap_state['speed'] = round(float(speed), 2)
+                    return
+
+
+    def reset_trap(self) -> None:
+
+        ''' Drop partially timed crossings after the stream has been sought. '''
+
+        self.trap_states.clear()
+
+
+    def prune_outdated_objects(self, updated_at):
+
+        '''
+            Iterate over parameterised detections and prune those exceeding the set time limit threshold.
+
+            Parameters:
+                * updated_at : float -> timestamp of the current update.
+            Returns:
+                * None.
+        '''
+
+        # Initialise list to store ID values of detections to be pruned.
+        stale_detections = [ID for ID, detection in self.trap_states.items()
+                            if (updated_at - detection['updated_at']) > self.deregistration_time]
+
+        # Iterate over the IDs present.
+        for ID in stale_detections:
+            # Use IDs to delete entries from tracked objects.
+            del self.trap_states[ID]
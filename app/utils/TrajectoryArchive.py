@@ -0,0 +1,369 @@
+import os
+import sqlite3
+import struct
+import time
+import zlib
+import numpy as np
+from .BboxUtils import calculate_center_point
+
+
+class TrajectoryArchive(object):
+
+    '''
+        Append only archive of completed trajectories, kept so traffic studies can be run over months of footage without
+            reprocessing video. Each trajectory is stored as delta encoded int16 center points, millisecond timestamp
+            offsets, per point speeds, its class and plate, compressed and appended to the current chunk file. A small
+            SQLite index holds each trajectories time span, bounding region and location within the chunks.
+    '''
+
+    def __init__(
+        self,
+        archive_dir : str,
+        chunk_size : int = 64 * 1024 * 1024,
+        min_points : int = 2,
+        max_points : int = 4096,
+        commit_interval : float = 5.0
+    ):
+
+        '''
+            Parameters:
+                * archive_dir : str -> directory the chunk files and index are kept in.
+                * chunk_size : int -> size in bytes at which a new chunk file is started.
+                * min_points : int -> minimum number of points for a trajectory to be archived.
+                * max_points : int -> number of points after which a long lived trajectory is archived as a segment.
+                * commit_interval : float -> seconds between flushing chunks and committing the index.
+        '''
+
+        self.archive_dir = archive_dir
+        self.chunk_size = chunk_size
+        self.min_points = min_points
+        self.max_points = max_points
+        self.commit_interval = commit_interval
+        self.last_committed = time.time()
+
+        # Trajectories of tracks still being followed.
+        self.active_trajectories = {}
+
+        # Fixed size trajectory header, followed by the length prefixed class and plate.
+        self.header_format = '<qddI'
+
+        os.makedirs(archive_dir, exist_ok=True)
+
+        self.connection = sqlite3.connect(os.path.join(archive_dir, 'index.db'), check_same_thread=False)
+
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS trajectories (
+                trajectory_id INTEGER PRIMARY KEY,
+                track_id INTEGER,
+                classname TEXT,
+                plate TEXT,
+                start_time REAL NOT NULL,
+                end_time REAL NOT NULL,
+                min_x INTEGER, min_y INTEGER, max_x INTEGER, max_y INTEGER,
+                chunk INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            )
+        ''')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS trajectories_time ON trajectories (start_time, end_time)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS trajectories_track ON trajectories (track_id)')
+        self.connection.commit()
+
+        # Continue appending to the latest chunk.
+        latest_chunk = self.connection.execute('SELECT MAX(chunk) FROM trajectories').fetchone()[0]
+        self.open_chunk(latest_chunk or 0)
+
+
+    def fetch_chunk_path(self, chunk : int) -> str:
+
+        ''' Fetch the path of a chunk file. '''
+
+        return os.path.join(self.archive_dir, f'chunk-{chunk:06d}.bin')
+
+
+    def open_chunk(self, chunk : int) -> None:
+
+        ''' Open a chunk file for appending. '''
+
+        self.chunk = chunk
+        self.chunk_file = open(self.fetch_chunk_path(chunk), 'ab')
+
+
+    def record_detections(self, detections : list[dict], recorded_at : float = None) -> list[dict]:
+
+        '''
+            Append each tracked detections current center point, speed and plate to its active trajectory.
+
+            Parameters:
+                * detections : list[dict] -> tracked detections, after speed estimation and ANPR.
+                * recorded_at : float -> timestamp of the current frame, defaults to the current time.
+
+            Returns:
+                * detections : list[dict] -> detections, unmodified.
+        '''
+
+        if recorded_at is None:
+            recorded_at = time.time()
+
+        for detection in detections:
+
+            ID = detection.get('ID')
+
+            if ID is None:
+                continue
+
+            center_points = detection.get('center_points')
+            center_point = center_points[-1] if center_points else calculate_center_point(detection)
+
+            trajectory = self.active_trajectories.setdefault(ID, {
+                'points' : [],
+                'timestamps' : [],
+                'speeds' : [],
+                'classname' : detection.get('classname', 'Unknown'),
+                'plate' : None
+            })
+
+            speed = detection.get('speed')
+
+            trajectory['points'].append(center_point)
+            trajectory['timestamps'].append(recorded_at)
+            trajectory['speeds'].append(np.nan if speed is None else speed)
+
+            plate_text = detection.get('license_plate', {}).get('plate_text')
+
+            if plate_text not in (None, 'PENDING', 'OCCLUDED'):
+                trajectory['plate'] = plate_text
+
+            # Archive long lived tracks in segments to bound memory.
+            if len(trajectory['points']) >= self.max_points:
+                self.archive_trajectory(ID, completed=False)
+
+        self.maintain_archive(recorded_at)
+
+        return detections
+
+
+    def archive_trajectory(self, ID : int, completed : bool = True) -> None:
+
+        '''
+            Encode and append a trajectory to the archive.
+
+            Parameters:
+                * ID : int -> ID of the track.
+                * completed : bool -> True once the track has ended, False to archive a segment and keep following it.
+
+            Returns:
+                * None.
+        '''
+
+        trajectory = self.active_trajectories.pop(ID, None) if completed else self.active_trajectories.get(ID)
+
+        if trajectory is None or len(trajectory['points']) < self.min_points:
+            return
+
+        points = np.rint(np.asarray(trajectory['points'], dtype=np.float64)).astype(np.int32)
+        timestamps = np.asarray(trajectory['timestamps'], dtype=np.float64)
+
+        self.append_record(ID, trajectory, points, timestamps)
+
+        # Continue the next segment from the last point.
+        if not completed:
+            for key in ('points', 'timestamps', 'speeds'):
+                trajectory[key] = trajectory[key][-1:]
+
+
+    def append_record(self, ID : int, trajectory : dict, points : np.ndarray, timestamps : np.ndarray) -> None:
+
+        ''' Encode a trajectory, appending it to the current chunk and indexing its location. '''
+
+        start_time, end_time = float(timestamps[0]), float(timestamps[-1])
+
+        # First delta is the absolute starting point.
+        point_deltas = np.clip(np.diff(points, axis=0, prepend=np.zeros((1, 2), dtype=np.int32)), -32768, 32767).astype('<i2')
+        timestamp_deltas = np.diff(np.rint((timestamps - start_time) * 1000).astype(np.int64), prepend=0).astype('<u4')
+        speeds = np.asarray(trajectory['speeds'], dtype='<f2')
+
+        classname = trajectory['classname'].encode('utf-8')[:255]
+        plate = (trajectory['plate'] or '').encode('utf-8')[:255]
+
+        record = zlib.compress(b''.join((
+            struct.pack(self.header_format, ID, start_time, end_time, len(points)),
+            struct.pack('<B', len(classname)), classname,
+            struct.pack('<B', len(plate)), plate,
+            point_deltas.tobytes(),
+            timestamp_deltas.tobytes(),
+            speeds.tobytes()
+        )))
+
+        if self.chunk_file.tell() + len(record) > self.chunk_size and self.chunk_file.tell() > 0:
+            self.chunk_file.close()
+            self.open_chunk(self.chunk + 1)
+
+        offset = self.chunk_file.tell()
+        self.chunk_file.write(record)
+
+        (min_x, min_y), (max_x, max_y) = points.min(axis=0), points.max(axis=0)
+
+        self.connection.execute(
+            '''
+                INSERT INTO trajectories (track_id, classname, plate, start_time, end_time, min_x, min_y, max_x, max_y, chunk, offset, length)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''',
+            (ID, trajectory['classname'], trajectory['plate'], start_time, end_time, int(min_x), int(min_y), int(max_x), int(max_y), self.chunk, offset, len(record))
+        )
+
+
+    def decode_record(self, record : bytes) -> dict:
+
+        '''
+            Decode an archived trajectory.
+
+            Parameters:
+                * record : bytes -> compressed trajectory as stored within a chunk.
+
+            Returns:
+                * dict -> trajectory with its track ID, class, plate, points, timestamps and speeds.
+        '''
+
+        payload = zlib.decompress(record)
+
+        ID, start_time, end_time, num_points = struct.unpack_from(self.header_format, payload)
+        position = struct.calcsize(self.header_format)
+
+        classname_length = payload[position]
+        classname = payload[position + 1:position + 1 + classname_length].decode('utf-8')
+        position += 1 + classname_length
+
+        plate_length = payload[position]
+        plate = payload[position + 1:position + 1 + plate_length].decode('utf-8') or None
+        position += 1 + plate_length
+
+        point_deltas = np.frombuffer(payload, dtype='<i2', count=num_points * 2, offset=position).reshape(-1, 2)
+        position += point_deltas.nbytes
+
+        timestamp_deltas = np.frombuffer(payload, dtype='<u4', count=num_points, offset=position)
+        position += timestamp_deltas.nbytes
+
+        speeds = np.frombuffer(payload, dtype='<f2', count=num_points, offset=position)
+
+        return {
+            'track_id' : ID,
+            'classname' : classname,
+            'plate' : plate,
+            'start_time' : start_time,
+            'end_time' : end_time,
+            'points' : np.cumsum(point_deltas.astype(np.int32), axis=0),
+            'timestamps' : start_time + np.cumsum(timestamp_deltas.astype(np.int64)) / 1000,
+            'speeds' : speeds.astype(np.float32)
+        }
+
+
+    def query_trajectories(
+        self,
+        start : float = None,
+        end : float = None,
+        region : tuple = None,
+        track_id : int = None,
+        classname : str = None,
+        limit : int = 1000
+    ) -> list[dict]:
+
+        '''
+            Query archived trajectories, every provided filter must match.
+
+            Parameters:
+                * start : float -> trajectories ending at or after this timestamp.
+                * end : float -> trajectories starting at or before this timestamp.
+                * region : tuple -> (x1, y1, x2, y2) region in pixels at least one point must fall within.
+                * track_id : int -> ID of the track.
+                * classname : str -> class of the trajectory.
+                * limit : int -> maximum number of trajectories returned, earliest first.
+
+            Returns:
+                * list[dict] -> matching decoded trajectories.
+        '''
+
+        # Make trajectories archived so far readable.
+        self.commit()
+
+        filters = {
+            'end_time >= ?' : start,
+            'start_time <= ?' : end,
+            'track_id = ?' : track_id,
+            'classname = ?' : classname
+        }
+
+        conditions = [condition for condition, value in filters.items() if value is not None]
+        parameters = [value for value in filters.values() if value is not None]
+
+        # Narrow regions down by bounding box before checking individual points.
+        if region is not None:
+            x1, y1, x2, y2 = region
+            conditions += ['max_x >= ?', 'min_x <= ?', 'max_y >= ?', 'min_y <= ?']
+            parameters += [x1, x2, y1, y2]
+
+        query = 'SELECT chunk, offset, length FROM trajectories'
+
+        if conditions:
+            query += f' WHERE {" AND ".join(conditions)}'
+
+        query += ' ORDER BY start_time'
+
+        trajectories = []
+        chunk_files = {}
+
+        try:
+            for chunk, offset, length in self.connection.execute(query, parameters):
+
+                if chunk not in chunk_files:
+                    chunk_files[chunk] = open(self.fetch_chunk_path(chunk), 'rb')
+
+                chunk_files[chunk].seek(offset)
+                trajectory = self.decode_record(chunk_files[chunk].read(length))
+
+                if region is not None:
+                    points = trajectory['points']
+                    within_region = (points[:, 0] >= x1) & (points[:, 0] <= x2) & (points[:, 1] >= y1) & (points[:, 1] <= y2)
+
+                    if not within_region.any():
+                        continue
+
+                trajectories.append(trajectory)
+
+                if len(trajectories) >= limit:
+                    break
+        finally:
+            for chunk_file in chunk_files.values():
+                chunk_file.close()
+
+        return trajectories
+
+
+    def maintain_archive(self, updated_at : float) -> None:
+
+        ''' Flush chunks and commit the index once the commit interval has elapsed. '''
+
+        if updated_at - self.last_committed >= self.commit_interval:
+            self.commit()
+            self.last_committed = updated_at
+
+
+    def commit(self) -> None:
+
+        ''' Flush appended trajectories to disk before committing the index pointing at them. '''
+
+        self.chunk_file.flush()
+        self.connection.commit()
+
+
+    def close(self) -> None:
+
+        ''' Archive every active trajectory and close the archive. '''
+
+        for ID in list(self.active_trajectories):
+            self.archive_trajectory(ID)
+
+        self.commit()
+        self.chunk_file.close()
+        self.connection.close()
@@ -0,0 +1,271 @@
+import sqlite3
+import threading
+import time
+
+
+class ViolationStore(object):
+
+    '''
+        Indexed SQLite store of captured traffic violations. Violations are buffered and written in batched transactions,
+            with indexes on capture time, plate, speed and track ID so the back office can query millions of rows directly.
+    '''
+
+    def __init__(self, database_path : str, batch_size : int = 64, flush_interval : float = 2.0):
+
+        '''
+            Parameters:
+                * database_path : str -> path to the SQLite violations database.
+                * batch_size : int -> number of buffered violations that triggers a write.
+                * flush_interval : float -> maximum seconds a violation is buffered before being written.
+        '''
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffered_violations = []
+        self.last_flushed = time.time()
+
+        # Violations are recorded from the frame loop, and their evidence filled in from the writer threads.
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
+
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS violations (
+                violation_id INTEGER PRIMARY KEY,
+                captured_at REAL NOT NULL,
+                track_id INTEGER,
+                plate TEXT,
+                speed REAL,
+                speed_key TEXT,
+                speed_limit REAL,
+                image_path TEXT,
+                clip_path TEXT,
+                final_speed REAL,
+                status TEXT
+            )
+        ''')
+
+        # Databases created before final speeds were stored gain their columns.
+        existing_columns = {row[1] for row in self.connection.execute('PRAGMA table_info(violations)')}
+
+        for column, column_type in (('final_speed', 'REAL'), ('status', 'TEXT')):
+            if column not in existing_columns:
+                self.connection.execute(f'ALTER TABLE violations ADD COLUMN {column} {column_type}')
+
+        self.connection.execute('CREATE INDEX IF NOT EXISTS violations_time ON violations (captured_at)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS violations_plate_time ON violations (plate, captured_at)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS violations_speed ON violations (speed)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS violations_track_time ON violations (track_id, captured_at)')
+        self.connection.commit()
+
+        # Column order violations are written in.
+        self.columns = ('captured_at', 'track_id', 'plate', 'speed', 'speed_key', 'speed_limit', 'image_path', 'clip_path', 'final_speed', 'status')
+
+
+    def record_violation(self, violation : dict) -> None:
+
+        '''
+            Buffer a violation, writing the buffer once it is full or the flush interval has elapsed.
+
+            Parameters:
+                * violation : dict -> violation metadata keyed by column name.
+
+            Returns:
+                * None.
+        '''
+
+        with self.lock:
+            self.buffered_violations.append(tuple(violation.get(column) for column in self.columns))
+
+        if len(self.buffered_violations) >= self.batch_size:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+
+    def flush_if_due(self) -> None:
+
+        ''' Write buffered violations if the flush interval has elapsed. '''
+
+        if self.buffered_violations and time.time() - self.last_flushed >= self.flush_interval:
+            self.flush()
+
+
+    def flush(self) -> None:
+
+        ''' Write every buffered violation in a single transaction. '''
+
+        with self.lock:
+
+            buffered_violations, self.buffered_violations = self.buffered_violations, []
+            self.last_flushed = time.time()
+
+            if not buffered_violations:
+                return
+
+            with self.connection:
+                self.connection.executemany(
+                    f'INSERT INTO violations ({", ".join(self.columns)}) VALUES ({", ".join("?" * len(self.columns))})',
+                    buffered_violations
+                )
+
+
+    def update_plate(self, track_id : int, plate_text : str, since : float) -> None:
+
+        '''
+            Fill in the plate of a tracks violations captured before its plate was confirmed.
+
+            Parameters:
+                * track_id : int -> ID of the track.
+                * plate_text : str -> confirmed plate.
+                * since : float -> earliest capture time to update, as track IDs restart between sessions.
+
+            Returns:
+                * None.
+        '''
+
+        # Violations may still be buffered.
+        self.flush()
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                'UPDATE violations SET plate = ? WHERE track_id = ? AND captured_at >= ?',
+                (plate_text, track_id, since)
+            )
+
+
+    def update_image_path(self, violation : dict, image_path : str) -> None:
+
+        '''
+            Fill in the evidence image of a violation once it has been written.
+
+            Parameters:
+                * violation : dict -> violation as recorded, identified by its track ID, capture time and speed measure.
+                * image_path : str -> path the evidence was written to.
+
+            Returns:
+                * None.
+        '''
+
+        self.update_evidence_path(violation, 'image_path', image_path)
+
+
+    def update_clip_path(self, violation : dict, clip_path : str) -> None:
+
+        '''
+            Fill in the evidence clip of a violation once it has been written.
+
+            Parameters:
+                * violation : dict -> violation as recorded, identified by its track ID, capture time and speed measure.
+                * clip_path : str -> path the clip was written to.
+
+            Returns:
+                * None.
+        '''
+
+        self.update_evidence_path(violation, 'clip_path', clip_path)
+
+
+    def update_evidence_path(self, violation : dict, column : str, path : str) -> None:
+
+        ''' Fill in an evidence path column of a recorded violation. '''
+
+        # The violation may still be buffered.
+        self.flush()
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                f'UPDATE violations SET {column} = ? WHERE track_id = ? AND captured_at = ? AND speed_key = ?',
+                (path, violation.get('track_id'), violation.get('captured_at'), violation.get('speed_key'))
+            )
+
+
+    def update_final_speed(self, track_id : int, final_speed : float, since : float) -> int:
+
+        '''
+            Store the final speed estimated once a track ended against violations captured at its provisional speed,
+                confirming those still over their limit and voiding the rest. The captured speed is kept, matching the
+                evidence rendered at capture.
+
+            Parameters:
+                * track_id : int -> ID of the track.
+                * final_speed : float -> final speed.
+                * since : float -> earliest capture time to update, as track IDs restart between sessions.
+
+            Returns:
+                * int -> number of stored violations updated.
+        '''
+
+        # Violations may still be buffered.
+        self.flush()
+
+        with self.lock, self.connection:
+            return self.connection.execute(
+                '''
+                    UPDATE violations SET final_speed = ?, status = CASE WHEN ? > speed_limit THEN 'confirmed' ELSE 'voided' END
+                    WHERE track_id = ? AND speed_key = ? AND captured_at >= ?
+                ''',
+                (final_speed, final_speed, track_id, 'speed', since)
+            ).rowcount
+
+
+    def query_violations(
+        self,
+        plate : str = None,
+        min_speed : float = None,
+        start : float = None,
+        end : float = None,
+        track_id : int = None,
+        status : str = None,
+        limit : int = 1000
+    ) -> list[dict]:
+
+        '''
+            Query stored violations, every provided filter must match.
+
+            Parameters:
+                * plate : str -> plate of the offender.
+                * min_speed : float -> minimum speed of the violation.
+                * start : float -> earliest capture timestamp.
+                * end : float -> latest capture timestamp.
+                * track_id : int -> ID of the offending track.
+                * status : str -> 'captured', or 'confirmed' or 'voided' once a final speed has been estimated.
+                * limit : int -> maximum number of violations returned, most recent first.
+
+            Returns:
+                * list[dict] -> matching violations.
+        '''
+
+        self.flush()
+
+        filters = {
+            'plate = ?' : plate,
+            'speed >= ?' : min_speed,
+            'captured_at >= ?' : start,
+            'captured_at <= ?' : end,
+            'track_id = ?' : track_id,
+            'status = ?' : status
+        }
+
+        conditions = [condition for condition, value in filters.items() if value is not None]
+        parameters = [value for value in filters.values() if value is not None]
+
+        query = f'SELECT violation_id, {", ".join(self.columns)} FROM violations'
+
+        if conditions:
+            query += f' WHERE {" AND ".join(conditions)}'
+
+        query += ' ORDER BY captured_at DESC LIMIT ?'
+
+        with self.lock:
+            rows = self.connection.execute(query, (*parameters, limit)).fetchall()
+
+        return [dict(zip(('violation_id', *self.columns), row)) for row in rows]
+
+
+    def close(self) -> None:
+
+        ''' Write any buffered violations and close the store. '''
+
+        self.flush()
+        self.connection.close()